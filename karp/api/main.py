@@ -19,6 +19,8 @@ import logging
 from asgi_correlation_id import CorrelationIdMiddleware
 from asgi_correlation_id.context import correlation_id
 from asgi_matomo import MatomoMiddleware
+from elasticsearch import AsyncElasticsearch
+from injector import singleton
 
 from karp import main
 from karp.foundation import errors as foundation_errors
@@ -28,6 +30,7 @@ from karp.lex.domain import errors as lex_errors
 from karp.main.errors import ClientErrorCodes
 from karp.main import config, new_session
 from karp.api.routes import router as api_router
+from karp.search.infrastructure.es import AsyncEsMappingRepository
 
 
 querying_description = """
@@ -95,6 +98,8 @@ logger = logging.getLogger(__name__)
 
 def create_app() -> FastAPI:
     app_context = main.bootstrap_app()
+    # the mappings are shared by all requests, instead of being loaded for every request
+    app_context.injector.binder.bind(AsyncEsMappingRepository, scope=singleton)
 
     app = FastAPI(
         title=f"{config.PROJECT_NAME} API",
@@ -174,6 +179,10 @@ def create_app() -> FastAPI:
             ),
         )
 
+    @app.on_event("shutdown")
+    async def _close_async_es() -> None:
+        await app_context.injector.get(AsyncElasticsearch).close()
+
     @app.middleware("http")
     async def injector_middleware(request: Request, call_next):
         response: Response = JSONResponse(
@@ -16,7 +16,7 @@ from karp.api import schemas
 from karp.api.dependencies.fastapi_injector import inject_from_req
 from karp.auth import User
 from karp.auth.application import ResourcePermissionQueries
-from karp.entry_commands import EntryCommands
+from karp.entry_commands import BatchOperation, EntryCommands
 from karp.foundation.value_objects import PermissionLevel, UniqueId, unique_id
 from karp.foundation.value_objects.unique_id import UniqueIdStr
 from karp.lex.application import EntryQueries
@@ -63,6 +63,10 @@ def get_history_for_entry(
 def add_entry(
     resource_id: str,
     data: schemas.EntryAdd,
+    wait_for_visibility: bool = Query(
+        True,
+        description="Wait until the change is visible in search results, otherwise it is indexed in the background",
+    ),
     user: User = Depends(deps.get_user),
     resource_permissions: ResourcePermissionQueries = Depends(deps.get_resource_permissions),
     entry_commands: EntryCommands = Depends(inject_from_req(EntryCommands)),
@@ -82,6 +86,7 @@ def add_entry(
             user=user.identifier,
             message=data.message,
             entry=data.entry,
+            wait_for_visibility=wait_for_visibility,
         )
     except errors.IntegrityError as exc:
         return responses.JSONResponse(
@@ -103,6 +108,72 @@ def add_entry(
     return {"newID": new_entry.id}
 
 
+@router.post(
+    "/{resource_id}/_batch",
+    tags=["Editing"],
+    response_model=schemas.EntryBatchResponse,
+)
+def batch_entries(
+    resource_id: str,
+    data: schemas.EntryBatch,
+    wait_for_visibility: bool = Query(
+        True,
+        description="Wait until the changes are visible in search results, otherwise they are indexed in the background",
+    ),
+    user: User = Depends(deps.get_user),
+    resource_permissions: ResourcePermissionQueries = Depends(deps.get_resource_permissions),
+    entry_commands: EntryCommands = Depends(inject_from_req(EntryCommands)),
+    published_resources: [str] = Depends(deps.get_published_resources),
+):
+    """Add, update and delete entries in one transaction.
+
+    Every operation gets a result, in order. A failed operation, for example because
+    of a version conflict, has `error` and `errorCode` set and doesn't affect the others.
+    """
+    if not resource_permissions.has_permission(PermissionLevel.write, user, [resource_id]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+    if resource_id not in published_resources:
+        raise ResourceNotFound(resource_id)
+    logger.info(
+        "executing batch",
+        extra={
+            "resource_id": resource_id,
+            "num_operations": len(data.operations),
+            "user": user.identifier,
+        },
+    )
+    results = entry_commands.execute_batch(
+        resource_id,
+        [
+            BatchOperation(
+                op=operation.op.value,
+                id=unique_id.parse(operation.id) if operation.id else None,
+                entry=operation.entry,
+                version=operation.version,
+                message=operation.message or None,
+            )
+            for operation in data.operations
+        ],
+        user=user.identifier,
+        wait_for_visibility=wait_for_visibility,
+    )
+    return schemas.EntryBatchResponse(
+        results=[
+            schemas.EntryBatchResult(
+                op=result.op,
+                id=result.id,
+                version=result.version,
+                error=result.error,
+                errorCode=result.error_code,
+            )
+            for result in results
+        ]
+    )
+
+
 @router.post(
     "/{resource_id}/{entry_id}",
     tags=["Editing"],
@@ -112,6 +183,10 @@ def update_entry(
     resource_id: str,
     entry_id: UniqueId,
     data: schemas.EntryUpdate,
+    wait_for_visibility: bool = Query(
+        True,
+        description="Wait until the change is visible in search results, otherwise it is indexed in the background",
+    ),
     user: User = Depends(deps.get_user),
     resource_permissions: ResourcePermissionQueries = Depends(deps.get_resource_permissions),
     entry_commands: EntryCommands = Depends(inject_from_req(EntryCommands)),
@@ -142,6 +217,7 @@ def update_entry(
             user=user.identifier,
             message=data.message,
             entry=data.entry,
+            wait_for_visibility=wait_for_visibility,
         )
 
         return schemas.EntryAddResponse(newID=entry.id)
@@ -178,6 +254,10 @@ def delete_entry(
     resource_id: str,
     entry_id: UniqueId,
     version: int,
+    wait_for_visibility: bool = Query(
+        True,
+        description="Wait until the change is visible in search results, otherwise it is indexed in the background",
+    ),
     user: User = Depends(deps.get_user),
     resource_permissions: ResourcePermissionQueries = Depends(deps.get_resource_permissions),
     entry_commands: EntryCommands = Depends(inject_from_req(EntryCommands)),
@@ -197,6 +277,7 @@ def delete_entry(
             _id=unique_id.parse(entry_id),
             user=user.identifier,
             version=version,
+            wait_for_visibility=wait_for_visibility,
         )
     except errors.EntryNotFound:
         return responses.JSONResponse(
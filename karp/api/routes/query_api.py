@@ -1,18 +1,22 @@
-import logging  # noqa: I001
+import json  # noqa: I001
+import logging
 from typing import List, Optional
 
+import pydantic
 from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
 from karp import auth, search
 from karp.auth.application import ResourcePermissionQueries
 from karp.lex.domain.errors import ResourceNotFound
 from karp.main import errors as karp_errors
 from karp.search.domain import QueryRequest
-from karp.search.domain.errors import IncompleteQuery
+from karp.search.domain.errors import IncompleteQuery, InvalidCursor
 
 from karp.api import dependencies as deps
 from karp.api.dependencies.fastapi_injector import inject_from_req
-from karp.search.infrastructure.es import EsSearchService
+from karp.search.infrastructure.es import AsyncEsSearchService
 
 
 logger = logging.getLogger(__name__)
@@ -26,7 +30,7 @@ router = APIRouter()
     description="Returns a list of entries matching the given ids",
     name="Get lexical entries by id",
 )
-def get_entries_by_id(
+async def get_entries_by_id(
     resource_id: str = Path(..., description="The resource to perform operation on"),
     entry_ids: str = Path(
         ...,
@@ -35,22 +39,24 @@ def get_entries_by_id(
     ),
     user: auth.User = Depends(deps.get_user_optional),
     resource_permissions: ResourcePermissionQueries = Depends(deps.get_resource_permissions),
-    search_service: EsSearchService = Depends(inject_from_req(EsSearchService)),
+    search_service: AsyncEsSearchService = Depends(inject_from_req(AsyncEsSearchService)),
     published_resources: [str] = Depends(deps.get_published_resources),
 ):
     logger.debug("karp_v6_api.views.get_entries_by_id")
-    if not resource_permissions.has_permission(auth.PermissionLevel.read, user, [resource_id]):
+    if not await run_in_threadpool(
+        resource_permissions.has_permission, auth.PermissionLevel.read, user, [resource_id]
+    ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions",
         )
     if resource_id not in published_resources:
         raise ResourceNotFound(resource_id)
-    return search_service.search_ids(resource_id, entry_ids)
+    return await search_service.search_ids(resource_id, entry_ids)
 
 
 @router.get("/stats/{resources}", name="Hits per resource, no entries in result")
-def query_stats(
+async def query_stats(
     resources: str = Path(
         ...,
         regex=r"^[a-z_0-9\-]+(,[a-z_0-9\-]+)*$",
@@ -63,11 +69,13 @@ def query_stats(
     ),
     user: auth.User = Depends(deps.get_user_optional),
     resource_permissions: ResourcePermissionQueries = Depends(deps.get_resource_permissions),
-    search_service: EsSearchService = Depends(inject_from_req(EsSearchService)),
+    search_service: AsyncEsSearchService = Depends(inject_from_req(AsyncEsSearchService)),
     published_resources: [str] = Depends(deps.get_published_resources),
 ):
     resource_list = resources.split(",")
-    if not resource_permissions.has_permission(auth.PermissionLevel.read, user, resource_list):
+    if not await run_in_threadpool(
+        resource_permissions.has_permission, auth.PermissionLevel.read, user, resource_list
+    ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions",
@@ -75,7 +83,7 @@ def query_stats(
     if any(resource not in published_resources for resource in resource_list):
         raise ResourceNotFound(resource_list)
     try:
-        response = search_service.query_stats(resource_list, q)
+        response = await search_service.query_stats(resource_list, q)
     except karp_errors.KarpError as err:
         logger.exception(
             "Error occured when calling '/query/stats'",
@@ -95,13 +103,166 @@ def query_stats(
     return response
 
 
+class MultiQueryItem(pydantic.BaseModel):
+    resources: List[str]
+    q: Optional[str] = None
+    from_: int = pydantic.Field(0, alias="from")
+    size: int = 25
+    sort: List[str] = pydantic.Field(default_factory=list)
+    lexicon_stats: bool = True
+    include_fields: Optional[List[str]] = None
+    exclude_fields: Optional[List[str]] = None
+
+    def to_query_request(self) -> QueryRequest:
+        return QueryRequest(
+            resource_ids=self.resources,
+            q=self.q,
+            from_=self.from_,
+            size=self.size,
+            sort=self.sort,
+            lexicon_stats=self.lexicon_stats,
+            include_fields=self.include_fields,
+            exclude_fields=self.exclude_fields,
+        )
+
+
+class MultiQueryResult(pydantic.BaseModel):
+    result: Optional[dict] = None
+    error: Optional[dict] = None
+
+
+@router.post(
+    "/_msearch",
+    name="Multi-query",
+    response_model=List[MultiQueryResult],
+)
+async def multi_query(
+    queries: List[MultiQueryItem],
+    user: auth.User = Depends(deps.get_user_optional),
+    resource_permissions: ResourcePermissionQueries = Depends(deps.get_resource_permissions),
+    search_service: AsyncEsSearchService = Depends(inject_from_req(AsyncEsSearchService)),
+    published_resources: [str] = Depends(deps.get_published_resources),
+):
+    """
+    Runs several queries, like `query` but without cursors, in one request.
+
+    Returns the results in the order of the queries. Every result has either a
+    `result`, like the response of `query`, or an `error` with the HTTP `status` that
+    `query` would have responded with, so a failing query doesn't fail the others.
+    """
+    max_items = search_service.settings.multi_query_max_items
+    if len(queries) > max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {max_items} queries are allowed",
+        )
+    permitted = await run_in_threadpool(
+        lambda: [
+            resource_permissions.has_permission(auth.PermissionLevel.read, user, query.resources)
+            for query in queries
+        ]
+    )
+    items = []
+    requests = []
+    for query, is_permitted in zip(queries, permitted):
+        item = {"result": None, "error": None}
+        if not is_permitted:
+            item["error"] = {"status": 403, "message": "Not enough permissions"}
+        elif any(resource not in published_resources for resource in query.resources):
+            item["error"] = {
+                "status": 404,
+                "message": "One of the given resources do not exist.",
+            }
+        else:
+            requests.append((item, query.to_query_request()))
+        items.append(item)
+    results = await search_service.multi_query_items([request for _, request in requests])
+    for (item, _), result in zip(requests, results):
+        item.update(result)
+    return items
+
+
+@router.get(
+    "/{resources}/_export",
+    name="Export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+async def export(
+    resources: str = Path(
+        ...,
+        regex=r"^[a-z_0-9\-]+(,[a-z_0-9\-]+)*$",
+        description="A comma-separated list of resource identifiers",
+    ),
+    q: Optional[str] = Query(
+        None,
+        title="query",
+        description="The query. If missing, all entries in chosen resource(s) will be returned.",
+    ),
+    sort: List[str] = Query(
+        [],
+        description="The `field` to sort by. If missing, default order for each resource will be used.",
+        regex=r"^[a-zA-Z0-9_\-]+(\|asc|desc)?",
+    ),
+    include_fields: Optional[List[str]] = Query(
+        None, description="Comma-separated list of which fields to return"
+    ),
+    exclude_fields: Optional[List[str]] = Query(
+        None, description="Comma-separated list of which fields to remove from result"
+    ),
+    user: auth.User = Depends(deps.get_user_optional),
+    resource_permissions: ResourcePermissionQueries = Depends(deps.get_resource_permissions),
+    search_service: AsyncEsSearchService = Depends(inject_from_req(AsyncEsSearchService)),
+    published_resources: [str] = Depends(deps.get_published_resources),
+):
+    """
+    Returns all entries matching the given query in the given resources, as
+    newline-delimited JSON with one hit (like in `query`) per line.
+
+    The entries are streamed as they are read, so the response can be arbitrarily large.
+    """
+    resource_list = resources.split(",")
+    if not await run_in_threadpool(
+        resource_permissions.has_permission, auth.PermissionLevel.read, user, resource_list
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+    if any(resource not in published_resources for resource in resource_list):
+        raise ResourceNotFound(resource_list)
+    query_request = QueryRequest(
+        resource_ids=resource_list,
+        q=q,
+        sort=sort,
+        include_fields=include_fields,
+        exclude_fields=exclude_fields,
+    )
+    try:
+        hits = await search_service.export(query_request)
+    except IncompleteQuery as err:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "errorCode": karp_errors.ClientErrorCodes.SEARCH_INCOMPLETE_QUERY,
+                "message": "Error in query",
+                "failing_query": err.failing_query,
+                "error_description": err.error_description,
+            },
+        ) from None
+    return StreamingResponse(
+        (json.dumps(hit, ensure_ascii=False) + "\n" async for hit in hits),
+        media_type="application/x-ndjson",
+    )
+
+
 @router.get(
     "/{resources}",
     # summary="Returns a list of entries matching the given query in the given resources. The results are mixed from the given resources.",
     name="Query",
     responses={200: {"content": {"application/json": {}}}},
 )
-def query(
+async def query(
     resources: str = Path(
         ...,
         regex=r"^[a-z_0-9\-]+(,[a-z_0-9\-]+)*$",
@@ -128,9 +289,15 @@ def query(
     exclude_fields: Optional[List[str]] = Query(
         None, description="Comma-separated list of which fields to remove from result"
     ),
+    cursor: Optional[str] = Query(
+        None,
+        description="Page through the hits with cursors instead of `from`. Use `*` to get"
+        " the first page, and the `cursor` of the response to get the next page, with"
+        " the same query. The `cursor` of the last page is null.",
+    ),
     user: auth.User = Depends(deps.get_user_optional),
     resource_permissions: ResourcePermissionQueries = Depends(deps.get_resource_permissions),
-    search_service: EsSearchService = Depends(inject_from_req(EsSearchService)),
+    search_service: AsyncEsSearchService = Depends(inject_from_req(AsyncEsSearchService)),
     published_resources: [str] = Depends(deps.get_published_resources),
 ):
     """
@@ -142,7 +309,9 @@ def query(
         extra={"resources": resources, "from": from_, "size": size},
     )
     resource_list = resources.split(",")
-    if not resource_permissions.has_permission(auth.PermissionLevel.read, user, resource_list):
+    if not await run_in_threadpool(
+        resource_permissions.has_permission, auth.PermissionLevel.read, user, resource_list
+    ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions",
@@ -158,10 +327,11 @@ def query(
         include_fields=include_fields,
         exclude_fields=exclude_fields,
         lexicon_stats=lexicon_stats,
+        cursor=cursor,
     )
     try:
         logger.debug(f"{search_service=}")
-        response = search_service.query(query_request)
+        response = await search_service.query(query_request)
 
     except karp_errors.KarpError as err:
         logger.exception(
@@ -179,4 +349,13 @@ def query(
                 "error_description": err.error_description,
             },
         )
+    except InvalidCursor as err:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "errorCode": karp_errors.ClientErrorCodes.SEARCH_INVALID_CURSOR,
+                "message": "Invalid cursor",
+                "error_description": err.error_description,
+            },
+        ) from None
     return response
@@ -1,3 +1,5 @@
+import dataclasses
+import json
 import logging
 import typing
 
@@ -6,16 +8,22 @@ from fastapi import (
     APIRouter,
     Depends,
     HTTPException,
+    Query,
     status,
 )
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
 from karp import auth
 from karp.api import dependencies as deps
 from karp.api.dependencies.fastapi_injector import inject_from_req
 from karp.auth.application import ResourcePermissionQueries
+from karp.foundation import cache
 from karp.foundation.value_objects import PermissionLevel
 from karp.lex.domain.errors import ResourceNotFound
-from karp.search.infrastructure.es import EsSearchService
+from karp.main import errors as karp_errors
+from karp.search.domain.errors import InvalidCursor
+from karp.search.infrastructure.es import AsyncEsSearchService
 
 logger = logging.getLogger(__name__)
 
@@ -28,19 +36,73 @@ class StatisticsDto(pydantic.BaseModel):
     count: int
 
 
+class StatisticsPageDto(pydantic.BaseModel):
+    values: typing.List[StatisticsDto]
+    after: typing.Optional[str] = None
+
+
+class CacheStatsDto(pydantic.BaseModel):
+    hits: int
+    misses: int
+    size: int
+    maxsize: int
+    nbytes: int
+    maxbytes: typing.Optional[int] = None
+    hit_rate: float
+
+
+@router.get("/_caches", response_model=typing.Dict[str, CacheStatsDto])
+def get_cache_stats(
+    user: auth.User = Depends(deps.get_user),
+    resource_permissions: ResourcePermissionQueries = Depends(deps.get_resource_permissions),
+    published_resources: [str] = Depends(deps.get_published_resources),
+):
+    """Hits, misses and sizes of the caches in this process.
+
+    The caches hold data of all resources, so admin permission for all of them is needed.
+    """
+    if not resource_permissions.has_permission(PermissionLevel.admin, user, published_resources):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+    return {
+        name: CacheStatsDto(hit_rate=stats.hit_rate, **dataclasses.asdict(stats))
+        for name, stats in cache.cache_stats().items()
+    }
+
+
 @router.get(
     "/{resource_id}/{field}",
-    response_model=typing.List[StatisticsDto],
+    response_model=typing.Union[typing.List[StatisticsDto], StatisticsPageDto],
+    responses={200: {"content": {"application/x-ndjson": {}}}},
 )
-def get_field_values(
+async def get_field_values(
     resource_id: str,
     field: str,
+    size: typing.Optional[int] = Query(
+        None, ge=1, le=10000, description="Return at most this many values per page"
+    ),
+    after: typing.Optional[str] = Query(
+        None, description="The `after` of the previous page, to get the next page"
+    ),
+    stream: bool = Query(False, description="Stream all values as newline-delimited JSON"),
     user: auth.User = Depends(deps.get_user_optional),
     resource_permissions: ResourcePermissionQueries = Depends(deps.get_resource_permissions),
-    search_service: EsSearchService = Depends(inject_from_req(EsSearchService)),
+    search_service: AsyncEsSearchService = Depends(inject_from_req(AsyncEsSearchService)),
     published_resources: [str] = Depends(deps.get_published_resources),
 ):
-    if not resource_permissions.has_permission(PermissionLevel.read, user, [resource_id]):
+    """
+    Returns the values of `field` in the resource and the number of entries with each
+    value, most common first.
+
+    If `size` or `after` is given, the values are instead returned in pages ordered by
+    value, with an `after` cursor for the next page, which is null on the last page. If
+    `stream` is true, all values are streamed ordered by value, one per line.
+    """
+    if not await run_in_threadpool(
+        resource_permissions.has_permission, PermissionLevel.read, user, [resource_id]
+    ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions",
@@ -48,4 +110,24 @@ def get_field_values(
     if resource_id not in published_resources:
         raise ResourceNotFound(resource_id)
     logger.debug(f"calling statistics ... from {search_service=}")
-    return search_service.statistics(resource_id, field)
+    if stream:
+        return StreamingResponse(
+            (
+                json.dumps(value, ensure_ascii=False) + "\n"
+                async for value in search_service.iter_statistics(resource_id, field)
+            ),
+            media_type="application/x-ndjson",
+        )
+    if size is None and after is None:
+        return await search_service.statistics(resource_id, field)
+    try:
+        return await search_service.statistics_page(resource_id, field, size or 1000, after)
+    except InvalidCursor as err:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "errorCode": karp_errors.ClientErrorCodes.SEARCH_INVALID_CURSOR,
+                "message": "Invalid cursor",
+                "error_description": err.error_description,
+            },
+        ) from None
@@ -35,6 +35,47 @@ class EntryAddResponse(BaseModel):
     newID: unique_id.UniqueIdStr
 
 
+class EntryBatchOp(str, Enum):
+    add = "add"
+    update = "update"
+    delete = "delete"
+
+
+class EntryBatchOperation(BaseModel):
+    op: EntryBatchOp
+    id: Optional[unique_id.UniqueIdStr] = None
+    entry: Optional[Dict] = None
+    version: Optional[int] = None
+    message: str = ""
+
+    @pydantic.root_validator(skip_on_failure=True)
+    def check_fields_for_op(cls, values):  # noqa: N805
+        op = values["op"]
+        if op in (EntryBatchOp.add, EntryBatchOp.update) and values.get("entry") is None:
+            raise ValueError(f"'entry' is required for '{op.value}'")
+        if op in (EntryBatchOp.update, EntryBatchOp.delete) and (
+            values.get("id") is None or values.get("version") is None
+        ):
+            raise ValueError(f"'id' and 'version' are required for '{op.value}'")
+        return values
+
+
+class EntryBatch(BaseModel):
+    operations: pydantic.conlist(EntryBatchOperation, max_items=10_000)
+
+
+class EntryBatchResult(BaseModel):
+    op: EntryBatchOp
+    id: Optional[unique_id.UniqueIdStr] = None
+    version: Optional[int] = None
+    error: Optional[str] = None
+    errorCode: Optional[int] = None  # noqa: N815
+
+
+class EntryBatchResponse(BaseModel):
+    results: typing.List[EntryBatchResult]
+
+
 class ResourcePublic(BaseModel):
     id: unique_id.UniqueIdStr
     resource_id: str
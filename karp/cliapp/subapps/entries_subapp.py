@@ -1,7 +1,9 @@
 import collections.abc  # noqa: I001
+import contextlib
 import logging
 from pathlib import Path
 import sys
+import time
 from typing import Iterable, Optional
 
 
@@ -10,14 +12,19 @@ import json_streams.jsonlib
 from sb_json_tools import jt_val
 import typer
 
+from tabulate import tabulate
 from tqdm import tqdm
 
-from karp.entry_commands import EntryCommands
+from karp.entry_commands import BatchOperation, EntryCommands
+from karp.foundation.value_objects import unique_id
 from karp.lex.domain.value_objects import entry_schema
 
 from karp.cliapp.utility import cli_error_handler, cli_timer
 from karp.cliapp.typer_injector import inject_from_ctx
 from karp.lex.application import ResourceQueries, EntryQueries
+from karp.main.errors import ClientErrorCodes
+from karp.search.infrastructure.es import BulkIndexReport
+from karp.search_commands import SearchCommands
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +32,20 @@ logger = logging.getLogger(__name__)
 subapp = typer.Typer()
 
 
+def _exit_on_index_failures(resource_id: str, report: BulkIndexReport) -> None:
+    """Print the entries that were saved but failed to be indexed, and exit with 1."""
+    if not report.failures:
+        return
+    typer.echo(f"Failed to index {len(report.failures)} entries in {resource_id}:", err=True)
+    for failure in report.failures:
+        typer.echo(f"{failure.id}\t{failure.status}\t{failure.error}", err=True)
+    typer.echo(
+        "The entries are saved, run `karp-cli entries index-outbox` to index them again",
+        err=True,
+    )
+    raise typer.Exit(1)
+
+
 @subapp.command("add")
 @cli_error_handler
 @cli_timer
@@ -36,26 +57,24 @@ def add_entries_to_resource(
     chunk_size: int = 1000,
     user: Optional[str] = typer.Option(None),
     message: Optional[str] = typer.Option(None),
+    validation_workers: int = typer.Option(
+        0,
+        help="Validate the entries in this many worker processes (0 validates in this process)",
+    ),
 ):
     entry_commands = inject_from_ctx(EntryCommands, ctx)
     user = user or "local admin"
     message = message or "imported through cli"
     entries = tqdm(json_streams.load_from_file(data), desc="Adding", unit=" entries")
-    if chunked:
-        entry_commands.add_entries_in_chunks(
-            resource_id=resource_id,
-            chunk_size=chunk_size,
-            entries=entries,
-            user=user,
-            message=message,
-        )
-    else:
-        entry_commands.add_entries(
-            resource_id=resource_id,
-            entries=entries,
-            user=user,
-            message=message,
-        )
+    report = entry_commands.add_entries_in_chunks(
+        resource_id=resource_id,
+        chunk_size=chunk_size if chunked else 0,
+        entries=entries,
+        user=user,
+        message=message,
+        validation_workers=validation_workers,
+    )
+    _exit_on_index_failures(resource_id, report)
     typer.echo(f"Successfully added entries to {resource_id}")
 
 
@@ -70,34 +89,113 @@ def import_entries_to_resource(
     chunk_size: int = 1000,
     user: Optional[str] = typer.Option(None),
     message: Optional[str] = typer.Option(None),
+    validation_workers: int = typer.Option(
+        0,
+        help="Validate the entries in this many worker processes (0 validates in this process)",
+    ),
 ):
     entry_commands = inject_from_ctx(EntryCommands, ctx)
     user = user or "local admin"
     message = message or "imported through cli"
     entries = tqdm(json_streams.load_from_file(data), desc="Importing", unit=" entries")
-    if chunked:
-        entry_commands.import_entries_in_chunks(
-            resource_id=resource_id,
-            chunk_size=chunk_size,
-            entries=entries,
-            user=user,
-            message=message,
-        )
-    else:
-        entry_commands.import_entries(
-            resource_id=resource_id,
-            entries=entries,
-            user=user,
-            message=message,
-        )
+    report = entry_commands.import_entries_in_chunks(
+        resource_id=resource_id,
+        chunk_size=chunk_size if chunked else 0,
+        entries=entries,
+        user=user,
+        message=message,
+        validation_workers=validation_workers,
+    )
+    _exit_on_index_failures(resource_id, report)
     typer.echo(f"Successfully imported entries to {resource_id}")
 
 
 @subapp.command("update")
 @cli_error_handler
 @cli_timer
-def update_entries(resource_id: str, data: Path):
-    raise NotImplementedError("")
+def update_entries(
+    ctx: typer.Context,
+    resource_id: str,
+    data: Path,
+    chunk_size: int = typer.Option(
+        1000, help="Number of entries that are committed and indexed together"
+    ),
+    errors: Optional[Path] = typer.Option(
+        None, help="File to write failed updates to [default: <DATA>.errors.jsonl]"
+    ),
+    user: Optional[str] = typer.Option(None),
+    message: Optional[str] = typer.Option(None),
+):
+    """Update entries from a file of `{"id": ..., "version": ..., "entry": {...}}` records.
+
+    `version` is the version that the update is based on, an update of an entry that has
+    been changed since then is a conflict. Failed updates are written to `--errors`
+    together with the error, so they can be fixed and run again.
+    """
+    entry_commands = inject_from_ctx(EntryCommands, ctx)
+    user = user or "local admin"
+    message = message or "updated through cli"
+    errors = errors or Path(f"{data}.errors.jsonl")
+    records = tqdm(json_streams.load_from_file(data), desc="Updating", unit=" entries")
+    counts = collections.Counter()
+
+    def operations(report_error):
+        for record in records:
+            try:
+                entry_id = unique_id.parse(record.get("id"))
+            except ValueError as err:
+                # a row without a valid id is reported like a failed update, instead
+                # of aborting the rows after it
+                report_error(
+                    {
+                        **record,
+                        "error": f"invalid id: {err}",
+                        "errorCode": ClientErrorCodes.ENTRY_NOT_VALID,
+                    }
+                )
+                continue
+            yield (
+                resource_id,
+                BatchOperation(
+                    op="update",
+                    id=entry_id,
+                    entry=record.get("entry"),
+                    version=record.get("version"),
+                    message=record.get("message") or message,
+                ),
+            )
+
+    with contextlib.ExitStack() as stack:
+        error_sink = None
+
+        def report_error(row: dict) -> None:
+            # the errors file is only created if an update fails
+            nonlocal error_sink
+            if error_sink is None:
+                error_sink = stack.enter_context(json_streams.sink_from_file(errors))
+            counts["failed"] += 1
+            error_sink.send(row)
+
+        results = entry_commands.execute_batches(
+            operations(report_error), user=user, transaction_size=chunk_size
+        )
+        for _, operation, result in results:
+            if result.error is None:
+                counts["updated"] += 1
+                continue
+            report_error(
+                {
+                    "id": str(operation.id),
+                    "version": operation.version,
+                    "entry": operation.entry,
+                    "error": result.error,
+                    "errorCode": result.error_code,
+                }
+            )
+    typer.echo(f"Updated {counts['updated']} entries in {resource_id}")
+    if counts["failed"]:
+        typer.echo(f"{counts['failed']} updates failed, see \"{errors}\"", err=True)
+        raise typer.Exit(1)
 
 
 @subapp.command("export")
@@ -126,31 +224,101 @@ def export_entries(
 def batch_entries(
     ctx: typer.Context,
     data: Path,
+    transaction_size: int = typer.Option(
+        1000, help="Max number of commands that are committed and indexed together"
+    ),
+    user: Optional[str] = typer.Option(None, help="User for commands that don't give one"),
 ):
     """Run entry-commands in batch.
 
     This command expects a list with dicts with the key `cmd` that is a serialized
     command that defines `cmdtype`.
 
+    Consecutive commands on the same resource are run in transactions of at most
+    `--transaction-size` commands, that are indexed with one bulk request each.
+    Commands that fail, e.g. because of a version conflict, are reported and don't
+    stop the other commands.
+
     > Example:
 
     > `[{"cmd": {"cmdtype": "add_entry","resourceId": "resource_a","entry": {"baseform": "sko"},"message": "add sko","user": "alice@example.com"}}]`
     """
     logger.info("run entries command in batch")
     entry_commands = inject_from_ctx(EntryCommands, ctx)  # type: ignore[type-abstract]
-    for cmd_outer in json_streams.load_from_file(data):
-        cmd = cmd_outer["cmd"]
-        command_type = cmd["cmdtype"]
-        del cmd["cmdtype"]
-        if "id" in cmd:
-            cmd["_id"] = cmd["id"]
-            del cmd["id"]
-        if command_type == "add_entry":
-            entry_commands.add_entry(**cmd)
-        elif command_type == "update_entry":
-            entry_commands.update_entry(**cmd)
-        elif command_type == "delete_entry":
-            entry_commands.delete_entry(**cmd)
+    commands = tqdm(json_streams.load_from_file(data), desc="Running", unit=" commands")
+    results = entry_commands.execute_batches(
+        (_batch_operation(cmd_outer["cmd"]) for cmd_outer in commands),
+        user=user or "local admin",
+        transaction_size=transaction_size,
+    )
+    summary = collections.defaultdict(collections.Counter)
+    for i, (resource_id, operation, result) in enumerate(results):
+        if result.error is None:
+            summary[resource_id]["ok"] += 1
+            continue
+        if result.error_code == ClientErrorCodes.VERSION_CONFLICT:
+            summary[resource_id]["conflicts"] += 1
+        else:
+            summary[resource_id]["errors"] += 1
+        typer.echo(
+            f"command {i} ({operation.op} {operation.id or ''} in {resource_id}): {result.error}",
+            err=True,
+        )
+
+    typer.echo(
+        tabulate(
+            [
+                [resource_id, counts["ok"], counts["conflicts"], counts["errors"]]
+                for resource_id, counts in summary.items()
+            ],
+            headers=["resource", "ok", "conflicts", "errors"],
+        )
+    )
+    if any(counts["conflicts"] or counts["errors"] for counts in summary.values()):
+        raise typer.Exit(1)
+
+
+_BATCH_OPS = {"add_entry": "add", "update_entry": "update", "delete_entry": "delete"}
+
+
+def _batch_operation(cmd: dict) -> tuple[str, BatchOperation]:
+    """Convert a serialized entry-command to `(resource_id, operation)`."""
+    entity_id = cmd.get("id") or cmd.get("_id")
+    return cmd.get("resource_id") or cmd.get("resourceId"), BatchOperation(
+        op=_BATCH_OPS.get(cmd["cmdtype"], cmd["cmdtype"]),
+        id=unique_id.parse(entity_id) if entity_id else None,
+        entry=cmd.get("entry"),
+        version=cmd.get("version"),
+        message=cmd.get("message"),
+        user=cmd.get("user"),
+    )
+
+
+@subapp.command("index-outbox")
+@cli_error_handler
+@cli_timer
+def index_outbox(
+    ctx: typer.Context,
+    batch_size: int = 1000,
+    max_attempts: int = 10,
+    watch: bool = typer.Option(False, "--watch", help="Keep on polling the outbox"),
+    interval: float = typer.Option(1.0, help="Seconds between polls when using --watch"),
+):
+    """Index entries that are written to the database but not yet to the index.
+
+    Entry edits that are made without waiting for visibility, or whose indexing
+    failed, are kept in an outbox until they are indexed by this command.
+    """
+    search_commands = inject_from_ctx(SearchCommands, ctx)
+    while True:
+        num_processed = search_commands.drain_index_outbox(
+            batch_size=batch_size, max_attempts=max_attempts
+        )
+        if num_processed or not watch:
+            typer.echo(f"Indexed {num_processed} entries from the outbox")
+        if not watch:
+            break
+        time.sleep(interval)
 
 
 class Counter(collections.abc.Generator):
@@ -1,10 +1,12 @@
 import logging  # noqa: I001
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Callable, List, Optional, TypeVar
 
 import typer
 from json_streams import jsonlib
 from tabulate import tabulate
+from tqdm import tqdm
 
 from karp.foundation.value_objects import UniqueIdStr, unique_id
 from karp.lex.application import ResourceQueries
@@ -112,22 +114,96 @@ def publish(ctx: typer.Context, resource_id: str, version: Optional[int] = None)
     typer.echo(f"Resource '{resource_id}' is published ")
 
 
+def _utc_timestamp(value: datetime) -> float:
+    """The timestamp of a time, where a time without a timezone is in UTC.
+
+    `datetime.timestamp` would read it as local time, which would move the time by the
+    UTC offset of the host, and could skip entries.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
 @subapp.command()
 @cli_error_handler
 @cli_timer
-def reindex(ctx: typer.Context, resource_id: str, remove_old_index: Optional[bool] = False):
+def reindex(
+    ctx: typer.Context,
+    resource_id: str,
+    remove_old_index: Optional[bool] = False,
+    fast: bool = typer.Option(
+        False,
+        help="Build the new index without replicas and restore them before switching to it",
+    ),
+    since: Optional[datetime] = typer.Option(
+        None,
+        help="Only index the entries that are modified after this time (in UTC),"
+        " in the current index",
+    ),
+    incremental: bool = typer.Option(
+        False,
+        help="Only index the entries that are modified after the last reindex",
+    ),
+):
     search_commands = inject_from_ctx(SearchCommands, ctx)
-    search_commands.reindex_resource(resource_id=resource_id, remove_old_index=remove_old_index)
+    if since or incremental:
+        report = search_commands.reindex_resource_since(
+            resource_id=resource_id, since=_utc_timestamp(since) if since else None
+        )
+    else:
+        report = search_commands.reindex_resource(
+            resource_id=resource_id, remove_old_index=remove_old_index, fast=fast
+        )
+    if report.failures:
+        typer.echo(f"Failed to index {len(report.failures)} entries in {resource_id}:", err=True)
+        for failure in report.failures:
+            typer.echo(f"{failure.id}\t{failure.status}\t{failure.error}", err=True)
+        raise typer.Exit(1)
     typer.echo(f"Successfully reindexed all data in {resource_id}")
 
 
 @subapp.command()
 @cli_error_handler
 @cli_timer
-def reindex_all(ctx: typer.Context):
+def reindex_all(
+    ctx: typer.Context,
+    workers: int = typer.Option(1, help="Number of resources to reindex concurrently"),
+    remove_old_index: bool = False,
+    fast: bool = typer.Option(
+        False,
+        help="Build the new indices without replicas and restore them before switching to them",
+    ),
+):
     search_commands = inject_from_ctx(SearchCommands, ctx)
-    search_commands.reindex_all_resources()
-    typer.echo(f"Successfully reindexed all resrouces")
+    with tqdm(desc="Reindexing", unit=" resources") as progress:
+
+        def on_done(result):
+            status = "ok" if result.ok else "FAILED"
+            progress.write(f"{result.resource_id}: {status} ({result.seconds:.1f}s)")
+            progress.update()
+
+        results = search_commands.reindex_all_resources(
+            workers=workers, remove_old_index=remove_old_index, fast=fast, on_done=on_done
+        )
+    typer.echo(
+        tabulate(
+            [
+                [
+                    result.resource_id,
+                    result.num_indexed,
+                    len(result.failed_ids),
+                    f"{result.seconds:.1f}",
+                    result.error or "",
+                ]
+                for result in results
+            ],
+            headers=["resource", "indexed", "failed", "seconds", "error"],
+        )
+    )
+    if not all(result.ok for result in results):
+        raise typer.Exit(1)
+    typer.echo("Successfully reindexed all resources")
 
 
 @subapp.command("list")
@@ -1,20 +1,61 @@
-from typing import Any, Generator, Iterable, Iterator
+import logging
+from dataclasses import dataclass
+from typing import Any, Generator, Iterable, Iterator, Optional
 
 from injector import inject
 from sqlalchemy.orm import Session
 
 from karp import plugins
+from karp.foundation import batch
 from karp.foundation.timings import utc_now
 from karp.foundation.value_objects import unique_id
 from karp.lex import EntryDto
-from karp.lex.domain.entities import Resource
-from karp.lex.domain.errors import EntryNotFound, ResourceNotFound
-from karp.lex.infrastructure import EntryRepository, ResourceRepository
+from karp.lex.domain.entities import Entry, Resource
+from karp.lex.domain.errors import (
+    DiscardedEntityError,
+    EntryNotFound,
+    InvalidEntry,
+    LexDomainError,
+    LexValueError,
+    ResourceNotFound,
+    UpdateConflict,
+)
+from karp.lex.infrastructure import (
+    EntryRepository,
+    IndexOutbox,
+    ResourceRepository,
+    parallel_validation,
+)
+from karp.main.errors import ClientErrorCodes
 from karp.plugins import Plugins
 from karp.search.domain.index_entry import IndexEntry
-from karp.search.infrastructure.es.indices import EsIndex
+from karp.search.infrastructure.es import BulkIndexReport, EsIndex, WriteVisibility
 from karp.search.infrastructure.transformers import entry_transformer
 
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchOperation:
+    """One operation in `EntryCommands.execute_batch`."""
+
+    op: str  # "add", "update" or "delete"
+    id: Optional[unique_id.UniqueId] = None
+    entry: Optional[dict] = None
+    version: Optional[int] = None
+    message: Optional[str] = None
+    # the user doing the operation, if not the user of the batch
+    user: Optional[str] = None
+
+
+@dataclass
+class BatchResult:
+    op: str
+    id: Optional[unique_id.UniqueId] = None
+    version: Optional[int] = None
+    error: Optional[str] = None
+    error_code: Optional[int] = None
+
 
 class EntryCommands:
     @inject
@@ -24,11 +65,13 @@ class EntryCommands:
         resources: ResourceRepository,
         index: EsIndex,
         plugins: Plugins,
+        outbox: IndexOutbox,
     ):
         self.session = session
         self.resources: ResourceRepository = resources
         self.index = index
         self.plugins = plugins
+        self.outbox = outbox
 
     def _get_resource(self, resource_id: unique_id.UniqueId) -> Resource:
         if not isinstance(resource_id, str):
@@ -55,10 +98,20 @@ class EntryCommands:
         entries = plugins.transform_entries(self.plugins, config, entries)
         return (entry_transformer.transform(config, entry) for entry in entries)
 
-    def add_entries_in_chunks(self, resource_id, chunk_size, entries, user, message):
+    def add_entries_in_chunks(
+        self, resource_id, chunk_size, entries, user, message, validation_workers=0
+    ):
         """
         Add entries to DB and INDEX (if present and resource is active).
 
+        The entries are streamed in chunks of `chunk_size` entries: each chunk is
+        committed to the DB and then indexed before the next chunk is read, so
+        memory usage is bounded by the chunk size and DB and INDEX are consistent
+        up to the last finished chunk.
+
+        If `validation_workers` > 0, the entries are validated in that many worker
+        processes before they are added.
+
         Raises
         ------
         RuntimeError
@@ -69,41 +122,65 @@ class EntryCommands:
 
         Returns
         -------
-        List
-            List of the id's of the created entries.
+        BulkIndexReport
+            The indexing of the added entries. Entries that failed to be indexed are
+            added to the DB and left in the index outbox, to be retried by
+            `SearchCommands.drain_index_outbox`.
         """
-
-        created_db_entries = []
         resource = self._get_resource(resource_id)
+        entries = self._create_entries(resource, entries, user, message, validation_workers)
+        report = BulkIndexReport()
+        for _ in self._add_entries_streaming(resource, chunk_size, entries, report=report):
+            pass
+        return report
+
+    def add_entries(
+        self, resource_id, entries, user, message, validation_workers=0, wait_for_visibility=True
+    ):
+        """
+        Add entries to DB and INDEX in one chunk.
 
-        entry_table = self._get_entries(resource_id)
-        for i, entry_raw in enumerate(entries):
-            entry = resource.create_entry_from_dict(
-                entry_raw,
-                user=user,
-                message=message,
-                id=unique_id.make_unique_id(),
-            )
-            entry_table.save(entry)
-            created_db_entries.append(EntryDto.from_entry(entry))
-
-            if chunk_size > 0 and i % chunk_size == 0:
-                self.session.commit()
-        self.session.commit()
-        self._entry_added_handler(resource, created_db_entries)
-
-        return created_db_entries
-
-    def add_entries(self, resource_id, entries, user, message):
-        return self.add_entries_in_chunks(resource_id, 0, entries, user, message)
+        If `wait_for_visibility` is False, the entries are only added to the index outbox
+        and are indexed later by `SearchCommands.drain_index_outbox`.
 
-    def import_entries(self, resource_id, entries, user, message):
-        return self.import_entries_in_chunks(resource_id, 0, entries, user, message)
+        Returns
+        -------
+        List
+            List of the created entries.
+        """
+        resource = self._get_resource(resource_id)
+        entries = self._create_entries(resource, entries, user, message, validation_workers)
+        return [
+            entry_dto
+            for chunk in self._add_entries_streaming(resource, 0, entries, wait_for_visibility)
+            for entry_dto in chunk
+        ]
+
+    def import_entries(self, resource_id, entries, user, message, validation_workers=0):
+        """
+        Import entries to DB and INDEX in one chunk.
 
-    def import_entries_in_chunks(self, resource_id, chunk_size, entries, user, message):
+        Returns
+        -------
+        List
+            List of the created entries.
+        """
+        resource = self._get_resource(resource_id)
+        entries = self._import_entries(resource, entries, user, message, validation_workers)
+        return [
+            entry_dto
+            for chunk in self._add_entries_streaming(resource, 0, entries)
+            for entry_dto in chunk
+        ]
+
+    def import_entries_in_chunks(
+        self, resource_id, chunk_size, entries, user, message, validation_workers=0
+    ):
         """
         Import entries to DB and INDEX (if present and resource is active).
 
+        The entries are streamed in chunks in the same way as in `add_entries_in_chunks`.
+
         Raises
         ------
         RuntimeError
@@ -114,39 +191,114 @@ class EntryCommands:
 
         Returns
         -------
-        List
-            List of the id's of the created entries.
+        BulkIndexReport
+            The indexing of the imported entries, see `add_entries_in_chunks`.
         """
-
-        created_db_entries = []
         resource = self._get_resource(resource_id)
-        entry_table = self._get_entries(resource_id)
+        entries = self._import_entries(resource, entries, user, message, validation_workers)
+        report = BulkIndexReport()
+        for _ in self._add_entries_streaming(resource, chunk_size, entries, report=report):
+            pass
+        return report
+
+    def _create_entries(
+        self, resource, entries, user, message, validation_workers=0
+    ) -> Iterator[Entry]:
+        for entry_raw in self._validate_entries(resource, entries, validation_workers):
+            yield resource.create_entry_from_dict(
+                entry_raw,
+                user=user,
+                message=message,
+                id=unique_id.make_unique_id(),
+                validate=not validation_workers,
+            )
 
-        for i, entry_raw in enumerate(entries):
-            entry = resource.create_entry_from_dict(
+    def _import_entries(
+        self, resource, entries, user, message, validation_workers=0
+    ) -> Iterator[Entry]:
+        entries = self._validate_entries(
+            resource, entries, validation_workers, key=lambda entry_raw: entry_raw["entry"]
+        )
+        for entry_raw in entries:
+            yield resource.create_entry_from_dict(
                 entry_raw["entry"],
                 user=entry_raw.get("user") or user,
                 message=entry_raw.get("message") or message,
                 id=entry_raw.get("id") or unique_id.make_unique_id(),
                 timestamp=entry_raw.get("last_modified"),
+                validate=not validation_workers,
             )
-            entry_table.save(entry)
 
-            created_db_entries.append(EntryDto.from_entry(entry))
+    def _validate_entries(
+        self, resource: Resource, entries: Iterable, validation_workers: int, key=None
+    ) -> Iterator:
+        """Validate the entries in a process pool, if `validation_workers` > 0.
 
-            if chunk_size > 0 and i % chunk_size == 0:
-                self.session.commit()
-        self.session.commit()
-        self._entry_added_handler(resource, created_db_entries)
+        The entries are yielded in order and the first invalid entry raises `InvalidEntry`.
+        """
+        if validation_workers <= 0:
+            yield from entries
+            return
 
-        return created_db_entries
+        validated_entries = parallel_validation.validate_entries(
+            resource.entry_schema.json_schema, entries, workers=validation_workers, key=key
+        )
+        for i, (entry_raw, error) in enumerate(validated_entries):
+            if error is not None:
+                logger.warning(
+                    "Entry not valid",
+                    extra={"entry": entry_raw, "index": i, "error_message": error},
+                )
+                raise InvalidEntry(f"Entry number {i} is not valid: {error}")
+            yield entry_raw
+
+    def _add_entries_streaming(
+        self,
+        resource: Resource,
+        chunk_size: int,
+        entries: Iterable[Entry],
+        wait_for_visibility: bool = True,
+        report: Optional[BulkIndexReport] = None,
+    ) -> Iterator[list[EntryDto]]:
+        """Save, commit and index the entries one chunk at a time.
+
+        Yields the created entries of each chunk after it is committed and indexed. The
+        indexing of every chunk is merged into `report`, if given.
+        """
+        # When streaming many chunks, the index is refreshed once at the end instead of per chunk,
+        # and the outbox rows of an indexed chunk are removed in the transaction of the next chunk
+        visibility = WriteVisibility.NONE if chunk_size > 0 else None
+        entry_table = self._get_entries(resource.resource_id)
+        for chunk in batch.chunk_items(entries, chunk_size):
+            entry_table.save_many(chunk)
+            entity_ids = [entry.id for entry in chunk]
+            outbox_ids = self.outbox.add(resource.resource_id, entity_ids)
+            self.session.commit()
+            created_db_entries = [EntryDto.from_entry(entry) for entry in chunk]
+            if wait_for_visibility:
+                chunk_report = self._entry_added_handler(
+                    resource, created_db_entries, visibility=visibility
+                )
+                self._remove_from_outbox(
+                    entity_ids, outbox_ids, chunk_report, commit=chunk_size <= 0
+                )
+                if report is not None:
+                    report.merge(chunk_report)
+            yield created_db_entries
+        if wait_for_visibility and visibility == WriteVisibility.NONE:
+            self.session.commit()
+            self.index.refresh(resource.resource_id)
 
-    def add_entry(self, resource_id, entry, user, message):
-        result = self.add_entries(resource_id, [entry], user, message)
+    def add_entry(self, resource_id, entry, user, message, wait_for_visibility=True):
+        result = self.add_entries(
+            resource_id, [entry], user, message, wait_for_visibility=wait_for_visibility
+        )
         assert len(result) == 1  # noqa: S101
         return result[0]
 
-    def update_entry(self, resource_id, _id, version, user, message, entry):
+    def update_entry(
+        self, resource_id, _id, version, user, message, entry, wait_for_visibility=True
+    ):
         resource = self._get_resource(resource_id)
         entries = self._get_entries(resource_id)
         try:
@@ -167,12 +319,19 @@ class EntryCommands:
         )
         if version != current_db_entry.version:
             entries.save(current_db_entry)
+            outbox_ids = self.outbox.add(resource_id, [current_db_entry.id])
             self.session.commit()
-            self._entry_updated_handler(resource, EntryDto.from_entry(current_db_entry))
+            if wait_for_visibility:
+                report = self._entry_updated_handler(
+                    resource, EntryDto.from_entry(current_db_entry)
+                )
+                self._remove_from_outbox([current_db_entry.id], outbox_ids, report)
 
         return EntryDto.from_entry(current_db_entry)
 
-    def delete_entry(self, resource_id, _id, user, version, message="Entry deleted"):
+    def delete_entry(
+        self, resource_id, _id, user, version, message="Entry deleted", wait_for_visibility=True
+    ):
         resource = self._get_resource(resource_id)
         entries = self._get_entries(resource_id)
         entry = entries.by_id(_id)
@@ -185,18 +344,233 @@ class EntryCommands:
             timestamp=utc_now(),
         )
         entries.save(entry)
+        outbox_ids = self.outbox.add(resource_id, [entry.id])
         self.session.commit()
-        self._entry_deleted_handler(EntryDto.from_entry(entry))
+        if wait_for_visibility:
+            report = self._entry_deleted_handler(EntryDto.from_entry(entry))
+            self._remove_from_outbox([entry.id], outbox_ids, report)
+
+    def execute_batch(
+        self,
+        resource_id: str,
+        operations: Iterable[BatchOperation],
+        user: str,
+        wait_for_visibility: bool = True,
+        visibility: Optional[WriteVisibility] = None,
+    ) -> list[BatchResult]:
+        """Add, update and delete entries of a resource in one transaction.
+
+        Operations that fail, for example because of a version conflict, are reported
+        in their result and don't stop the other operations. An entry can only be
+        changed by one operation in the batch. The successful operations are committed
+        together and indexed with one bulk request.
+
+        Returns one result per operation, in order.
+        """
+        resource = self._get_resource(resource_id)
+        entries = self._get_entries(resource_id)
+        operations = list(operations)
+        current_entries = {
+            entry.id: entry
+            for entry in entries.by_ids(
+                operation.id for operation in operations if operation.id is not None
+            )
+        }
+
+        timestamp = utc_now()
+        results = []
+        changed_entries = {}
+        for operation in operations:
+            result = BatchResult(op=operation.op, id=operation.id)
+            results.append(result)
+            try:
+                entry = self._execute_batch_operation(
+                    resource, operation, current_entries, changed_entries, user, timestamp
+                )
+            except (LexDomainError, ValueError) as err:
+                result.error, result.error_code = _batch_error(err)
+                continue
+            result.id = entry.id
+            result.version = entry.version
+
+        if changed_entries:
+            entity_ids = list(changed_entries)
+            entries.save_many(changed_entries.values())
+            outbox_ids = self.outbox.add(resource_id, entity_ids)
+            self.session.commit()
+            if wait_for_visibility:
+                report = self.index.write_entries(
+                    resource_id,
+                    self._transform_entries(
+                        resource.config,
+                        [
+                            EntryDto.from_entry(entry)
+                            for entry in changed_entries.values()
+                            if not entry.discarded
+                        ],
+                    ),
+                    [entry.id for entry in changed_entries.values() if entry.discarded],
+                    visibility=visibility,
+                )
+                self._remove_from_outbox(entity_ids, outbox_ids, report)
+        return results
+
+    def execute_batches(
+        self,
+        operations: Iterable[tuple[str, BatchOperation]],
+        user: str,
+        transaction_size: int = 1000,
+    ) -> Iterator[tuple[str, BatchOperation, BatchResult]]:
+        """Run a stream of `(resource_id, operation)` with `execute_batch`.
+
+        Consecutive operations on the same resource are grouped into batches of at most
+        `transaction_size` operations, each committed in one transaction and indexed
+        with one bulk request. A batch is also ended before an operation on an entry
+        that is already changed in it, so an entry can be changed several times in a row.
+        The indices are refreshed once, at the end.
+
+        Yields `(resource_id, operation, result)` for every operation, in order.
+        """
+        changed_resource_ids = set()
+
+        def run(resource_id, group):
+            try:
+                self._get_resource(resource_id)
+            except (ResourceNotFound, ValueError) as err:
+                # the commands on a missing resource fail, not the whole run
+                error, error_code = _batch_error(err)
+                for operation in group:
+                    result = BatchResult(
+                        op=operation.op, id=operation.id, error=error, error_code=error_code
+                    )
+                    yield resource_id, operation, result
+                return
+            changed_resource_ids.add(resource_id)
+            results = self.execute_batch(
+                resource_id, group, user, visibility=WriteVisibility.NONE
+            )
+            for operation, result in zip(group, results):
+                yield resource_id, operation, result
+
+        # the batches are committed as they go, so whatever stops the run, the indices
+        # are refreshed to make the committed batches visible
+        try:
+            group_resource_id = None
+            group: list[BatchOperation] = []
+            group_ids = set()
+            for resource_id, operation in operations:
+                if group and (
+                    resource_id != group_resource_id
+                    or len(group) >= transaction_size
+                    or (operation.id is not None and operation.id in group_ids)
+                ):
+                    yield from run(group_resource_id, group)
+                    group, group_ids = [], set()
+                group_resource_id = resource_id
+                group.append(operation)
+                if operation.id is not None:
+                    group_ids.add(operation.id)
+            if group:
+                yield from run(group_resource_id, group)
+        finally:
+            for resource_id in changed_resource_ids:
+                self.index.refresh(resource_id)
+
+    def _execute_batch_operation(
+        self,
+        resource: Resource,
+        operation: BatchOperation,
+        current_entries: dict,
+        changed_entries: dict,
+        user: str,
+        timestamp: float,
+    ) -> Entry:
+        """Apply one operation and add the changed entry to `changed_entries`."""
+        user = operation.user or user
+        if operation.op not in ("add", "update", "delete"):
+            raise LexValueError(f"Unknown operation '{operation.op}'")
+        if operation.op == "add":
+            entry = resource.create_entry_from_dict(
+                operation.entry,
+                user=user,
+                message=operation.message,
+                id=unique_id.make_unique_id(),
+                timestamp=timestamp,
+            )
+            changed_entries[entry.id] = entry
+            return entry
+
+        if operation.id in changed_entries:
+            raise LexValueError(f"Entry '{operation.id}' is changed twice in the batch")
+        entry = current_entries.get(operation.id)
+        if entry is None:
+            raise EntryNotFound(resource.resource_id, id=operation.id)
+        version = entry.version
+        if operation.op == "update":
+            resource.update_entry(
+                entry=entry,
+                body=operation.entry,
+                version=operation.version,
+                user=user,
+                message=operation.message,
+                timestamp=timestamp,
+            )
+        else:
+            resource.discard_entry(
+                entry=entry,
+                version=operation.version,
+                user=user,
+                message=operation.message or "Entry deleted",
+                timestamp=timestamp,
+            )
+        if entry.version != version:
+            changed_entries[entry.id] = entry
+        return entry
+
+    def _remove_from_outbox(
+        self, entity_ids, outbox_ids, report: BulkIndexReport, commit: bool = True
+    ):
+        """Remove outbox rows of entries that are successfully indexed.
+
+        The rows of entries that failed are left for the outbox worker to retry. If
+        `commit` is False, the removal is committed with the caller's next commit, and
+        if that never happens the entries are just indexed again by the outbox worker.
+        """
+        failed_ids = set(report.failed_ids)
+        self.outbox.remove(
+            outbox_id
+            for entity_id, outbox_id in zip(entity_ids, outbox_ids)
+            if str(entity_id) not in failed_ids
+        )
+        if commit:
+            self.session.commit()
 
-    def _entry_added_handler(self, resource, entry_dtos):
+    def _entry_added_handler(self, resource, entry_dtos, visibility=None) -> BulkIndexReport:
         index_entries = self._transform_entries(resource.config, entry_dtos)
-        self.index.add_entries(resource.resource_id, index_entries)
+        return self.index.add_entries(resource.resource_id, index_entries, visibility=visibility)
 
-    def _entry_updated_handler(self, resource, entry_dto):
-        self.index.add_entries(
+    def _entry_updated_handler(self, resource, entry_dto) -> BulkIndexReport:
+        return self.index.add_entries(
             entry_dto.resource,
             [self._transform(resource.config, entry_dto)],
         )
 
-    def _entry_deleted_handler(self, entry_dto):
-        self.index.delete_entry(entry_dto.resource, entry_id=entry_dto.id)
+    def _entry_deleted_handler(self, entry_dto) -> BulkIndexReport:
+        return self.index.delete_entries(entry_dto.resource, [entry_dto.id])
+
+
+def _batch_error(err: Exception) -> tuple[str, int]:
+    """Get the message and error code to report for a failed batch operation."""
+    if isinstance(err, ResourceNotFound):
+        return f"Resource '{err.args[0]}' not found", ClientErrorCodes.RESOURCE_NOT_FOUND
+    if isinstance(err, EntryNotFound):
+        return f"Entry '{err.extras.get('id')}' not found", ClientErrorCodes.ENTRY_NOT_FOUND
+    if isinstance(err, UpdateConflict):
+        return f"{err} {err.error_obj['diff']}", ClientErrorCodes.VERSION_CONFLICT
+    if isinstance(err, InvalidEntry):
+        return str(
+            err.__cause__ or err
+        ) or "Entry is not valid", ClientErrorCodes.ENTRY_NOT_VALID
+    if isinstance(err, DiscardedEntityError):
+        return "Entry is deleted", ClientErrorCodes.ENTRY_NOT_FOUND
+    return str(err), ClientErrorCodes.UNKNOWN_ERROR
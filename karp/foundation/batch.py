@@ -1,4 +1,4 @@
-from itertools import groupby, repeat
+from itertools import groupby, islice, repeat
 from typing import Iterable, Iterator
 
 
@@ -29,3 +29,21 @@ def batch_items(items: Iterable, max_batch_size=None) -> Iterator[list]:
 
     for _, group in groupby(zip(batch_numbers(), items), key=lambda pair: pair[0]):
         yield [item for _, item in group]
+
+
+def chunk_items(items: Iterable, chunk_size: int) -> Iterator[list]:
+    """
+    Split a sequence of items up into chunks of (at most) chunk_size items.
+
+    If chunk_size is 0 or less, all items end up in one single chunk.
+    """
+
+    if chunk_size <= 0:
+        chunk = list(items)
+        if chunk:
+            yield chunk
+        return
+
+    iterator = iter(items)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
@@ -1,3 +1,9 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
 class Cache(dict):
     """
     Implements a cache.
@@ -22,3 +28,124 @@ class Cache(dict):
         if key not in self:
             self[key] = self._get(key)
         return super().__getitem__(key)
+
+
+# marks a missing value, since None can be cached
+_MISSING = object()
+
+
+@dataclass
+class CacheStats:
+    hits: int
+    misses: int
+    size: int
+    maxsize: int
+    nbytes: int = 0
+    maxbytes: Optional[int] = None
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LruCache:
+    """
+    A thread-safe cache that keeps the `maxsize` most recently used values.
+
+    If `maxbytes` is given, the cache is also limited to values with a total size of
+    `maxbytes`, as computed by `sizeof(value)`. Values that are bigger than that on
+    their own are not cached.
+
+    Named caches are registered so their statistics can be read with `cache_stats()`.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 128,
+        name: Optional[str] = None,
+        maxbytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ):
+        if maxbytes is not None and sizeof is None:
+            raise ValueError("sizeof is needed to limit the cache by bytes")
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self._sizeof = sizeof
+        self._values: OrderedDict = OrderedDict()
+        self._sizes: Dict[Any, int] = {}
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        if name is not None:
+            _caches[name] = self
+
+    def get(self, key, create: Callable[[], Any]):
+        """Get the value for `key`, calling `create()` to compute it if it is missing.
+
+        `create` is called without holding the lock, so for concurrent misses of the
+        same key it may be called more than once.
+        """
+        value = self._lookup(key)
+        if value is _MISSING:
+            value = create()
+            self._store(key, value)
+        return value
+
+    async def aget(self, key, create: Callable[[], Awaitable[Any]]):
+        """Like `get`, but awaits `create()` to compute a missing value."""
+        value = self._lookup(key)
+        if value is _MISSING:
+            value = await create()
+            self._store(key, value)
+        return value
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._values:
+                self._hits += 1
+                self._values.move_to_end(key)
+                return self._values[key]
+            self._misses += 1
+            return _MISSING
+
+    def _store(self, key, value) -> None:
+        nbytes = self._sizeof(value) if self.maxbytes is not None else 0
+        if self.maxbytes is not None and nbytes > self.maxbytes:
+            return
+        with self._lock:
+            self._nbytes += nbytes - self._sizes.get(key, 0)
+            self._sizes[key] = nbytes
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.maxsize or (
+                self.maxbytes is not None and self._nbytes > self.maxbytes
+            ):
+                old_key, _ = self._values.popitem(last=False)
+                self._nbytes -= self._sizes.pop(old_key)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._sizes.clear()
+            self._nbytes = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                size=len(self._values),
+                maxsize=self.maxsize,
+                nbytes=self._nbytes,
+                maxbytes=self.maxbytes,
+            )
+
+
+_caches: Dict[str, LruCache] = {}
+
+
+def cache_stats() -> Dict[str, CacheStats]:
+    """Get the statistics of all named caches."""
+    return {name: cache.stats() for name, cache in _caches.items()}
@@ -1,15 +1,32 @@
 """LexicalResource."""
 import enum
+import json
 import typing
 from typing import Any, Dict, Optional, Tuple
 
 from karp.foundation import timings
+from karp.foundation.cache import LruCache
 from karp.foundation.entity import Entity
 from karp.foundation.value_objects import PermissionLevel, unique_id
 from karp.lex.domain import constraints, errors
 from karp.lex.domain.entities import Entry, create_entry
 from karp.lex.domain.value_objects import EntrySchema
 
+# compiled entry schemas, shared by all resources with the same entry schema config
+entry_schemas = LruCache(maxsize=256, name="entry_schemas")
+
+
+def _entry_schema_key(config: dict[str, Any]) -> str:
+    """The key in `entry_schemas` of the parts of a config that the schema is built from.
+
+    The schema is keyed on the config and not on the resource version, since the version
+    is increased in memory before an update is committed, and a rolled back update must
+    not leave its schema behind for a later update of the same version.
+    """
+    return json.dumps(
+        [config.get("fields"), config.get("additionalProperties", True)], sort_keys=True
+    )
+
 
 class ResourceOp(enum.Enum):
     ADDED = "ADDED"
@@ -42,8 +59,9 @@ class Resource(Entity):
         self.config = config
         self._message = message
         self._op = op
-        self._entry_schema = None
         self.table_name = table_name
+        # (config, its schema), so the key of the schema is not computed for every entry
+        self._entry_schema: Optional[Tuple[Dict[str, Any], EntrySchema]] = None
 
     @property
     def resource_id(self) -> str:
@@ -113,10 +131,18 @@ class Resource(Entity):
 
     @property
     def entry_schema(self) -> EntrySchema:
-        """Entry schema."""
-        if self._entry_schema is None:
-            self._entry_schema = EntrySchema.from_resource_config(self.config)
-        return self._entry_schema
+        """Entry schema.
+
+        The schema is compiled once per entry schema config and process, see
+        `entry_schemas`.
+        """
+        if self._entry_schema is None or self._entry_schema[0] is not self.config:
+            config = self.config
+            schema = entry_schemas.get(
+                _entry_schema_key(config), lambda: EntrySchema.from_resource_config(config)
+            )
+            self._entry_schema = (config, schema)
+        return self._entry_schema[1]
 
     def _validate_entry(self, entry: dict[str, Any]) -> dict[str, Any]:
         """Validate an entry against this resource's entry schema."""
@@ -130,12 +156,16 @@ class Resource(Entity):
         id: unique_id.UniqueId,  # noqa: A002
         message: Optional[str] = None,
         timestamp: Optional[float] = None,
+        validate: bool = True,
     ) -> Entry:
-        """Create an entry for this resource."""
+        """Create an entry for this resource.
+
+        Use `validate=False` only if `entry_raw` is already validated against `entry_schema`.
+        """
         self._check_not_discarded()
 
         return create_entry(
-            self._validate_entry(entry_raw),
+            self._validate_entry(entry_raw) if validate else entry_raw,
             resource_id=self.resource_id,
             last_modified_by=user,
             message=message,
@@ -14,6 +14,7 @@ class EntrySchema:
         if not isinstance(json_schema, dict):
             msg = f"Expecting 'dict', got '{type(json_schema)}'"
             raise TypeError(msg)
+        self.json_schema = json_schema
         try:
             self._compiled_schema = fastjsonschema.compile(json_schema)
         except fastjsonschema.JsonSchemaDefinitionException as e:
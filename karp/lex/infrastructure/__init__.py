@@ -2,10 +2,11 @@ import logging  # noqa: I001
 
 from sqlalchemy.orm import Session
 
-from .sql import ResourceRepository, EntryRepository
+from .sql import ResourceRepository, EntryRepository, IndexOutbox
 
 
 __all__ = [
     "ResourceRepository",
     "EntryRepository",
+    "IndexOutbox",
 ]
@@ -0,0 +1,67 @@
+"""Validate entries against a json schema in a pool of worker processes."""
+import collections
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+import fastjsonschema
+
+from karp.foundation.batch import chunk_items
+
+logger = logging.getLogger(__name__)
+
+
+# the compiled schema of a worker process, set by `_init_worker`
+_compiled_schema: Optional[Callable] = None
+
+
+def _init_worker(json_schema: dict) -> None:
+    global _compiled_schema
+    _compiled_schema = fastjsonschema.compile(json_schema)
+
+
+def _validate_batch(bodies: list[dict]) -> list[Optional[str]]:
+    errors: list[Optional[str]] = []
+    for body in bodies:
+        try:
+            _compiled_schema(body)  # type: ignore [misc]
+        except fastjsonschema.JsonSchemaException as e:
+            errors.append(str(e))
+        else:
+            errors.append(None)
+    return errors
+
+
+def validate_entries(
+    json_schema: dict,
+    entries: Iterable[Any],
+    *,
+    workers: int,
+    batch_size: int = 1000,
+    key: Optional[Callable[[Any], dict]] = None,
+) -> Iterator[Tuple[Any, Optional[str]]]:
+    """Validate entries in `workers` processes.
+
+    Every worker compiles the schema once. The entries are sent to the workers in
+    batches and at most 2 batches per worker are in flight at the same time.
+
+    Yields (entry, error) in the same order as `entries`, where error is None for
+    valid entries. If `key` is given, `key(entry)` is validated instead of the entry.
+    """
+    key = key or (lambda entry: entry)
+    max_pending = 2 * workers
+    executor = ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(json_schema,)
+    )
+    try:
+        pending: collections.deque = collections.deque()
+        for batch in chunk_items(entries, batch_size):
+            pending.append((batch, executor.submit(_validate_batch, [key(e) for e in batch])))
+            if len(pending) >= max_pending:
+                batch, future = pending.popleft()
+                yield from zip(batch, future.result())
+        while pending:
+            batch, future = pending.popleft()
+            yield from zip(batch, future.result())
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -1,7 +1,9 @@
 from .entries import EntryRepository
+from .index_outbox import IndexOutbox
 from .resources import ResourceRepository
 
 __all__ = [
     "ResourceRepository",
     "EntryRepository",
+    "IndexOutbox",
 ]
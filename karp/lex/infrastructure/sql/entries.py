@@ -14,7 +14,7 @@ from karp.lex.domain import errors
 from karp.lex.domain.entities import Resource
 from karp.lex.domain.entities.entry import Entry
 
-from . import models
+from . import history_tables, models
 
 logger = logging.getLogger(__name__)
 
@@ -26,9 +26,7 @@ class EntryRepository(Repository):
         self._config = resource.config
         self.resource = resource
         self.history_model = models.get_or_create_entry_history_model(resource.table_name)
-        self.history_model.__table__.create(  # type:ignore [attr-defined]
-            bind=session.connection(), checkfirst=True
-        )
+        history_tables.ensure_history_table(session, self.history_model)
 
     @property
     def name(self) -> str:
@@ -42,6 +40,16 @@ class EntryRepository(Repository):
         entry_dto = self.history_model.from_entity(entry)
         self._session.add(entry_dto)
 
+    def save_many(self, entries: typing.Iterable[Entry]):
+        """Save several entries with one batched INSERT on the history table.
+
+        This bypasses the ORM unit-of-work, so it's much cheaper than calling
+        `save` for every entry when importing large amounts of entries.
+        """
+        rows = [self.history_model.row_from_entity(entry) for entry in entries]
+        if rows:
+            self._session.execute(sa.insert(self.history_model.__table__), rows)
+
     def entity_ids(self) -> List[str]:
         stmt = self._stmt_latest_not_discarded()
         stmt = stmt.order_by(self.history_model.last_modified.desc())
@@ -115,15 +123,45 @@ class EntryRepository(Repository):
             ),
         )
 
-    def _subq_for_latest(self) -> sql.Subquery:
-        return (
-            sql.select(
-                self.history_model.entity_id,
-                sa.func.max(self.history_model.last_modified).label("maxdate"),
-            )
-            .group_by(self.history_model.entity_id)
-            .subquery("t2")
+    def _subq_for_latest(
+        self, ids: Optional[List[UniqueId]] = None, modified_since: Optional[float] = None
+    ) -> sql.Subquery:
+        maxdate = sa.func.max(self.history_model.last_modified)
+        stmt = sql.select(self.history_model.entity_id, maxdate.label("maxdate"))
+        if ids is not None:
+            stmt = stmt.where(self.history_model.entity_id.in_(ids))
+        stmt = stmt.group_by(self.history_model.entity_id)
+        if modified_since is not None:
+            stmt = stmt.having(maxdate > modified_since)
+        return stmt.subquery("t2")
+
+    def by_ids(self, ids: typing.Iterable[UniqueId]) -> List[Entry]:
+        """Get the latest version of the given entries with one query.
+
+        Discarded entries are included, missing entries are left out.
+        """
+        ids = list(ids)
+        if not ids:
+            return []
+        return self._latest(self._subq_for_latest(ids))
+
+    def modified_since(self, timestamp: float) -> List[Entry]:
+        """Get the latest version of the entries that are modified after `timestamp`.
+
+        Discarded entries are included.
+        """
+        return self._latest(self._subq_for_latest(modified_since=timestamp))
+
+    def _latest(self, subq: sql.Subquery) -> List[Entry]:
+        stmt = sql.select(self.history_model).join(
+            subq,
+            sa.and_(
+                self.history_model.entity_id == subq.c.entity_id,
+                self.history_model.last_modified == subq.c.maxdate,
+            ),
         )
+        query = self._session.execute(stmt).scalars()
+        return [self._history_row_to_entry(row) for row in query.all()]
 
     def get_history(
         self,
@@ -0,0 +1,61 @@
+"""Registry of the entry history tables that are known to exist.
+
+Checking if a table exists is a round trip to the database's information schema, so it
+is done at most once per table and process, instead of every time an
+`EntryRepository` is created.
+"""
+import logging
+import weakref
+from typing import Set
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# table names that are known to exist, per engine
+_known_tables: "weakref.WeakKeyDictionary[Engine, Set[str]]" = weakref.WeakKeyDictionary()
+
+# key in `Session.info` of the table names that are checked in the current transaction
+_PENDING_TABLES = "pending_history_tables"
+
+
+def ensure_history_table(session: Session, history_model) -> None:
+    """Create the table of `history_model` if it doesn't exist.
+
+    A table is only remembered when the session commits, since it may have been
+    created earlier in a transaction that is rolled back. Until then, it is only
+    remembered for the current transaction of the session.
+    """
+    known_tables = _known_tables.setdefault(session.get_bind(), set())
+    table_name = history_model.__tablename__
+    if table_name in known_tables:
+        return
+    pending_tables = session.info.setdefault(_PENDING_TABLES, set())
+    if table_name in pending_tables:
+        return
+
+    connection = session.connection()
+    if not sa.inspect(connection).has_table(table_name):
+        logger.info("creating history table '%s'", table_name)
+        history_model.__table__.create(bind=connection)
+    pending_tables.add(table_name)
+    if not sa.event.contains(session, "after_commit", _remember_pending_tables):
+        sa.event.listen(session, "after_commit", _remember_pending_tables)
+        sa.event.listen(session, "after_rollback", _forget_pending_tables)
+
+
+def _remember_pending_tables(session: Session) -> None:
+    pending_tables = session.info.pop(_PENDING_TABLES, None)
+    if pending_tables:
+        _known_tables.setdefault(session.get_bind(), set()).update(pending_tables)
+
+
+def _forget_pending_tables(session: Session) -> None:
+    session.info.pop(_PENDING_TABLES, None)
+
+
+def forget_history_table(session: Session, table_name: str) -> None:
+    """Forget a table that is dropped."""
+    _known_tables.get(session.get_bind(), set()).discard(table_name)
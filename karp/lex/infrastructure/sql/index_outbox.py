@@ -0,0 +1,77 @@
+import logging
+from typing import Iterable, List, Optional
+
+import sqlalchemy as sa
+from injector import inject
+from sqlalchemy.orm import Session
+
+from karp.foundation.timings import utc_now
+from karp.foundation.value_objects import UniqueId, make_unique_id
+
+from .models import IndexOutboxModel
+
+logger = logging.getLogger(__name__)
+
+
+class IndexOutbox:
+    """Keeps track of entries that are written to the DB but not yet to the index.
+
+    Rows are added in the same transaction as the entries, so if indexing fails
+    after the DB commit the entries are still in the outbox and can be indexed
+    later with `SearchCommands.drain_index_outbox`.
+    """
+
+    @inject
+    def __init__(self, session: Session):
+        self._session = session
+
+    def add(self, resource_id: str, entity_ids: Iterable[UniqueId]) -> List[UniqueId]:
+        """Add the entries to the outbox, returns the ids of the new outbox rows."""
+        now = utc_now()
+        rows = [
+            {
+                "id": make_unique_id(),
+                "resource_id": resource_id,
+                "entity_id": entity_id,
+                "created_at": now,
+                "attempts": 0,
+                "next_attempt_at": now,
+            }
+            for entity_id in entity_ids
+        ]
+        if rows:
+            self._session.execute(sa.insert(IndexOutboxModel.__table__), rows)
+        return [row["id"] for row in rows]
+
+    def pending(
+        self, *, limit: int, max_attempts: int, after_id: Optional[UniqueId] = None
+    ) -> List[IndexOutboxModel]:
+        """Rows that are due for (another) indexing attempt, oldest first."""
+        stmt = (
+            sa.select(IndexOutboxModel)
+            .where(IndexOutboxModel.next_attempt_at <= utc_now())
+            .where(IndexOutboxModel.attempts < max_attempts)
+            .order_by(IndexOutboxModel.id)
+            .limit(limit)
+        )
+        if after_id is not None:
+            stmt = stmt.where(IndexOutboxModel.id > after_id)
+        return list(self._session.execute(stmt).scalars())
+
+    def remove(self, ids: Iterable[UniqueId]):
+        ids = list(ids)
+        if ids:
+            self._session.execute(
+                sa.delete(IndexOutboxModel).where(IndexOutboxModel.id.in_(ids))
+            )
+
+    def mark_failed(self, rows: Iterable[IndexOutboxModel], error: str):
+        """Register a failed attempt, the rows are retried with exponential backoff."""
+        now = utc_now()
+        for row in rows:
+            row.attempts += 1
+            row.last_error = error
+            row.next_attempt_at = now + min(2**row.attempts, 600)
+
+    def count(self) -> int:
+        return self._session.execute(sa.select(sa.func.count(IndexOutboxModel.id))).scalar_one()
@@ -109,6 +109,23 @@ class ResourceModel(Base):
         )
 
 
+class IndexOutboxModel(Base):
+    """Entries that are written to the DB but maybe not yet to the index.
+
+    The rows are written in the same transaction as the history rows and removed
+    when the entries are indexed.
+    """
+
+    __tablename__ = "index_outbox"
+    id = Column(ULIDType, primary_key=True)  # noqa: A003
+    resource_id = Column(String(32), nullable=False)
+    entity_id = Column(ULIDType, nullable=False)
+    created_at = Column(Float(53), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(Float(53), nullable=False)
+    last_error = Column(Text, nullable=True)
+
+
 class BaseHistoryEntry:
     history_id = Column(Integer, primary_key=True)
     entity_id = Column(ULIDType, nullable=False)
@@ -127,19 +144,23 @@ class BaseHistoryEntry:
 
     @classmethod
     def from_entity(cls, entry: entities.Entry):
-        return cls(
-            history_id=None,
-            entity_id=entry.entity_id,
-            # entry_id=entry.entry_id,
-            version=entry.version,
-            last_modified=entry.last_modified,
-            last_modified_by=entry.last_modified_by,
-            body=entry.body,
-            status=entry.status,
-            message=entry.message,
-            op=entry.op,
-            discarded=entry.discarded,
-        )
+        return cls(history_id=None, **cls.row_from_entity(entry))
+
+    @staticmethod
+    def row_from_entity(entry: entities.Entry) -> dict:
+        """The column values of the history row for the entry, without `history_id`."""
+        return {
+            "entity_id": entry.entity_id,
+            # "entry_id": entry.entry_id,
+            "version": entry.version,
+            "last_modified": entry.last_modified,
+            "last_modified_by": entry.last_modified_by,
+            "body": entry.body,
+            "status": entry.status,
+            "message": entry.message,
+            "op": entry.op,
+            "discarded": entry.discarded,
+        }
 
 
 # Dynamic models
@@ -14,6 +14,7 @@ from karp.lex.domain import entities
 from karp.lex.domain.entities.resource import Resource
 from karp.lex.domain.errors import ResourceNotFound
 
+from . import history_tables, models
 from .entries import EntryRepository
 from .models import ResourceModel
 
@@ -97,6 +98,7 @@ class ResourceRepository(repository.Repository):
 
     def remove_resource_table(self, resource):
         self._session.execute(text("DROP TABLE IF EXISTS " + resource.table_name))
+        history_tables.forget_history_table(self._session, resource.table_name)
 
     def remove(self, resource: Resource):
         self._session.delete(resource)
@@ -107,6 +109,10 @@ class ResourceRepository(repository.Repository):
         if resource.discarded:
             # If resource was discarded, drop the table containing all data entries
             self.remove_resource_table(resource)
+        else:
+            history_tables.ensure_history_table(
+                self._session, models.get_or_create_entry_history_model(resource.table_name)
+            )
         self._cache.clear()
 
     def _by_id(
@@ -7,13 +7,15 @@ from logging.config import dictConfig
 from pathlib import Path
 
 import asgi_correlation_id
-from elasticsearch import Elasticsearch
+from elasticsearch import AsyncElasticsearch, Elasticsearch
 from injector import Injector, Module, provider, singleton
 from sqlalchemy import pool
 from sqlalchemy.engine import URL, Engine, create_engine
 from sqlalchemy.orm import Session
 
 from karp.auth.infrastructure import JWTAuthService
+from karp.search.infrastructure.es.refresh import RefreshCoalescer, WriteVisibility
+from karp.search.infrastructure.es.settings import EsIndexSettings, EsSearchSettings
 
 from .config import DATABASE_URL, env
 
@@ -39,13 +41,64 @@ def bootstrap_app() -> AppContext:
         "tracking.matomo.token": env("TRACKING_MATOMO_TOKEN", None),
         "es.url": es_url,
         "es.index_prefix": es_url,
+        "es.write_visibility": env("ES_WRITE_VISIBILITY", WriteVisibility.WAIT_FOR.value),
+        "es.refresh_window": env.float("ES_REFRESH_WINDOW", 0.2),
+        "es.max_connections": env.int("ES_MAX_CONNECTIONS", 10),
+        "es.async_max_connections": env.int("ES_ASYNC_MAX_CONNECTIONS", 256),
+        "es.bulk.chunk_size": env.int("ES_BULK_CHUNK_SIZE", 500),
+        "es.bulk.max_chunk_bytes": env.int("ES_BULK_MAX_CHUNK_BYTES", 10 * 1024 * 1024),
+        "es.bulk.threads": env.int("ES_BULK_THREADS", 1),
+        "es.bulk.max_retries": env.int("ES_BULK_MAX_RETRIES", 5),
+        "es.reindex.wait_for_status": env("ES_REINDEX_WAIT_FOR_STATUS", "green"),
+        "es.reindex.timeout": env.float("ES_REINDEX_TIMEOUT", 3600.0),
+        "search.query_parser": env("QUERY_PARSER", "fast"),
+        "search.result_cache_ttl": env.float("SEARCH_RESULT_CACHE_TTL", 0.0),
+        "search.cursor_keep_alive": env("SEARCH_CURSOR_KEEP_ALIVE", "5m"),
+        "search.export_page_size": env.int("SEARCH_EXPORT_PAGE_SIZE", 1000),
+        "search.statistics_page_size": env.int("SEARCH_STATISTICS_PAGE_SIZE", 10_000),
+        "search.multi_query_max_items": env.int("SEARCH_MULTI_QUERY_MAX_ITEMS", 100),
+        "search.mget_batch_size": env.int("SEARCH_MGET_BATCH_SIZE", 1000),
+        "search.mapping_reload_interval": env.float("SEARCH_MAPPING_RELOAD_INTERVAL", 60.0),
     }
 
     engine = _create_db_engine(DATABASE_URL)
 
     def configure_dependency_injection(binder):
         binder.bind(Engine, engine)
-        binder.install(ElasticSearchMod(es_url))
+        binder.install(
+            ElasticSearchMod(
+                es_url,
+                refresh_window=settings["es.refresh_window"],
+                max_connections=settings["es.max_connections"],
+                async_max_connections=settings["es.async_max_connections"],
+            )
+        )
+        binder.bind(
+            EsIndexSettings,
+            EsIndexSettings(
+                write_visibility=WriteVisibility(settings["es.write_visibility"]),
+                bulk_chunk_size=settings["es.bulk.chunk_size"],
+                bulk_max_chunk_bytes=settings["es.bulk.max_chunk_bytes"],
+                bulk_threads=settings["es.bulk.threads"],
+                max_connections=settings["es.max_connections"],
+                bulk_max_retries=settings["es.bulk.max_retries"],
+                reindex_wait_for_status=settings["es.reindex.wait_for_status"],
+                reindex_timeout=settings["es.reindex.timeout"],
+            ),
+        )
+        binder.bind(
+            EsSearchSettings,
+            EsSearchSettings(
+                query_parser=settings["search.query_parser"],
+                result_cache_ttl=settings["search.result_cache_ttl"],
+                cursor_keep_alive=settings["search.cursor_keep_alive"],
+                export_page_size=settings["search.export_page_size"],
+                statistics_page_size=settings["search.statistics_page_size"],
+                multi_query_max_items=settings["search.multi_query_max_items"],
+                mget_batch_size=settings["search.mget_batch_size"],
+                mapping_reload_interval=settings["search.mapping_reload_interval"],
+            ),
+        )
         if jwt_pubkey_path is not None:
             binder.bind(JWTAuthService, JWTAuthService(Path(jwt_pubkey_path)))
 
@@ -54,14 +107,36 @@ def bootstrap_app() -> AppContext:
 
 
 class ElasticSearchMod(Module):
-    def __init__(self, url):
+    def __init__(
+        self,
+        url,
+        refresh_window: float = 0.2,
+        max_connections: int = 10,
+        async_max_connections: int = 256,
+    ):
         self._url = url
+        self._refresh_window = refresh_window
+        self._max_connections = max_connections
+        self._async_max_connections = async_max_connections
 
     @provider
     @singleton
     def es(self) -> Elasticsearch:
         logger.info("Creating ES client url=%s", self._url)
-        return Elasticsearch(self._url)
+        return Elasticsearch(self._url, connections_per_node=self._max_connections)
+
+    @provider
+    @singleton
+    def async_es(self) -> AsyncElasticsearch:
+        # used by the async API routes, which need the "async" extra of elasticsearch. It
+        # has its own connections, since one worker can have many searches in flight.
+        logger.info("Creating async ES client url=%s", self._url)
+        return AsyncElasticsearch(self._url, connections_per_node=self._async_max_connections)
+
+    @provider
+    @singleton
+    def refresh_coalescer(self, es: Elasticsearch) -> RefreshCoalescer:
+        return RefreshCoalescer(es, window=self._refresh_window)
 
 
 def _create_db_engine(db_url: URL) -> Engine:
@@ -6,11 +6,13 @@ NoIndexModuleConfigured = 10
 
 class ClientErrorCodes(enum.IntEnum):
     UNKNOWN_ERROR = 1
+    RESOURCE_NOT_FOUND = 20
     ENTRY_NOT_FOUND = 30
     ENTRY_NOT_VALID = 32
     VERSION_CONFLICT = 33
     DB_INTEGRITY_ERROR = 61
     SEARCH_INCOMPLETE_QUERY = 81
+    SEARCH_INVALID_CURSOR = 82
 
 
 class KarpError(Exception):
@@ -0,0 +1,35 @@
+"""add index outbox
+
+Revision ID: 9a3e4c1f2b7d
+Revises: 47405b5dfdb6
+Create Date: 2026-10-18
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+from karp.db_infrastructure.types import ULIDType
+
+# revision identifiers, used by Alembic.
+revision = "9a3e4c1f2b7d"
+down_revision = "47405b5dfdb6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "index_outbox",
+        sa.Column("id", ULIDType, nullable=False),
+        sa.Column("resource_id", sa.String(length=32), nullable=False),
+        sa.Column("entity_id", ULIDType, nullable=False),
+        sa.Column("created_at", sa.Float(precision=53), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("next_attempt_at", sa.Float(precision=53), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade():
+    op.drop_table("index_outbox")
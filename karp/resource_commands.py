@@ -11,6 +11,7 @@ from karp.lex.domain.dtos import ResourceDto
 from karp.lex.domain.errors import IntegrityError, ResourceNotFound
 from karp.lex.infrastructure import ResourceRepository
 from karp.plugins import Plugins
+from karp.search.infrastructure.es.generations import mapping_generations
 from karp.search.infrastructure.es.indices import EsIndex
 
 logger = logging.getLogger(__name__)
@@ -60,6 +61,8 @@ class ResourceCommands:
         if updated:
             self.resources.save(resource)
         self.session.commit()
+        # the default sort of the resource is in its config
+        mapping_generations.bump(resource_id)
 
     def publish_resource(self, resource_id, message, user, version):
         logger.info("publishing resource", extra={"resource_id": resource_id})
@@ -74,6 +77,7 @@ class ResourceCommands:
         )
         self.resources.save(resource)
         self.session.commit()
+        mapping_generations.bump(resource_id)
 
     def unpublish_resource(self, resource_id, user, version, keep_index=False):
         logger.info("unpublishing resource", extra={"resource_id": resource_id})
@@ -83,6 +87,7 @@ class ResourceCommands:
         resource.unpublish(user=user, version=version)
         self.resources.save(resource)
         self.session.commit()
+        mapping_generations.bump(resource_id)
         if not keep_index:
             self.index.delete_index(resource_id)
         return True
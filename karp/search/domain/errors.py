@@ -7,3 +7,10 @@ class IncompleteQuery(Exception):
         super().__init__(*args)
         self.failing_query = failing_query
         self.error_description = error_description
+
+
+class InvalidCursor(Exception):
+    def __init__(self, cursor: str, error_description: str, *args: object) -> None:
+        super().__init__(*args)
+        self.cursor = cursor
+        self.error_description = error_description
@@ -0,0 +1,27 @@
+from .karp_query_v6_fast_parser import KarpQueryV6FastParser, QueryParseError
+from .karp_query_v6_model import KarpQueryV6ModelBuilderSemantics
+from .karp_query_v6_parser import KarpQueryV6Parser
+
+QUERY_PARSERS = ("fast", "tatsu")
+
+
+def create_query_parser(name: str = "fast"):
+    """Create the parser of query strings called `name`, one of `QUERY_PARSERS`.
+
+    Both parsers build `karp_query_v6_model` nodes from a query string with `parse`.
+    """
+    if name == "fast":
+        return KarpQueryV6FastParser()
+    if name == "tatsu":
+        return KarpQueryV6Parser(semantics=KarpQueryV6ModelBuilderSemantics())
+    raise ValueError(f"Unknown query parser '{name}', expected one of {QUERY_PARSERS}")
+
+
+__all__ = [
+    "KarpQueryV6FastParser",
+    "KarpQueryV6ModelBuilderSemantics",
+    "KarpQueryV6Parser",
+    "QueryParseError",
+    "QUERY_PARSERS",
+    "create_query_parser",
+]
@@ -0,0 +1,149 @@
+"""Hand-written parser for the query language in `grammars/query_v6.ebnf`.
+
+Builds the same `karp_query_v6_model` nodes as the generated TatSu parser, but with a
+single pass over the query string and without backtracking, since the grammar only
+needs one keyword of lookahead. The only difference is that a `QuotedStringValue`
+holds its text as one part, instead of one part per character, which gives the same
+string when the parts are joined.
+
+Like TatSu, whitespace is skipped before keywords, punctuation and values, but not
+inside quoted strings, and unquoted values and field names keep trailing whitespace.
+"""
+
+import re
+
+from . import karp_query_v6_model as model
+
+_WHITESPACE = re.compile(r"\s*")
+_KEYWORD = re.compile(r"[a-z]+")
+_INTEGER = re.compile(r"\d+")
+_IDENTIFIER = re.compile(r"[^|)(]+")
+_UNQUOTED_STRING = re.compile(r"[^|)(\"]+")
+# the contents of a quoted string, where \" is an escaped quote. This is matched without
+# the closing quote, so it is never backtracked into, like in TatSu.
+_QUOTED_STRING = re.compile(r'(?:\\"|[^"])*')
+
+_LOGICAL_OPERATORS = {"and": model.And, "or": model.Or, "not": model.Not}
+
+# keyword -> (node type, has a field, type of argument)
+_QUERY_OPERATORS = {
+    "contains": (model.Contains, True, "string"),
+    "endswith": (model.Endswith, True, "string"),
+    "equals": (model.Equals, True, "any"),
+    "exists": (model.Exists, True, None),
+    "freergxp": (model.Freergxp, False, "string"),
+    "freetext": (model.Freetext, False, "string"),
+    "gt": (model.Gt, True, "any"),
+    "gte": (model.Gte, True, "any"),
+    "lt": (model.Lt, True, "any"),
+    "lte": (model.Lte, True, "any"),
+    "missing": (model.Missing, True, None),
+    "regexp": (model.Regexp, True, "string"),
+    "startswith": (model.Startswith, True, "string"),
+}
+_RANGE_OPERATORS = {"gt", "gte", "lt", "lte"}
+
+
+class QueryParseError(ValueError):
+    def __init__(self, text: str, pos: int, message: str):
+        super().__init__(text, pos, message)
+        self.text = text
+        self.pos = pos
+        self.message = message
+
+    def __str__(self):
+        return f"(1:{self.pos + 1}) {self.message} :\n{self.text}\n{' ' * self.pos}^"
+
+
+class KarpQueryV6FastParser:
+    """Parser with the same `parse` method as the generated `KarpQueryV6Parser`."""
+
+    def parse(self, text: str) -> model.ModelBase:
+        parser = _Parser(text)
+        result = parser.expression()
+        parser.expect_end()
+        return result
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+
+    def error(self, message: str):
+        raise QueryParseError(self.text, self.pos, message)
+
+    def skip_whitespace(self):
+        self.pos = _WHITESPACE.match(self.text, self.pos).end()
+
+    def match(self, pattern: re.Pattern, expected: str) -> str:
+        self.skip_whitespace()
+        m = pattern.match(self.text, self.pos)
+        if m is None:
+            self.error(f"expecting {expected}")
+        self.pos = m.end()
+        return m.group()
+
+    def token(self, token: str):
+        self.skip_whitespace()
+        if not self.text.startswith(token, self.pos):
+            self.error(f"expecting {token!r}")
+        self.pos += len(token)
+
+    def expect_end(self):
+        self.skip_whitespace()
+        if self.pos != len(self.text):
+            self.error("Expecting end of text")
+
+    def expression(self) -> model.ModelBase:
+        keyword = self.match(_KEYWORD, "an operator")
+        if keyword in _LOGICAL_OPERATORS:
+            return self.logical_expression(_LOGICAL_OPERATORS[keyword])
+        if keyword in _QUERY_OPERATORS:
+            return self.query_expression(keyword, *_QUERY_OPERATORS[keyword])
+        self.pos -= len(keyword)
+        self.error("expecting one of: " + " ".join(_LOGICAL_OPERATORS | _QUERY_OPERATORS))
+
+    def logical_expression(self, node_type) -> model.ModelBase:
+        self.token("(")
+        exps = [self.expression()]
+        self.skip_whitespace()
+        while self.text.startswith("||", self.pos):
+            self.pos += 2
+            exps.append(self.expression())
+            self.skip_whitespace()
+        self.token(")")
+        return node_type(ast={"exps": exps})
+
+    def query_expression(self, keyword, node_type, has_field, arg_type) -> model.ModelBase:
+        ast = {}
+        if keyword in _RANGE_OPERATORS:
+            ast["op"] = keyword
+        if has_field:
+            self.token("|")
+            ast["field"] = self.match(_IDENTIFIER, "a field name")
+        if arg_type is not None:
+            self.token("|")
+            ast["arg"] = self.any_value() if arg_type == "any" else self.string_value()
+        return node_type(ast=ast)
+
+    def any_value(self):
+        self.skip_whitespace()
+        m = _INTEGER.match(self.text, self.pos)
+        if m is not None:
+            self.pos = m.end()
+            return int(m.group())
+        return self.string_value()
+
+    def string_value(self) -> model.StringValue:
+        self.skip_whitespace()
+        if self.text.startswith('"', self.pos):
+            self.pos += 1
+            m = _QUOTED_STRING.match(self.text, self.pos)
+            self.pos = m.end()
+            if not self.text.startswith('"', self.pos):
+                self.error("expecting '\"'")
+            self.pos += 1
+            parts = [m.group()] if m.group() else []
+            return model.StringValue(ast=model.QuotedStringValue(ast=parts))
+        return model.StringValue(ast=self.match(_UNQUOTED_STRING, "a value"))
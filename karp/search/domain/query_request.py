@@ -14,6 +14,9 @@ class QueryRequest(pydantic.BaseModel):
     size: int = 25
     lexicon_stats: bool = True
     sort: List[str] = pydantic.Field(default_factory=list)
+    cursor: typing.Optional[str] = None
+    include_fields: typing.Optional[List[str]] = None
+    exclude_fields: typing.Optional[List[str]] = None
 
     @pydantic.validator("resource_ids", pre=True)
     @classmethod
@@ -21,3 +24,12 @@ class QueryRequest(pydantic.BaseModel):
         if isinstance(v, str):
             return v.split(",")
         return v
+
+    @pydantic.validator("include_fields", "exclude_fields", pre=True)
+    @classmethod
+    def split_fields(cls, v):
+        if isinstance(v, str):
+            v = [v]
+        if v is None:
+            return v
+        return [field for fields in v for field in fields.split(",") if field]
@@ -1 +1,7 @@
-from .es import EsIndex, EsMappingRepository, EsSearchService
+from .es import (
+    AsyncEsMappingRepository,
+    AsyncEsSearchService,
+    EsIndex,
+    EsMappingRepository,
+    EsSearchService,
+)
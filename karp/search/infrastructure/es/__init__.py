@@ -1,6 +1,24 @@
+from .async_search_service import AsyncEsSearchService
+from .bulk import BulkFailure, BulkIndexReport
 from .indices import EsIndex
-from .mapping_repo import EsMappingRepository
+from .mapping_repo import AsyncEsMappingRepository, EsMappingRepository
 from .query import EsQuery
+from .refresh import RefreshCoalescer, WriteVisibility
 from .search_service import EsQueryBuilder, EsSearchService
+from .settings import EsIndexSettings, EsSearchSettings
 
-__all__ = ["EsMappingRepository", "EsSearchService", "EsQueryBuilder", "EsQuery", "EsIndex"]
+__all__ = [
+    "AsyncEsMappingRepository",
+    "AsyncEsSearchService",
+    "EsMappingRepository",
+    "EsSearchService",
+    "EsQueryBuilder",
+    "EsQuery",
+    "EsIndex",
+    "EsIndexSettings",
+    "EsSearchSettings",
+    "BulkFailure",
+    "BulkIndexReport",
+    "RefreshCoalescer",
+    "WriteVisibility",
+]
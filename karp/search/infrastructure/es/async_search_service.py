@@ -0,0 +1,224 @@
+"""`EsSearchService` for async code, with the async Elasticsearch client."""
+import logging
+from typing import AsyncIterator, Callable, Optional
+
+import elasticsearch
+import elasticsearch_dsl as es_dsl
+from injector import inject
+
+from karp.foundation.cache import LruCache
+from karp.search.domain import QueryRequest, errors
+
+from .mapping_repo import AsyncEsMappingRepository
+from .query import EsQuery
+from .search_service import (
+    EsSearchBuilder,
+    _by_count,
+    _decode_after,
+    _msearch_body,
+    _msearch_responses,
+    _statistics_result,
+    decode_cursor,
+    field_statistics,
+    search_results,
+)
+from .settings import EsSearchSettings
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncEsSearchService:
+    """Searches like `EsSearchService`, but awaits the requests to ES.
+
+    Searches are built, and responses formatted, by the same `EsSearchBuilder` as in
+    `EsSearchService`, and results are cached in the same caches, so only the
+    requests differ. The methods that send requests are coroutines here, and `export`
+    and `iter_statistics` are async iterators.
+
+    The mappings are shared by all requests and loaded with the async client, see
+    `AsyncEsMappingRepository`, so no blocking call is made while serving a request.
+    """
+
+    @inject
+    def __init__(
+        self,
+        es: elasticsearch.AsyncElasticsearch,
+        mapping_repo: AsyncEsMappingRepository,
+        settings: Optional[EsSearchSettings] = None,
+    ):
+        self.es = es
+        self.mapping_repo = mapping_repo
+        self.settings = settings or EsSearchSettings()
+        self.builder = EsSearchBuilder(mapping_repo, self.settings)
+
+    async def _execute(self, s: es_dsl.Search, index=None) -> dict:
+        return (await self.es.search(index=index, body=s.to_dict())).body
+
+    async def _execute_multi(
+        self, searches: list[tuple[list[str], es_dsl.Search]], raise_on_error: bool = True
+    ) -> list[dict]:
+        response = await self.es.msearch(searches=_msearch_body(searches))
+        return _msearch_responses(response, raise_on_error)
+
+    async def _cached(self, cache: LruCache, key, resource_ids: list[str], compute: Callable):
+        key = self.builder.cache_key(key, resource_ids)
+        if key is None:
+            return await compute()
+        return await cache.aget(key, compute)
+
+    def parse_query(self, q: str) -> tuple[es_dsl.query.Query, frozenset[str]]:
+        return self.builder.parse_query(q)
+
+    async def query(self, request: QueryRequest):
+        logger.info("query called", extra={"request": request})
+        return await self.search_with_query(EsQuery.from_query_request(request))
+
+    async def query_stats(self, resources, q):
+        return await self.search_with_query(self.builder.stats_query(resources, q))
+
+    async def export(self, request: QueryRequest) -> AsyncIterator[dict]:
+        logger.info("export called", extra={"request": request})
+        await self.mapping_repo.load()
+        query, s = self.builder.export_search(request)
+        return self._export(query, s)
+
+    async def _export(self, query: EsQuery, s: es_dsl.Search) -> AsyncIterator[dict]:
+        index_resources = self.builder.index_resources(query.resources)
+        search_after = None
+        pit_id = (
+            await self.es.open_point_in_time(
+                index=query.resources, keep_alive=self.settings.cursor_keep_alive
+            )
+        )["id"]
+        try:
+            while True:
+                response = await self._execute(self.builder.export_page(s, pit_id, search_after))
+                pit_id = response["pit_id"]
+                hits = response["hits"]["hits"]
+                for hit in hits:
+                    yield self.builder.format_hit(index_resources, hit)
+                if len(hits) < query.size:
+                    return
+                search_after = hits[-1]["sort"]
+        finally:
+            await self.es.close_point_in_time(id=pit_id)
+
+    async def multi_query(self, requests: list[QueryRequest]):
+        # ES fails on a multi-search with an empty request list
+        if not requests:
+            return []
+
+        logger.info(f"multi_query called for {len(requests)} requests")
+
+        queries = [EsQuery.from_query_request(request) for request in requests]
+        await self.mapping_repo.load()
+        responses = await self._execute_multi(self.builder.multi_query_searches(queries))
+        return [
+            self.builder.build_result(query, response)
+            for query, response in zip(queries, responses)
+        ]
+
+    async def multi_query_items(self, requests: list[QueryRequest]) -> list[dict]:
+        logger.info(f"multi_query_items called for {len(requests)} requests")
+        await self.mapping_repo.load()
+        items, searches = self.builder.multi_query_items(requests)
+        # ES fails on a multi-search with an empty request list
+        if searches:
+            responses = await self._execute_multi(
+                [(query.resources, s) for _, query, s in searches], raise_on_error=False
+            )
+            self.builder.multi_query_results(searches, responses)
+        return items
+
+    async def search_with_query(self, query: EsQuery):
+        logger.info("search_with_query called", extra={"query": query})
+        await self.mapping_repo.load()
+        if query.cursor:
+            return await self._search_with_cursor(query)
+        return await self._cached(
+            search_results,
+            query.json(by_alias=True, sort_keys=True),
+            query.resources,
+            lambda: self._search_with_query(query),
+        )
+
+    async def _search_with_query(self, query: EsQuery):
+        if query.split_results:
+            responses = await self._execute_multi(self.builder.split_searches(query))
+            return self.builder.split_result(query, responses)
+
+        s = self.builder.build_search(query, query.resources)
+        response = await self._execute(s, index=query.resources)
+        return self.builder.build_result(query, response)
+
+    async def _search_with_cursor(self, query: EsQuery):
+        if query.cursor == "*":
+            pit_id = (
+                await self.es.open_point_in_time(
+                    index=query.resources, keep_alive=self.settings.cursor_keep_alive
+                )
+            )["id"]
+            search_after = None
+        else:
+            pit_id, search_after = decode_cursor(query.cursor)
+        s = self.builder.cursor_search(query, pit_id, search_after)
+        try:
+            response = await self._execute(s)
+        except elasticsearch.NotFoundError as err:
+            raise errors.InvalidCursor(query.cursor, "the cursor has expired") from err
+
+        result = self.builder.cursor_result(query, response)
+        if result["cursor"] is None:
+            await self.es.close_point_in_time(id=response["pit_id"])
+        return result
+
+    async def search_ids(self, resource_id: str, entry_ids: str):
+        logger.info(
+            "Called AsyncEsSearchService.search_ids with:",
+            extra={"resource_id": resource_id, "entry_ids": entry_ids},
+        )
+        await self.mapping_repo.load()
+        index_resources = self.builder.index_resources([resource_id])
+        hits = []
+        for ids in self.builder.id_batches(entry_ids):
+            response = await self.es.mget(index=resource_id, ids=ids, realtime=True)
+            hits.extend(self.builder.found_hits(index_resources, response))
+        return {"total": len(hits), "hits": hits}
+
+    async def statistics(self, resource_id: str, field: str) -> list[dict]:
+        async def compute():
+            return _by_count([value async for value in self.iter_statistics(resource_id, field)])
+
+        return await self._cached(
+            field_statistics, (resource_id, field, None), [resource_id], compute
+        )
+
+    async def statistics_page(
+        self, resource_id: str, field: str, size: int, after: Optional[str] = None
+    ) -> dict:
+        after_key = _decode_after(after)
+        return await self._cached(
+            field_statistics,
+            (resource_id, field, size, after),
+            [resource_id],
+            lambda: self._statistics_page(resource_id, field, size, after_key),
+        )
+
+    async def iter_statistics(self, resource_id: str, field: str) -> AsyncIterator[dict]:
+        after_key = None
+        while True:
+            page = await self._statistics_page(
+                resource_id, field, self.settings.statistics_page_size, after_key
+            )
+            for value in page["values"]:
+                yield value
+            if page["after"] is None:
+                return
+            after_key = _decode_after(page["after"])
+
+    async def _statistics_page(
+        self, resource_id: str, field: str, size: int, after_key: Optional[dict]
+    ) -> dict:
+        await self.mapping_repo.load()
+        s = self.builder.statistics_search(resource_id, field, size, after_key)
+        return _statistics_result(await self._execute(s, index=resource_id), size)
@@ -0,0 +1,104 @@
+"""Bulk indexing with back-pressure, retries and per-document error reporting."""
+import collections
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List
+
+import elasticsearch
+from elasticsearch import helpers
+
+from karp.foundation import batch
+
+from .settings import EsIndexSettings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BulkFailure:
+    id: str
+    status: int
+    error: Any
+
+
+@dataclass
+class BulkIndexReport:
+    num_ok: int = 0
+    failures: List[BulkFailure] = field(default_factory=list)
+
+    @property
+    def failed_ids(self) -> List[str]:
+        return [failure.id for failure in self.failures]
+
+    def merge(self, other: "BulkIndexReport"):
+        self.num_ok += other.num_ok
+        self.failures.extend(other.failures)
+
+
+def bulk_index(
+    es: elasticsearch.Elasticsearch,
+    actions: Iterable[Dict[str, Any]],
+    settings: EsIndexSettings,
+    **kwargs,
+) -> BulkIndexReport:
+    """Send the actions to Elasticsearch with `streaming_bulk`.
+
+    The actions are consumed lazily and sent in requests of at most
+    `settings.bulk_chunk_size` documents and `settings.bulk_max_chunk_bytes` bytes.
+    Documents rejected with 429 are retried with exponential backoff. Deleting a
+    document that is not in the index counts as a success. Other failures don't stop
+    the indexing, they are collected in the returned report.
+
+    If `settings.bulk_threads` > 1, that many requests are sent concurrently, but
+    at most twice as many chunks are read from `actions` ahead of the requests.
+    Extra keyword arguments are passed to the bulk requests.
+    """
+    if settings.bulk_threads <= 1:
+        report = _streaming_bulk(es, actions, settings, **kwargs)
+    else:
+        report = BulkIndexReport()
+        with ThreadPoolExecutor(max_workers=settings.bulk_threads) as executor:
+            pending = collections.deque()
+            for chunk in batch.chunk_items(actions, settings.bulk_chunk_size):
+                if len(pending) >= 2 * settings.bulk_threads:
+                    report.merge(pending.popleft().result())
+                pending.append(executor.submit(_streaming_bulk, es, chunk, settings, **kwargs))
+            while pending:
+                report.merge(pending.popleft().result())
+
+    if report.failures:
+        logger.error(
+            "Failed to index %d documents",
+            len(report.failures),
+            extra={"failed_ids": report.failed_ids[:100]},
+        )
+    return report
+
+
+def _streaming_bulk(es, actions, settings: EsIndexSettings, **kwargs) -> BulkIndexReport:
+    report = BulkIndexReport()
+    for ok, item in helpers.streaming_bulk(
+        es,
+        actions,
+        chunk_size=settings.bulk_chunk_size,
+        max_chunk_bytes=settings.bulk_max_chunk_bytes,
+        max_retries=settings.bulk_max_retries,
+        initial_backoff=settings.bulk_initial_backoff,
+        max_backoff=settings.bulk_max_backoff,
+        raise_on_error=False,
+        **kwargs,
+    ):
+        op_type, op_result = next(iter(item.items()))
+        # deleting a document that is not in the index leaves it as wanted
+        if ok or (op_type == "delete" and op_result.get("status") == 404):
+            report.num_ok += 1
+        else:
+            report.failures.append(
+                BulkFailure(
+                    id=op_result.get("_id"),
+                    status=op_result.get("status"),
+                    error=op_result.get("error"),
+                )
+            )
+    return report
@@ -0,0 +1,37 @@
+"""Generation counters of the resources' indices."""
+import threading
+from collections import defaultdict
+from typing import DefaultDict, Iterable, Tuple
+
+
+class Generations:
+    """Thread-safe counters that are bumped every time an index changes.
+
+    Anything that is computed from the contents of some indices can be cached
+    together with their generations, and is stale as soon as one of them differs.
+    The counters only see the changes that are made by this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generations: DefaultDict[str, int] = defaultdict(int)
+
+    def bump(self, index: str):
+        with self._lock:
+            self._generations[index] += 1
+
+    def get(self, indices: Iterable[str]) -> Tuple[int, ...]:
+        with self._lock:
+            return tuple(self._generations[index] for index in indices)
+
+    def total(self) -> int:
+        """The sum of all counters, which changes whenever one of them is bumped."""
+        with self._lock:
+            return sum(self._generations.values())
+
+
+# generations of the indices, by resource id (the alias of the index)
+resource_generations = Generations()
+# generations of the aliases and the published resources, by resource id, which are
+# what `AsyncEsMappingRepository` is loaded from
+mapping_generations = Generations()
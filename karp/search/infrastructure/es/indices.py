@@ -9,10 +9,27 @@ from injector import inject
 from karp.lex.domain.entities import Entry
 from karp.search.domain.index_entry import IndexEntry
 
+from .bulk import BulkIndexReport, bulk_index
+from .generations import mapping_generations, resource_generations
 from .mapping_repo import EsMappingRepository
+from .refresh import RefreshCoalescer, WriteVisibility
+from .settings import EsIndexSettings
 
 logger = logging.getLogger(__name__)
 
+# settings of an index that is used for searching
+SERVING_SETTINGS = {
+    "number_of_replicas": 1,
+    "refresh_interval": -1,
+    "translog.durability": "request",
+}
+# settings of an index that is being built by a reindex, before it is used for searching
+BUILD_SETTINGS = {
+    "number_of_replicas": 0,
+    "refresh_interval": -1,
+    "translog.durability": "async",
+}
+
 
 class EsIndex:
     @inject
@@ -20,19 +37,24 @@ class EsIndex:
         self,
         es: elasticsearch.Elasticsearch,
         mapping_repo: EsMappingRepository,
+        refresh_coalescer: Optional[RefreshCoalescer] = None,
+        settings: Optional[EsIndexSettings] = None,
     ):
         self.es = es
         self.mapping_repo = mapping_repo
+        self.refresh_coalescer = refresh_coalescer or RefreshCoalescer(es)
+        self.settings = settings or EsIndexSettings()
+
+    def create_index(self, resource_id: str, config, create_alias=True, build=False):
+        """Create a new index for the resource and return its name.
 
-    def create_index(self, resource_id: str, config, create_alias=True):
+        If `build` is True, the index is created with `BUILD_SETTINGS` for fast bulk
+        loading and `finish_build` must be called before it is used for searching.
+        """
         logger.info("creating es mapping")
         mapping = create_es_mapping(config)
 
-        settings = {
-            "number_of_shards": 1,
-            "number_of_replicas": 1,
-            "refresh_interval": -1,
-        }
+        settings = {"number_of_shards": 1} | (BUILD_SETTINGS if build else SERVING_SETTINGS)
         if "settings" in mapping:
             settings |= mapping["settings"]
             del mapping["settings"]
@@ -68,10 +90,49 @@ class EsIndex:
         logger.info("index created")
         return index_name
 
-    def create_alias(self, resource_id, index_name):
-        if self.es.indices.exists_alias(name=resource_id):
-            self.es.indices.delete_alias(name=resource_id, index="*")
-        self.es.indices.put_alias(name=resource_id, index=index_name)
+    def finish_build(self, index_name: str):
+        """Make an index created with `build=True` ready for searching.
+
+        Restores `SERVING_SETTINGS`, refreshes and force-merges the index and waits
+        until its health is `settings.reindex_wait_for_status`.
+        """
+        logger.info("finishing build of index '%s'", index_name)
+        es = self.es.options(request_timeout=self.settings.reindex_timeout)
+        es.indices.put_settings(index=index_name, settings=SERVING_SETTINGS)
+        es.indices.refresh(index=index_name)
+        es.indices.forcemerge(index=index_name, max_num_segments=1)
+        health = es.options(ignore_status=408).cluster.health(
+            index=index_name,
+            wait_for_status=self.settings.reindex_wait_for_status,
+            timeout=f"{int(self.settings.reindex_timeout)}s",
+        )
+        if health["timed_out"]:
+            raise RuntimeError(
+                f"index '{index_name}' did not reach status"
+                f" '{self.settings.reindex_wait_for_status}', it is '{health['status']}'"
+            )
+
+    def create_alias(self, resource_id, index_name, remove_old_index=False):
+        """Point the alias `resource_id` to `index_name` in one atomic operation.
+
+        If `remove_old_index` is True, the indices that the alias pointed to are
+        deleted in the same operation.
+        """
+        try:
+            old_index_names = list(self.es.indices.get_alias(name=resource_id))
+        except NotFoundError:
+            old_index_names = []
+        actions = [{"add": {"index": index_name, "alias": resource_id}}]
+        for old_index_name in old_index_names:
+            if old_index_name == index_name:
+                continue
+            if remove_old_index:
+                actions.append({"remove_index": {"index": old_index_name}})
+            else:
+                actions.append({"remove": {"index": old_index_name, "alias": resource_id}})
+        self.es.indices.update_aliases(actions=actions)
+        resource_generations.bump(resource_id)
+        mapping_generations.bump(resource_id)
 
     def delete_index(self, resource_id: str):
         try:
@@ -79,21 +140,89 @@ class EsIndex:
             self.es.indices.delete(index=index_name)
         except NotFoundError:
             pass
+        resource_generations.bump(resource_id)
+        mapping_generations.bump(resource_id)
+
+    def get_last_indexed(self, resource_id: str) -> Optional[float]:
+        """Get the watermark stored by `set_last_indexed`, if any."""
+        try:
+            mappings = self.es.indices.get_mapping(index=resource_id)
+        except NotFoundError:
+            return None
+        for index_mapping in mappings.values():
+            return index_mapping["mappings"].get("_meta", {}).get("last_indexed")
+        return None
+
+    def set_last_indexed(self, resource_id: str, timestamp: float):
+        """Store in the index that all entries modified before `timestamp` are indexed."""
+        self.es.indices.put_mapping(index=resource_id, meta={"last_indexed": timestamp})
+
+    def refresh(self, resource_id: str):
+        """Make all writes to the index visible to searches."""
+        self.es.indices.refresh(index=resource_id)
+        resource_generations.bump(resource_id)
 
-    def add_entries(self, resource_id: str, entries: Iterable[IndexEntry]):
-        index_to_es = []
-        for entry in entries:
-            if not isinstance(entry, IndexEntry):
-                raise Exception("Will this happen?")
-            index_to_es.append(
-                {
+    def _write(self, resource_id: str, visibility: Optional[WriteVisibility], write):
+        """Do `write(refresh)` and make it visible according to `visibility`."""
+        visibility = visibility or self.settings.write_visibility
+        result = write(visibility == WriteVisibility.IMMEDIATE)
+        resource_generations.bump(resource_id)
+        if visibility == WriteVisibility.WAIT_FOR:
+            self.refresh_coalescer.refresh(resource_id, wait=True)
+        elif visibility == WriteVisibility.ASYNC:
+            self.refresh_coalescer.refresh(resource_id, wait=False)
+        return result
+
+    def add_entries(
+        self,
+        resource_id: str,
+        entries: Iterable[IndexEntry],
+        *,
+        visibility: Optional[WriteVisibility] = None,
+    ) -> BulkIndexReport:
+        """Index the entries in bulk, see `bulk.bulk_index`.
+
+        The entries are consumed lazily. Returns a report of the documents that failed.
+        """
+        return self.write_entries(resource_id, entries, [], visibility=visibility)
+
+    def delete_entries(
+        self,
+        resource_id: str,
+        entry_ids: Iterable[str],
+        *,
+        visibility: Optional[WriteVisibility] = None,
+    ) -> BulkIndexReport:
+        """Delete entries in bulk, entries not in the index are ignored."""
+        return self.write_entries(resource_id, [], entry_ids, visibility=visibility)
+
+    def write_entries(
+        self,
+        resource_id: str,
+        entries: Iterable[IndexEntry],
+        deleted_entry_ids: Iterable[str],
+        *,
+        visibility: Optional[WriteVisibility] = None,
+    ) -> BulkIndexReport:
+        """Index `entries` and delete `deleted_entry_ids` in the same bulk requests."""
+
+        def actions():
+            for entry in entries:
+                if not isinstance(entry, IndexEntry):
+                    raise Exception("Will this happen?")
+                yield {
                     "_index": resource_id,
                     "_id": entry.id,
                     "_source": entry.entry,
                 }
-            )
+            for entry_id in deleted_entry_ids:
+                yield {"_op_type": "delete", "_index": resource_id, "_id": str(entry_id)}
 
-        elasticsearch.helpers.bulk(self.es, index_to_es, refresh=True)
+        return self._write(
+            resource_id,
+            visibility,
+            lambda refresh: bulk_index(self.es, actions(), self.settings, refresh=refresh),
+        )
 
     def delete_entry(
         self,
@@ -101,6 +230,7 @@ class EsIndex:
         *,
         entry_id: Optional[str] = None,
         entry: Optional[Entry] = None,
+        visibility: Optional[WriteVisibility] = None,
     ):
         if not entry and not entry_id:
             raise ValueError("Must give either 'entry' or 'entry_id'.")
@@ -108,12 +238,12 @@ class EsIndex:
             entry_id = entry.entry_id
         logger.info("deleting entry", extra={"entry_id": entry_id, "resource_id": resource_id})
         try:
-            self.es.delete(
-                index=resource_id,
-                id=entry_id,
-                refresh=True,
+            self._write(
+                resource_id,
+                visibility,
+                lambda refresh: self.es.delete(index=resource_id, id=entry_id, refresh=refresh),
             )
-        except elasticsearch.exceptions.ElasticsearchException:
+        except elasticsearch.ApiError:
             logger.exception(
                 "Error deleting entry",
                 extra={
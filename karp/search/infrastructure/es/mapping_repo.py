@@ -1,16 +1,24 @@
+import asyncio
 import logging
 import re
+import time
 from dataclasses import dataclass
 from itertools import groupby
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import elasticsearch
 from injector import inject
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
 
+from karp.lex.domain.entities import Resource
 from karp.lex.infrastructure import ResourceRepository
 from karp.main.errors import KarpError
 from karp.search.domain.errors import UnsupportedField
 
+from .generations import mapping_generations
+from .settings import EsSearchSettings
+
 logger = logging.getLogger("karp")
 
 
@@ -61,27 +69,33 @@ class EsMappingRepository:
     @inject
     def __init__(self, es: elasticsearch.Elasticsearch, resource_repo: ResourceRepository):
         self.es = es
-
+        self._load(
+            _default_sorts(resource_repo.get_published_resources()),
+            self._get_all_aliases(),
+            self.es.indices.get_mapping(),
+        )
+
+    def _load(
+        self,
+        default_sort: Dict[str, str],
+        aliases: List[Tuple[str, str]],
+        mapping: Dict[str, Dict[str, Dict[str, Dict[str, Dict]]]],
+    ):
         self.fields: Dict[str, Dict[str, Field]] = {}
         self.sortable_fields: Dict[str, Dict[str, Field]] = {}
-        resources = resource_repo.get_published_resources()
-
-        self.default_sort: Dict[str, str] = {
-            resource.resource_id: resource.config.get("sort") or resource.config.get("id")
-            for resource in resources
-        }
-
-        aliases = self._get_all_aliases()
-        self._update_field_mapping(aliases)
+        self.default_sort: Dict[str, str] = default_sort
+        self._update_field_mapping(aliases, mapping)
+        # index name -> the alias (resource id) that points to it
+        self.resource_by_index: Dict[str, str] = {index: alias for alias, index in aliases}
 
     def _update_field_mapping(
-        self, aliases: List[Tuple[str, str]]
-    ) -> Dict[str, Dict[str, Field]]:
+        self,
+        aliases: List[Tuple[str, str]],
+        mapping: Dict[str, Dict[str, Dict[str, Dict[str, Dict]]]],
+    ):
         """
         Create a field mapping based on the mappings of elasticsearch.
         """
-
-        mapping: Dict[str, Dict[str, Dict[str, Dict[str, Dict]]]] = self.es.indices.get_mapping()
         for alias, index in aliases:
             if "mappings" in mapping[index] and "properties" in mapping[index]["mappings"]:
                 self.fields[alias] = self._get_fields_from_mapping(
@@ -135,18 +149,7 @@ class EsMappingRepository:
         """
         :return: a list of tuples (alias_name, index_name)
         """
-        result = self.es.cat.aliases(h="alias,index")
-        logger.debug(f"{result}")
-        index_names = []
-        for index_name in result.split("\n")[:-1]:
-            logger.debug(f"index_name = {index_name}")
-            if index_name[0] != ".":
-                if match := re.search(r"([^ ]*) +(.*)", index_name):
-                    groups = match.groups()
-                    alias = groups[0]
-                    index = groups[1]
-                    index_names.append((alias, index))
-        return index_names
+        return _parse_aliases(self.es.cat.aliases(h="alias,index"))
 
     def check_resource_is_published(self, resource_id):
         return resource_id in self.default_sort
@@ -204,3 +207,83 @@ class EsMappingRepository:
             raise UnsupportedField(
                 f"You can't sort by field '{sort_value}' for resource '{resource_id}'"
             )
+
+
+class AsyncEsMappingRepository(EsMappingRepository):
+    """`EsMappingRepository` for the async API, loaded with the async ES client.
+
+    One instance is shared by all requests of the process, and `load` must be awaited
+    before it is used. It loads the mappings again when this process has changed an
+    alias or the published resources (see `mapping_generations`), and at least every
+    `settings.mapping_reload_interval` seconds, for the changes made by the CLI and
+    other processes.
+    """
+
+    @inject
+    def __init__(
+        self,
+        es: elasticsearch.AsyncElasticsearch,
+        engine: Engine,
+        settings: Optional[EsSearchSettings] = None,
+    ):
+        self.es = es
+        self.engine = engine
+        self.settings = settings or EsSearchSettings()
+        self._load({}, [], {})
+        # (generation, time) of the last load
+        self._loaded: Optional[Tuple[int, float]] = None
+        self._lock = asyncio.Lock()
+
+    def _is_stale(self) -> bool:
+        if self._loaded is None:
+            return True
+        generation, loaded_at = self._loaded
+        return (
+            generation != mapping_generations.total()
+            or time.monotonic() - loaded_at >= self.settings.mapping_reload_interval
+        )
+
+    async def load(self):
+        """Load the mappings, unless they are loaded and not stale."""
+        if not self._is_stale():
+            return
+        async with self._lock:
+            # another request may have loaded them while this one waited
+            if not self._is_stale():
+                return
+            loaded = (mapping_generations.total(), time.monotonic())
+            # the DB has no async driver, so the resources are read in a thread
+            default_sort = await asyncio.to_thread(self._get_default_sorts)
+            aliases = _parse_aliases(await self.es.cat.aliases(h="alias,index"))
+            mapping = await self.es.indices.get_mapping()
+            self._load(default_sort, aliases, mapping)
+            self._loaded = loaded
+
+    def _get_default_sorts(self) -> Dict[str, str]:
+        with Session(self.engine) as session:
+            return _default_sorts(ResourceRepository(session).get_published_resources())
+
+
+def _default_sorts(resources: Iterable[Resource]) -> Dict[str, str]:
+    return {
+        resource.resource_id: resource.config.get("sort") or resource.config.get("id")
+        for resource in resources
+    }
+
+
+def _parse_aliases(result: str) -> List[Tuple[str, str]]:
+    """Parse the aliases from the response of `cat.aliases(h="alias,index")`.
+
+    :return: a list of tuples (alias_name, index_name)
+    """
+    logger.debug(f"{result}")
+    index_names = []
+    for index_name in result.split("\n")[:-1]:
+        logger.debug(f"index_name = {index_name}")
+        if index_name[0] != ".":
+            if match := re.search(r"([^ ]*) +(.*)", index_name):
+                groups = match.groups()
+                alias = groups[0]
+                index = groups[1]
+                index_names.append((alias, index))
+    return index_names
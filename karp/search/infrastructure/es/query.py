@@ -16,6 +16,7 @@ class EsQuery(pydantic.BaseModel):
     exclude_fields: typing.Optional[list[str]] = None
     q: typing.Optional[str] = None
     sort_dict: typing.Optional[dict[str, list[str]]] = pydantic.Field(default_factory=dict)
+    cursor: typing.Optional[str] = None
 
     @classmethod
     def from_query_request(cls, request: QueryRequest):
@@ -26,6 +27,9 @@ class EsQuery(pydantic.BaseModel):
         query.lexicon_stats = request.lexicon_stats
         query.q = request.q or ""
         query.sort = request.sort or []
+        query.cursor = request.cursor
+        query.include_fields = request.include_fields
+        query.exclude_fields = request.exclude_fields
         return query
 
     class Config:
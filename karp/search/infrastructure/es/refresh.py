@@ -0,0 +1,77 @@
+"""Control when writes to Elasticsearch become visible to searches."""
+import enum
+import logging
+import threading
+from typing import Dict, Optional
+
+import elasticsearch
+
+from .generations import resource_generations
+
+logger = logging.getLogger(__name__)
+
+
+class WriteVisibility(str, enum.Enum):
+    """When a write should be visible to searches.
+
+    Our indices are created with `refresh_interval: -1`, so a written document is
+    only searchable after an explicit refresh of the index.
+    """
+
+    # refresh the index in the write request itself
+    IMMEDIATE = "immediate"
+    # wait until a (coalesced) refresh that includes the write is done
+    WAIT_FOR = "wait_for"
+    # schedule a (coalesced) refresh, but don't wait for it
+    ASYNC = "async"
+    # don't refresh at all, the caller is responsible for calling `EsIndex.refresh`
+    NONE = "none"
+
+
+class RefreshCoalescer:
+    """Batch refreshes per index.
+
+    Refresh requests for an index that arrive within `window` seconds are served by
+    one single refresh of that index, so many concurrent edits cost one Lucene
+    refresh instead of one each.
+    """
+
+    def __init__(self, es: elasticsearch.Elasticsearch, window: float = 0.2):
+        self.es = es
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending: Dict[str, threading.Event] = {}
+        self._timer: Optional[threading.Timer] = None
+
+    def request_refresh(self, index: str) -> threading.Event:
+        """Schedule a refresh of the index, the returned event is set when it is done."""
+        with self._lock:
+            if index not in self._pending:
+                self._pending[index] = threading.Event()
+            done = self._pending[index]
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return done
+
+    def refresh(self, index: str, *, wait: bool = True, timeout: Optional[float] = 30.0):
+        done = self.request_refresh(index)
+        if wait and not done.wait(timeout):
+            logger.warning("Timed out waiting for refresh of '%s'", index)
+
+    def flush(self):
+        """Refresh all indices with pending refresh requests now."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        for index, done in pending.items():
+            try:
+                self.es.indices.refresh(index=index)
+            except (elasticsearch.ApiError, elasticsearch.TransportError):
+                logger.exception("Failed to refresh index '%s'", index)
+            finally:
+                resource_generations.bump(index)
+                done.set()
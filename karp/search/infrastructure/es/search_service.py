@@ -1,5 +1,8 @@
+import base64
+import json
 import logging
-from typing import Any, Iterable
+import time
+from typing import Any, Callable, Iterable, Iterator, Optional
 
 import elasticsearch
 import elasticsearch.helpers
@@ -8,17 +11,114 @@ from injector import inject
 from tatsu import exceptions as tatsu_exc
 from tatsu.walkers import NodeWalker
 
+from karp.foundation.cache import LruCache
+from karp.main.errors import ClientErrorCodes, KarpError
 from karp.search.domain import QueryRequest, errors
-from karp.search.domain.query_dsl.karp_query_v6_model import (
-    KarpQueryV6ModelBuilderSemantics,
-)
-from karp.search.domain.query_dsl.karp_query_v6_parser import KarpQueryV6Parser
+from karp.search.domain.query_dsl import QueryParseError, create_query_parser
 
+from .generations import resource_generations
 from .mapping_repo import EsMappingRepository
 from .query import EsQuery
+from .settings import EsSearchSettings
 
 logger = logging.getLogger(__name__)
 
+# query string -> (ES query as a dict, field names in the query)
+parsed_queries = LruCache(maxsize=1024, name="parsed_queries")
+
+
+def _json_size(value) -> int:
+    return len(json.dumps(value, default=str))
+
+
+# (query, generations of its resources, time period) -> search result
+search_results = LruCache(
+    maxsize=10_000, maxbytes=64 * 1024 * 1024, sizeof=_json_size, name="search_results"
+)
+
+# (resource, field, page, generation of the resource, time period) -> field values
+field_statistics = LruCache(
+    maxsize=1_000, maxbytes=64 * 1024 * 1024, sizeof=_json_size, name="field_statistics"
+)
+
+
+# fields in the index with metadata of the entry, not from the entry itself
+ENTRY_METADATA_FIELDS = ("_entry_version", "_last_modified", "_last_modified_by")
+
+
+class IndexResources(dict):
+    """Maps the names of indices to the resources that they belong to.
+
+    Starts from the aliases known by `EsMappingRepository`. Other indices, such as
+    indices created after that, are resolved from their names, which start with the
+    resource id, and are then remembered.
+    """
+
+    def __init__(self, resource_by_index: dict[str, str], resource_ids: list[str]):
+        super().__init__(resource_by_index)
+        self.resource_ids = resource_ids
+
+    def __missing__(self, index: str) -> str:
+        # index names are "<resource_id>_<timestamp>"
+        resource_id = index.rsplit("_", 1)[0]
+        if resource_id not in self.resource_ids:
+            resource_id = next(
+                (resource for resource in self.resource_ids if index.startswith(resource)),
+                resource_id,
+            )
+        self[index] = resource_id
+        return resource_id
+
+
+def _msearch_body(searches: list[tuple[list[str], es_dsl.Search]]) -> list[dict]:
+    body = []
+    for index, s in searches:
+        body.extend(({"index": index}, s.to_dict()))
+    return body
+
+
+def _msearch_responses(response, raise_on_error: bool) -> list[dict]:
+    if raise_on_error:
+        for item in response.body["responses"]:
+            if item.get("error"):
+                raise elasticsearch.ApiError("N/A", meta=response.meta, body=item)
+    return response.body["responses"]
+
+
+def _query_error(err: Exception) -> dict:
+    """The error of a query in `multi_query_items`, like the error response of a search."""
+    if isinstance(err, errors.IncompleteQuery):
+        return {
+            "status": 400,
+            "errorCode": ClientErrorCodes.SEARCH_INCOMPLETE_QUERY,
+            "message": "Error in query",
+            "failing_query": err.failing_query,
+            "error_description": err.error_description,
+        }
+    if isinstance(err, KarpError):
+        return {"status": err.http_return_code, "errorCode": err.code, "message": err.message}
+    return {"status": 400, "errorCode": ClientErrorCodes.UNKNOWN_ERROR, "message": str(err)}
+
+
+def _encode_token(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+def _decode_token(token: str, *keys: str) -> tuple:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return tuple(data[key] for key in keys)
+    except (ValueError, TypeError, KeyError) as err:
+        raise errors.InvalidCursor(token, "the cursor is malformed") from err
+
+
+def encode_cursor(pit_id: str, search_after: list) -> str:
+    return _encode_token({"pit": pit_id, "search_after": search_after})
+
+
+def decode_cursor(cursor: str) -> tuple[str, list]:
+    return _decode_token(cursor, "pit", "search_after")
+
 
 class EsQueryBuilder(NodeWalker):
     def __init__(self, q=None):
@@ -142,153 +242,112 @@ class EsFieldNameCollector(NodeWalker):
         return set()
 
 
-class EsSearchService:
-    @inject
-    def __init__(
-        self,
-        es: elasticsearch.Elasticsearch,
-        mapping_repo: EsMappingRepository,
-    ):
-        self.es: elasticsearch.Elasticsearch = es
-        self.mapping_repo = mapping_repo
-        self.field_name_collector = EsFieldNameCollector()
-        self.parser = KarpQueryV6Parser(semantics=KarpQueryV6ModelBuilderSemantics())
-
-    def _format_result(self, resource_ids, response):
-        logger.debug("_format_result called", extra={"resource_ids": resource_ids})
-
-        def format_entry(entry):
-            dict_entry = entry.to_dict()
-            version = dict_entry.pop("_entry_version", None)
-            last_modified_by = dict_entry.pop("_last_modified_by", None)
-            last_modified = dict_entry.pop("_last_modified", None)
-            return {
-                "id": entry.meta.id,
-                "version": version,
-                "last_modified": last_modified,
-                "last_modified_by": last_modified_by,
-                "resource": next(
-                    resource
-                    for resource in resource_ids
-                    if entry.meta.index.startswith(resource)
-                ),
-                "entry": dict_entry,
-            }
-
-        result = {
-            "total": response.hits.total.value,
-            "hits": [format_entry(entry) for entry in response],
-        }
-        return result
-
-    def query(self, request: QueryRequest):
-        logger.info("query called", extra={"request": request})
-        query = EsQuery.from_query_request(request)
-        return self.search_with_query(query)
-
-    def query_stats(self, resources, q):
-        query = EsQuery()
-        query.resources = resources
-        query.from_ = 0
-        query.size = 0
-        query.lexicon_stats = True
-        query.q = q or ""
-        query.split_results = False
-        return self.search_with_query(query)
-
-    def multi_query(self, requests: list[QueryRequest]):
-        # ES fails on a multi-search with an empty request list
-        if not requests:
-            return []
+class EsSearchBuilder:
+    """Builds the searches of the search services and formats their responses.
 
-        logger.info(f"multi_query called for {len(requests)} requests")
+    This sends no requests to ES, so `EsSearchService` and `AsyncEsSearchService`
+    both use it, each with its own client.
+    """
 
-        queries = [EsQuery.from_query_request(request) for request in requests]
-        ms = es_dsl.MultiSearch(using=self.es)
-        for query in queries:
-            ms = ms.add(self._build_search(query, query.resources))
-        responses = ms.execute()
-        return [
-            self._build_result(query, response) for query, response in zip(queries, responses)
-        ]
-
-    def search_with_query(self, query: EsQuery):
-        logger.info("search_with_query called", extra={"query": query})
-        if query.split_results:
-            ms = es_dsl.MultiSearch(using=self.es)
-
-            for resource in query.resources:
-                s = self._build_search(query, [resource])
-                ms = ms.add(s)
-
-            responses = ms.execute()
-            result: dict[str, Any] = {"total": 0, "hits": {}}
-            for i, response in enumerate(responses):
-                result["hits"][query.resources[i]] = self._format_result(
-                    query.resources, response
-                ).get("hits", [])
-                result["total"] += response.hits.total.value
-                if query.lexicon_stats:
-                    if "distribution" not in result:
-                        result["distribution"] = {}
-                    result["distribution"][query.resources[i]] = response.hits.total.value
-        else:
-            s = self._build_search(query, query.resources)
-            response = s.execute()
-
-            # TODO format response in a better way, because the whole response takes up too much space in the logs
-            # logger.debug('response = {}'.format(response.to_dict()))
-            result = self._build_result(query, response)
-
-        return result
-
-    def _build_search(self, query, resources):
-        field_names = set()
+    def __init__(self, mapping_repo: EsMappingRepository, settings: EsSearchSettings):
+        self.mapping_repo = mapping_repo
+        self.settings = settings
+        self.field_name_collector = EsFieldNameCollector()
+        self.parser = create_query_parser(settings.query_parser)
+
+    def parse_query(self, q: str) -> tuple[es_dsl.query.Query, frozenset[str]]:
+        """Parse a query string into an ES query and the field names that it uses.
+
+        Parsed queries are cached in `parsed_queries`. A new ES query object is
+        returned every time, since they are mutable.
+        """
+        query_dict, field_names = parsed_queries.get(q, lambda: self._parse_query(q))
+        return es_dsl.Q(query_dict), field_names
+
+    def _parse_query(self, q: str) -> tuple[dict, frozenset[str]]:
+        try:
+            model = self.parser.parse(q)
+            es_query = EsQueryBuilder(q).walk(model)
+            field_names = self.field_name_collector.walk(model)
+        except (tatsu_exc.FailedParse, QueryParseError) as err:
+            logger.info("Parse error", extra={"err": err})
+            raise errors.IncompleteQuery(failing_query=q, error_description=str(err)) from err
+        return es_query.to_dict(), frozenset(field_names)
+
+    def cache_key(self, key, resource_ids: list[str]) -> Optional[tuple]:
+        """The key of a cached value, or None if caching is disabled.
+
+        The value is cached with the generations of the resources, and for at most
+        `settings.result_cache_ttl` seconds, since changes made by other processes are
+        not seen by the generations.
+        """
+        ttl = self.settings.result_cache_ttl
+        if ttl <= 0:
+            return None
+        return (key, resource_generations.get(resource_ids), int(time.monotonic() // ttl))
+
+    def build_search(self, query, resources, pit=None, search_after=None) -> es_dsl.Search:
+        """Build the search for `query` in `resources`.
+
+        If `pit` is given, the search is done in that point in time instead, with the
+        entry after the `search_after` sort values as the first hit.
+        """
+        field_names = frozenset()
         es_query = None
         if query.q:
-            try:
-                model = self.parser.parse(query.q)
-                es_query = EsQueryBuilder(query.q).walk(model)
-                field_names = self.field_name_collector.walk(model)
-            except tatsu_exc.FailedParse as err:
-                logger.info("Parse error", extra={"err": err})
-                raise errors.IncompleteQuery(
-                    failing_query=query.q, error_description=str(err)
-                ) from err
-
-        s = es_dsl.Search(using=self.es, index=resources)
+            es_query, field_names = self.parse_query(query.q)
+
+        if pit is None:
+            s = es_dsl.Search(index=resources)
+        else:
+            s = es_dsl.Search().extra(pit=pit)
         s = self.add_runtime_mappings(s, field_names)
         s = s.extra(track_total_hits=True)  # get accurate hits numbers
         if es_query is not None:
             s = s.query(es_query)
+        if query.include_fields or query.exclude_fields:
+            s = s.source(**self._source_filter(query.include_fields, query.exclude_fields))
 
-        s = s[query.from_ : query.from_ + query.size]
+        if search_after is None:
+            s = s[query.from_ : query.from_ + query.size]
+        else:
+            s = s.extra(search_after=search_after)[: query.size]
 
         if query.lexicon_stats:
             s.aggs.bucket("distribution", "terms", field="_index", size=len(resources))
+        sort = []
         if query.size != 0:
             # if no hits are returned, no sorting is needed
             if query.sort:
-                s = s.sort(*self.mapping_repo.translate_sort_fields(resources, query.sort))
+                sort = self.mapping_repo.translate_sort_fields(resources, query.sort)
             else:
                 new_s = self.mapping_repo.get_default_sort(resources)
                 if new_s:
-                    s = s.sort(new_s)
+                    sort = [new_s]
+            if pit is not None:
+                # unique for every entry in a point in time, so no entry is skipped or
+                # returned twice when paging with search_after
+                sort = [*sort, "_shard_doc"]
+        if sort:
+            s = s.sort(*sort)
 
         logger.debug("s = %s", extra={"es_query s": s.to_dict()})
         return s
 
-    def _build_result(self, query, response):
-        logger.debug("calling _build_result")
-        result = self._format_result(query.resources, response)
-        if query.lexicon_stats:
-            result["distribution"] = {}
-            for bucket in response.aggregations.distribution.buckets:
-                key = bucket["key"]
-                result["distribution"][key.rsplit("_", 1)[0]] = bucket["doc_count"]
-        return result
-
-    def add_runtime_mappings(self, s: es_dsl.Search, field_names: set[str]) -> es_dsl.Search:
+    def _source_filter(self, include_fields, exclude_fields) -> dict[str, list[str]]:
+        """Source filtering that keeps the metadata that `format_hit` returns."""
+        source = {}
+        if include_fields:
+            source["includes"] = [*include_fields, *ENTRY_METADATA_FIELDS]
+        if exclude_fields:
+            source["excludes"] = [
+                field for field in exclude_fields if field not in ENTRY_METADATA_FIELDS
+            ]
+        return source
+
+    def add_runtime_mappings(
+        self, s: es_dsl.Search, field_names: Iterable[str]
+    ) -> es_dsl.Search:
         # When a query uses a field of the form "f.length", add a
         # runtime_mapping so it gets interpreted as "the length of the field f".
         mappings = {}
@@ -306,23 +365,154 @@ class EsSearchService:
             s = s.extra(runtime_mappings=mappings)
         return s
 
-    def search_ids(self, resource_id: str, entry_ids: str):
-        logger.info(
-            "Called EsSearch.search_ids with:",
-            extra={"resource_id": resource_id, "entry_ids": entry_ids},
+    def index_resources(self, resource_ids: list[str]) -> "IndexResources":
+        return IndexResources(self.mapping_repo.resource_by_index, resource_ids)
+
+    def format_hit(self, index_resources: "IndexResources", hit: dict) -> dict:
+        entry = hit.get("_source", {})
+        return {
+            "id": hit["_id"],
+            "version": entry.pop("_entry_version", None),
+            "last_modified": entry.pop("_last_modified", None),
+            "last_modified_by": entry.pop("_last_modified_by", None),
+            "resource": index_resources[hit["_index"]],
+            "entry": entry,
+        }
+
+    def format_result(self, resource_ids, response: dict):
+        logger.debug("format_result called", extra={"resource_ids": resource_ids})
+        index_resources = self.index_resources(resource_ids)
+        result = {
+            "total": response["hits"]["total"]["value"],
+            "hits": [self.format_hit(index_resources, hit) for hit in response["hits"]["hits"]],
+        }
+        return result
+
+    def build_result(self, query, response):
+        logger.debug("calling build_result")
+        result = self.format_result(query.resources, response)
+        if query.lexicon_stats:
+            index_resources = self.index_resources(query.resources)
+            result["distribution"] = {}
+            for bucket in response["aggregations"]["distribution"]["buckets"]:
+                result["distribution"][index_resources[bucket["key"]]] = bucket["doc_count"]
+        return result
+
+    def stats_query(self, resources, q) -> EsQuery:
+        query = EsQuery()
+        query.resources = resources
+        query.from_ = 0
+        query.size = 0
+        query.lexicon_stats = True
+        query.q = q or ""
+        query.split_results = False
+        return query
+
+    def split_searches(self, query: EsQuery) -> list[tuple[list[str], es_dsl.Search]]:
+        return [
+            ([resource], self.build_search(query, [resource])) for resource in query.resources
+        ]
+
+    def split_result(self, query: EsQuery, responses: list[dict]) -> dict:
+        result: dict[str, Any] = {"total": 0, "hits": {}}
+        for i, response in enumerate(responses):
+            result["hits"][query.resources[i]] = self.format_result(
+                query.resources, response
+            ).get("hits", [])
+            total = response["hits"]["total"]["value"]
+            result["total"] += total
+            if query.lexicon_stats:
+                if "distribution" not in result:
+                    result["distribution"] = {}
+                result["distribution"][query.resources[i]] = total
+        return result
+
+    def multi_query_searches(
+        self, queries: list[EsQuery]
+    ) -> list[tuple[list[str], es_dsl.Search]]:
+        return [
+            (query.resources, self.build_search(query, query.resources)) for query in queries
+        ]
+
+    def multi_query_items(self, requests: list[QueryRequest]) -> tuple[list, list]:
+        """Build the items of `multi_query_items` and (item, query, search) to run."""
+        items = [{"result": None, "error": None} for _ in requests]
+        searches = []
+        for item, request in zip(items, requests):
+            query = EsQuery.from_query_request(request)
+            try:
+                searches.append((item, query, self.build_search(query, query.resources)))
+            except (errors.IncompleteQuery, errors.UnsupportedField, KarpError) as err:
+                item["error"] = _query_error(err)
+        return items, searches
+
+    def multi_query_results(self, searches: list, responses: list[dict]) -> None:
+        for (item, query, _), response in zip(searches, responses):
+            if response.get("error"):
+                logger.warning("Search failed", extra={"error": response["error"]})
+                item["error"] = {
+                    "status": response.get("status", 500),
+                    "errorCode": ClientErrorCodes.UNKNOWN_ERROR,
+                    "message": "Search failed",
+                }
+            else:
+                item["result"] = self.build_result(query, response)
+
+    def cursor_search(self, query: EsQuery, pit_id: str, search_after) -> es_dsl.Search:
+        return self.build_search(
+            query,
+            query.resources,
+            pit={"id": pit_id, "keep_alive": self.settings.cursor_keep_alive},
+            search_after=search_after,
         )
-        entries = entry_ids.split(",")
-        query = es_dsl.Q("terms", _id=entries)
-        logger.debug("query", extra={"query": query})
-        s = es_dsl.Search(using=self.es, index=resource_id).query(query)
-        logger.debug("s", extra={"es_query s": s.to_dict()})
-        response = s.execute()
-
-        return self._format_result([resource_id], response)
-
-    def statistics(self, resource_id: str, field: str) -> Iterable:
-        s = es_dsl.Search(using=self.es, index=resource_id)
-        s = s[:0]
+
+    def cursor_result(self, query: EsQuery, response: dict) -> dict:
+        """The result of a cursor page, where a None cursor means that the PIT is done."""
+        result = self.build_result(query, response)
+        hits = response["hits"]["hits"]
+        if query.size > 0 and len(hits) == query.size:
+            result["cursor"] = encode_cursor(response["pit_id"], hits[-1]["sort"])
+        else:
+            result["cursor"] = None
+        return result
+
+    def export_search(self, request: QueryRequest) -> tuple[EsQuery, es_dsl.Search]:
+        query = EsQuery.from_query_request(request)
+        query.from_ = 0
+        query.size = self.settings.export_page_size
+        query.lexicon_stats = False
+        keep_alive = self.settings.cursor_keep_alive
+        s = self.build_search(query, query.resources, pit={"keep_alive": keep_alive})
+        return query, s.extra(track_total_hits=False)
+
+    def export_page(self, s: es_dsl.Search, pit_id: str, search_after) -> es_dsl.Search:
+        page = s.extra(pit={"id": pit_id, "keep_alive": self.settings.cursor_keep_alive})
+        if search_after is not None:
+            page = page.extra(search_after=search_after)
+        return page
+
+    def id_batches(self, entry_ids: str) -> Iterator[list[str]]:
+        """Split the comma-separated ids into batches, without duplicates or empty ids.
+
+        ES fails a multi-get of an empty id, so "a," gives only "a" and "," no batches.
+        """
+        ids = list(dict.fromkeys(id_.strip() for id_ in entry_ids.split(",") if id_.strip()))
+        batch_size = self.settings.mget_batch_size
+        for start in range(0, len(ids), batch_size):
+            yield ids[start : start + batch_size]
+
+    def found_hits(self, index_resources: "IndexResources", response) -> list[dict]:
+        hits = []
+        for doc in response.body["docs"]:
+            if doc.get("error"):
+                raise elasticsearch.ApiError("N/A", meta=response.meta, body=doc)
+            if doc["found"]:
+                hits.append(self.format_hit(index_resources, doc))
+        return hits
+
+    def statistics_search(
+        self, resource_id: str, field: str, size: int, after_key: Optional[dict]
+    ) -> es_dsl.Search:
         if (
             field in self.mapping_repo.fields[resource_id]
             and self.mapping_repo.fields[resource_id][field].analyzed
@@ -333,10 +523,269 @@ class EsSearchService:
                 resource_id=resource_id, field=field
             )
         )
-        s.aggs.bucket("field_values", "terms", field=field, size=2147483647)
-        response = s.execute()
-        logger.debug("Elasticsearch response", extra={"response": response})
+        s = es_dsl.Search(index=resource_id)[:0]
+        composite = {"size": size, "sources": [{"value": {"terms": {"field": field}}}]}
+        if after_key is not None:
+            composite["after"] = after_key
+        s.aggs.bucket("field_values", "composite", **composite)
+        return s.extra(track_total_hits=False)
+
+
+class EsSearchService:
+    @inject
+    def __init__(
+        self,
+        es: elasticsearch.Elasticsearch,
+        mapping_repo: EsMappingRepository,
+        settings: Optional[EsSearchSettings] = None,
+    ):
+        self.es = es
+        self.mapping_repo = mapping_repo
+        self.settings = settings or EsSearchSettings()
+        self.builder = EsSearchBuilder(mapping_repo, self.settings)
+
+    def _execute(self, s: es_dsl.Search, index=None) -> dict:
+        """Run the search and return the response as it is.
+
+        This skips wrapping the response and every hit in `es_dsl` objects, the hits
+        are formatted straight from the JSON with `EsSearchBuilder.format_hit`.
+        """
+        return self.es.search(index=index, body=s.to_dict()).body
+
+    def _execute_multi(
+        self, searches: list[tuple[list[str], es_dsl.Search]], raise_on_error: bool = True
+    ) -> list[dict]:
+        """Run (index, search) pairs in one multi-search and return the responses.
+
+        If `raise_on_error` is False, a failed search gives its error response
+        instead of raising `ApiError`.
+        """
+        response = self.es.msearch(searches=_msearch_body(searches))
+        return _msearch_responses(response, raise_on_error)
+
+    def _cached(self, cache: LruCache, key, resource_ids: list[str], compute: Callable):
+        """Get the value of `compute()` from `cache`, for the current state of the resources.
+
+        See `EsSearchBuilder.cache_key` for how long a value is used.
+        """
+        key = self.builder.cache_key(key, resource_ids)
+        if key is None:
+            return compute()
+        return cache.get(key, compute)
+
+    def parse_query(self, q: str) -> tuple[es_dsl.query.Query, frozenset[str]]:
+        return self.builder.parse_query(q)
+
+    def query(self, request: QueryRequest):
+        logger.info("query called", extra={"request": request})
+        query = EsQuery.from_query_request(request)
+        return self.search_with_query(query)
+
+    def export(self, request: QueryRequest) -> Iterator[dict]:
+        """Get all hits of the query, formatted like the hits of `query`.
+
+        The hits are fetched `settings.export_page_size` at a time, with search_after in
+        a point in time of the resources, so all of them are never in memory at once.
+        The query is checked before this returns, so errors in it are raised here and
+        not when iterating. The point in time is opened when iterating starts and
+        closed when the iterator is exhausted or closed.
+        """
+        logger.info("export called", extra={"request": request})
+        query, s = self.builder.export_search(request)
+        return self._export(query, s)
+
+    def _export(self, query: EsQuery, s: es_dsl.Search) -> Iterator[dict]:
+        index_resources = self.builder.index_resources(query.resources)
+        search_after = None
+        pit_id = self.es.open_point_in_time(
+            index=query.resources, keep_alive=self.settings.cursor_keep_alive
+        )["id"]
+        try:
+            while True:
+                response = self._execute(self.builder.export_page(s, pit_id, search_after))
+                pit_id = response["pit_id"]
+                hits = response["hits"]["hits"]
+                for hit in hits:
+                    yield self.builder.format_hit(index_resources, hit)
+                if len(hits) < query.size:
+                    return
+                search_after = hits[-1]["sort"]
+        finally:
+            self.es.close_point_in_time(id=pit_id)
+
+    def query_stats(self, resources, q):
+        return self.search_with_query(self.builder.stats_query(resources, q))
+
+    def multi_query(self, requests: list[QueryRequest]):
+        # ES fails on a multi-search with an empty request list
+        if not requests:
+            return []
+
+        logger.info(f"multi_query called for {len(requests)} requests")
+
+        queries = [EsQuery.from_query_request(request) for request in requests]
+        responses = self._execute_multi(self.builder.multi_query_searches(queries))
         return [
-            {"value": bucket["key"], "count": bucket["doc_count"]}
-            for bucket in response.aggregations.field_values.buckets
+            self.builder.build_result(query, response)
+            for query, response in zip(queries, responses)
         ]
+
+    def multi_query_items(self, requests: list[QueryRequest]) -> list[dict]:
+        """Like `multi_query`, but a failing request doesn't fail the others.
+
+        Returns `{"result": ..., "error": None}` or `{"result": None, "error": ...}`
+        for every request, in order. Requests with errors in the query are not sent
+        to ES.
+        """
+        logger.info(f"multi_query_items called for {len(requests)} requests")
+        items, searches = self.builder.multi_query_items(requests)
+        # ES fails on a multi-search with an empty request list
+        if searches:
+            responses = self._execute_multi(
+                [(query.resources, s) for _, query, s in searches], raise_on_error=False
+            )
+            self.builder.multi_query_results(searches, responses)
+        return items
+
+    def search_with_query(self, query: EsQuery):
+        """Search with the query, or return the cached result of an identical search.
+
+        A result is not used after any of the searched resources has changed, see
+        `_cached`. The result must not be modified.
+        """
+        logger.info("search_with_query called", extra={"query": query})
+        if query.cursor:
+            return self._search_with_cursor(query)
+        return self._cached(
+            search_results,
+            query.json(by_alias=True, sort_keys=True),
+            query.resources,
+            lambda: self._search_with_query(query),
+        )
+
+    def _search_with_query(self, query: EsQuery):
+        if query.split_results:
+            responses = self._execute_multi(self.builder.split_searches(query))
+            return self.builder.split_result(query, responses)
+
+        s = self.builder.build_search(query, query.resources)
+        response = self._execute(s, index=query.resources)
+
+        # TODO format response in a better way, because the whole response takes up too much space in the logs
+        # logger.debug('response = {}'.format(response.to_dict()))
+        return self.builder.build_result(query, response)
+
+    def _search_with_cursor(self, query: EsQuery):
+        """Get a page of hits with a cursor to the next page.
+
+        The cursor "*" starts from the first hit in a new point in time of the
+        resources, any other cursor is one returned by an earlier page. The result has
+        a "cursor" for the next page, which is None after the last page.
+        """
+        if query.cursor == "*":
+            pit_id = self.es.open_point_in_time(
+                index=query.resources, keep_alive=self.settings.cursor_keep_alive
+            )["id"]
+            search_after = None
+        else:
+            pit_id, search_after = decode_cursor(query.cursor)
+        s = self.builder.cursor_search(query, pit_id, search_after)
+        try:
+            response = self._execute(s)
+        except elasticsearch.NotFoundError as err:
+            raise errors.InvalidCursor(query.cursor, "the cursor has expired") from err
+
+        result = self.builder.cursor_result(query, response)
+        if result["cursor"] is None:
+            self.es.close_point_in_time(id=response["pit_id"])
+        return result
+
+    def search_ids(self, resource_id: str, entry_ids: str):
+        """Get the entries with the given comma-separated ids, in the order of the ids.
+
+        The entries are read with realtime multi-gets of at most
+        `settings.mget_batch_size` ids each, instead of a search, so an entry is found
+        as soon as it is indexed. Ids that are not found are left out.
+        """
+        logger.info(
+            "Called EsSearch.search_ids with:",
+            extra={"resource_id": resource_id, "entry_ids": entry_ids},
+        )
+        index_resources = self.builder.index_resources([resource_id])
+        hits = []
+        for ids in self.builder.id_batches(entry_ids):
+            response = self.es.mget(index=resource_id, ids=ids, realtime=True)
+            hits.extend(self.builder.found_hits(index_resources, response))
+        return {"total": len(hits), "hits": hits}
+
+    def statistics(self, resource_id: str, field: str) -> list[dict]:
+        """Get all values of the field in the resource and their number of entries.
+
+        The values are ordered by count, most common first, and then by value. They
+        are read with a composite aggregation, `settings.statistics_page_size`
+        buckets at a time, instead of in one huge response. The result is cached
+        until the resource changes and must not be modified.
+        """
+        return self._cached(
+            field_statistics,
+            (resource_id, field, None),
+            [resource_id],
+            lambda: _by_count(self.iter_statistics(resource_id, field)),
+        )
+
+    def statistics_page(
+        self, resource_id: str, field: str, size: int, after: Optional[str] = None
+    ) -> dict:
+        """Get at most `size` values of the field, in the order of the values.
+
+        The result has the values and an `after` cursor for the next page, which is
+        None after the last page. The result is cached until the resource changes and
+        must not be modified.
+        """
+        after_key = _decode_after(after)
+        return self._cached(
+            field_statistics,
+            (resource_id, field, size, after),
+            [resource_id],
+            lambda: self._statistics_page(resource_id, field, size, after_key),
+        )
+
+    def iter_statistics(self, resource_id: str, field: str) -> Iterator[dict]:
+        """Iterate over the values of the field, in the order of the values."""
+        after_key = None
+        while True:
+            page = self._statistics_page(
+                resource_id, field, self.settings.statistics_page_size, after_key
+            )
+            yield from page["values"]
+            if page["after"] is None:
+                return
+            after_key = _decode_after(page["after"])
+
+    def _statistics_page(
+        self, resource_id: str, field: str, size: int, after_key: Optional[dict]
+    ) -> dict:
+        s = self.builder.statistics_search(resource_id, field, size, after_key)
+        return _statistics_result(self._execute(s, index=resource_id), size)
+
+
+def _statistics_result(response: dict, size: int) -> dict:
+    field_values = response["aggregations"]["field_values"]
+    buckets = field_values["buckets"]
+    return {
+        "values": [
+            {"value": bucket["key"]["value"], "count": bucket["doc_count"]} for bucket in buckets
+        ],
+        "after": _encode_token({"after": field_values["after_key"]})
+        if len(buckets) == size and "after_key" in field_values
+        else None,
+    }
+
+
+def _decode_after(after: Optional[str]) -> Optional[dict]:
+    return _decode_token(after, "after")[0] if after else None
+
+
+def _by_count(values: Iterable[dict]) -> list[dict]:
+    """Order field values by count, most common first, and then by value."""
+    return sorted(values, key=lambda value: (-value["count"], value["value"]))
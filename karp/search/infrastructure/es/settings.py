@@ -0,0 +1,63 @@
+from dataclasses import dataclass
+
+from .refresh import WriteVisibility
+
+
+@dataclass
+class EsIndexSettings:
+    """Settings for writing to the index."""
+
+    # the visibility of writes that don't ask for a specific one
+    write_visibility: WriteVisibility = WriteVisibility.WAIT_FOR
+
+    # max number of documents and bytes in one bulk request
+    bulk_chunk_size: int = 500
+    bulk_max_chunk_bytes: int = 10 * 1024 * 1024
+    # number of bulk requests that are sent concurrently
+    bulk_threads: int = 1
+    # number of connections to each ES node, shared by all concurrent requests
+    max_connections: int = 10
+    # retries of documents rejected with 429, with exponential backoff
+    bulk_max_retries: int = 5
+    bulk_initial_backoff: float = 2.0
+    bulk_max_backoff: float = 60.0
+
+    # the cluster health that a reindexed index must reach before it is used, and how
+    # long (in seconds) to wait for it and for the force-merge
+    reindex_wait_for_status: str = "green"
+    reindex_timeout: float = 3600.0
+
+
+@dataclass
+class EsSearchSettings:
+    """Settings for searching the index."""
+
+    # the parser of query strings, "fast" for the hand-written parser or "tatsu" for the
+    # parser that is generated from grammars/query_v6.ebnf
+    query_parser: str = "fast"
+
+    # how long (in seconds) search results and field statistics may be cached, 0 (the
+    # default) disables the caches. Results are only invalidated by changes made in this
+    # process, so changes made by the CLI or other API workers can go unseen for this
+    # long. Only enable it where that is acceptable.
+    result_cache_ttl: float = 0.0
+
+    # how long a point in time that is used by cursors is kept between two pages
+    cursor_keep_alive: str = "5m"
+
+    # number of hits that are fetched at a time by an export
+    export_page_size: int = 1000
+
+    # number of values that are read at a time by field statistics
+    statistics_page_size: int = 10_000
+
+    # maximum number of queries in one request to the multi-search endpoint
+    multi_query_max_items: int = 100
+
+    # maximum number of ids in one multi-get when entries are fetched by id
+    mget_batch_size: int = 1000
+
+    # how often (in seconds) the async API loads the mappings and the published resources
+    # again. Changes made by this process are seen at once, but changes made by the CLI or
+    # other API workers are only seen after this long.
+    mapping_reload_interval: float = 60.0
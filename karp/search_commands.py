@@ -1,15 +1,44 @@
 import logging
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
 
-from injector import inject
+from injector import Injector, inject
+from sqlalchemy.orm import Session
 
 import karp.plugins as plugins
+from karp.foundation.timings import utc_now
 from karp.lex.application import EntryQueries, ResourceQueries
+from karp.lex.domain.dtos import EntryDto
+from karp.lex.domain.errors import ResourceNotFound
+from karp.lex.infrastructure import IndexOutbox, ResourceRepository
+from karp.main import new_session
+from karp.main.errors import KarpError
 from karp.plugins import Plugins
-from karp.search.infrastructure.es.indices import EsIndex
+from karp.search.infrastructure.es import BulkIndexReport, EsIndex, WriteVisibility
 from karp.search.infrastructure.transformers import entry_transformer
 
 logger = logging.getLogger(__name__)
 
+# the stored watermark is moved back this many seconds, so that entries that were
+# modified during a reindex, but committed after it read them, are indexed next time
+WATERMARK_MARGIN = 60.0
+
+
+@dataclass
+class ReindexResult:
+    resource_id: str
+    num_indexed: int = 0
+    failed_ids: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.failed_ids
+
 
 class SearchCommands:
     @inject
@@ -19,12 +48,20 @@ class SearchCommands:
         resource_queries: ResourceQueries,
         entry_queries: EntryQueries,
         plugins: Plugins,
+        session: Session,
+        resources: ResourceRepository,
+        outbox: IndexOutbox,
+        injector: Injector,
     ):
         super().__init__()
         self.index = index
         self.resource_queries = resource_queries
         self.entry_queries = entry_queries
         self.plugins = plugins
+        self.session = session
+        self.resources = resources
+        self.outbox = outbox
+        self.injector = injector
 
     def _transform(self, resource, entries):
         # TODO: make _transform only live in one place
@@ -32,23 +69,207 @@ class SearchCommands:
         entries = plugins.transform_entries(self.plugins, config, entries)
         return (entry_transformer.transform(config, entry) for entry in entries)
 
-    def reindex_resource(self, resource_id, remove_old_index):
+    def reindex_resource(self, resource_id, remove_old_index, fast=False) -> BulkIndexReport:
+        """Index all entries of the resource in a new index and point the alias to it.
+
+        The alias is switched atomically after the new index is complete, so searches are
+        served by the old index until then. If `remove_old_index` is True, the old index
+        is deleted in the same operation.
+
+        If `fast` is True, the new index is built without replicas and with an async
+        translog, and `EsIndex.finish_build` restores the serving settings, force-merges
+        and waits for the cluster before the alias is switched.
+
+        Returns a report of the entries that failed to be indexed.
+        """
         logger.info("Reindexing resource '%s'", resource_id)
+        started_at = utc_now()
         resource = self.resource_queries.by_resource_id_optional(resource_id)
         resource_config = plugins.transform_config(self.plugins, resource.config)
 
         # create and add data to new index without touching the old alias
-        index_name = self.index.create_index(resource_id, resource_config, create_alias=False)
-        self.index.add_entries(
-            index_name, self._transform(resource, self.entry_queries.all_entries(resource_id))
+        index_name = self.index.create_index(
+            resource_id, resource_config, create_alias=False, build=fast
         )
-
-        if remove_old_index:
-            self.index.delete_index(resource_id)
+        report = self.index.add_entries(
+            index_name,
+            self._transform(resource, self.entry_queries.all_entries(resource_id)),
+            visibility=WriteVisibility.NONE,
+        )
+        if not report.failures:
+            self.index.set_last_indexed(index_name, started_at - WATERMARK_MARGIN)
+        if fast:
+            self.index.finish_build(index_name)
+        else:
+            self.index.refresh(index_name)
 
         # now when the data adding is done, point alias to the new index
-        self.index.create_alias(resource_id, index_name)
+        self.index.create_alias(resource_id, index_name, remove_old_index=remove_old_index)
+        return report
+
+    def reindex_resource_since(
+        self, resource_id: str, since: Optional[float] = None
+    ) -> BulkIndexReport:
+        """Index only the entries that are modified after `since`.
 
-    def reindex_all_resources(self):
-        for resource in self.resource_queries.get_all_resources():
-            self.reindex_resource(resource.resource_id)
+        Modified entries are upserted and discarded entries are deleted from the current
+        index. If `since` is None, the watermark stored by the last reindex is used.
+
+        Returns a report of the entries that failed to be indexed.
+        """
+        started_at = utc_now()
+        if since is None:
+            since = self.index.get_last_indexed(resource_id)
+            if since is None:
+                raise KarpError(
+                    f"No reindex of '{resource_id}' is recorded, a full reindex is needed"
+                )
+        logger.info("Reindexing entries in '%s' modified since %s", resource_id, since)
+        resource = self.resource_queries.by_resource_id_optional(resource_id)
+        if resource is None:
+            raise ResourceNotFound(resource_id)
+        entries = self.resources.entries_by_resource_id(resource_id).modified_since(since)
+
+        report = self.index.add_entries(
+            resource_id,
+            self._transform(
+                resource,
+                (EntryDto.from_entry(entry) for entry in entries if not entry.discarded),
+            ),
+            visibility=WriteVisibility.NONE,
+        )
+        report.merge(
+            self.index.delete_entries(
+                resource_id,
+                [entry.id for entry in entries if entry.discarded],
+                visibility=WriteVisibility.NONE,
+            )
+        )
+        self.index.refresh(resource_id)
+        if not report.failures:
+            self.index.set_last_indexed(resource_id, started_at - WATERMARK_MARGIN)
+        return report
+
+    def reindex_all_resources(
+        self,
+        workers: int = 1,
+        remove_old_index: bool = False,
+        fast: bool = False,
+        on_done: Optional[Callable[[ReindexResult], None]] = None,
+    ) -> List[ReindexResult]:
+        """Reindex all resources, `workers` resources at a time.
+
+        Every resource is reindexed with its own DB session. The number of workers is
+        limited so that the concurrent bulk requests fit in the ES connection budget
+        (`EsIndexSettings.max_connections`). A failing resource doesn't stop the others.
+
+        `on_done` is called with the result of every resource when it is finished.
+        Returns the results in the order of the resources.
+        """
+        resource_ids = [
+            resource.resource_id for resource in self.resource_queries.get_all_resources()
+        ]
+        settings = self.index.settings
+        max_workers = max(1, settings.max_connections // max(1, settings.bulk_threads))
+        if workers > max_workers:
+            logger.warning(
+                "Reindexing with %d workers instead of %d, to stay within %d ES connections",
+                max_workers,
+                workers,
+                settings.max_connections,
+            )
+            workers = max_workers
+
+        def reindex(resource_id: str) -> ReindexResult:
+            started_at = time.perf_counter()
+            result = ReindexResult(resource_id)
+            try:
+                with new_session(self.injector) as injector:
+                    report = injector.get(SearchCommands).reindex_resource(
+                        resource_id, remove_old_index=remove_old_index, fast=fast
+                    )
+                result.num_indexed = report.num_ok
+                result.failed_ids = report.failed_ids
+            except Exception as err:  # noqa: BLE001
+                logger.exception("Failed to reindex '%s'", resource_id)
+                result.error = str(err)
+            result.seconds = time.perf_counter() - started_at
+            if on_done:
+                on_done(result)
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            return list(executor.map(reindex, resource_ids))
+
+    def drain_index_outbox(self, batch_size: int = 1000, max_attempts: int = 10) -> int:
+        """Index the entries that are waiting in the index outbox.
+
+        Every entry is indexed in its latest state from the DB and discarded entries
+        are deleted from the index, so outbox rows can be processed in any order and
+        more than once. If indexing fails for a resource or for single entries, their
+        rows are retried by a later call with exponential backoff, at most
+        `max_attempts` times.
+
+        Returns the number of processed outbox rows.
+        """
+        num_processed = 0
+        after_id = None
+        while rows := self.outbox.pending(
+            limit=batch_size, max_attempts=max_attempts, after_id=after_id
+        ):
+            after_id = rows[-1].id
+            rows_by_resource = defaultdict(list)
+            for row in rows:
+                rows_by_resource[row.resource_id].append(row)
+
+            for resource_id, resource_rows in rows_by_resource.items():
+                try:
+                    report = self._index_entries_by_id(
+                        resource_id, {row.entity_id for row in resource_rows}
+                    )
+                except ResourceNotFound:
+                    logger.warning("Dropping outbox rows of missing resource '%s'", resource_id)
+                    self.outbox.remove(row.id for row in resource_rows)
+                except Exception as err:  # noqa: BLE001
+                    logger.exception(
+                        "Failed to index entries from outbox",
+                        extra={"resource_id": resource_id},
+                    )
+                    self.outbox.mark_failed(resource_rows, str(err))
+                else:
+                    failed_ids = set(report.failed_ids)
+                    failed_rows = [
+                        row for row in resource_rows if str(row.entity_id) in failed_ids
+                    ]
+                    if failed_rows:
+                        self.outbox.mark_failed(
+                            failed_rows, str(report.failures[0].error or "indexing failed")
+                        )
+                    done_rows = [row for row in resource_rows if row not in failed_rows]
+                    self.outbox.remove(row.id for row in done_rows)
+                    num_processed += len(done_rows)
+            self.session.commit()
+        return num_processed
+
+    def _index_entries_by_id(self, resource_id, entity_ids) -> BulkIndexReport:
+        """Index the entries in their current state and return a report of the failures."""
+        resource = self.resource_queries.by_resource_id_optional(resource_id)
+        if resource is None:
+            raise ResourceNotFound(resource_id)
+        entries = self.resources.entries_by_resource_id(resource_id).by_ids(entity_ids)
+        report = self.index.add_entries(
+            resource_id,
+            self._transform(
+                resource,
+                [EntryDto.from_entry(entry) for entry in entries if not entry.discarded],
+            ),
+            visibility=WriteVisibility.ASYNC,
+        )
+        report.merge(
+            self.index.delete_entries(
+                resource_id,
+                [entry.id for entry in entries if entry.discarded],
+                visibility=WriteVisibility.ASYNC,
+            )
+        )
+        return report
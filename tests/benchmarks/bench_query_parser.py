@@ -0,0 +1,38 @@
+"""Compare the speed of the query parsers.
+
+Run with `make bench-query-parser` or `python -m tests.benchmarks.bench_query_parser`.
+"""
+import timeit
+from functools import partial
+
+from karp.search.domain.query_dsl import QUERY_PARSERS, create_query_parser
+
+QUERIES = [
+    "equals|ortografi|hund",
+    'freetext|"hund"',
+    "gte|frequency|10",
+    'and(equals|pos|"nn"||startswith|baseform|"hu"||not(exists|inflectiontable))',
+    'or(and(regexp|wf|"h.*d"||lt|wf.length|6)||and(contains|sense.definition|"djur"'
+    '||missing|deprecated)||freergxp|"hun?d")',
+]
+
+
+def main(number: int = 2000) -> None:
+    timings = {}
+    for name in QUERY_PARSERS:
+        parser = create_query_parser(name)
+        timings[name] = {
+            q: min(timeit.repeat(partial(parser.parse, q), number=number, repeat=3)) / number
+            for q in QUERIES
+        }
+
+    print(f"{'query':<60} " + " ".join(f"{name:>10}" for name in QUERY_PARSERS) + "  speedup")
+    for q in QUERIES:
+        row = [timings[name][q] * 1e6 for name in QUERY_PARSERS]
+        speedup = timings["tatsu"][q] / timings["fast"][q]
+        label = q if len(q) <= 60 else q[:57] + "..."
+        print(f"{label:<60} " + " ".join(f"{t:>8.1f}us" for t in row) + f"  {speedup:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -728,3 +728,64 @@ class TestGetEntry:
         assert entry.id == entry_places_209_id
         assert entry.entry["municipality"] == [m["code"] for m in entry.entry["_municipality"]]
         assert entry.version == 5
+
+
+class TestBatchEntries:
+    def test_batch_reports_result_per_operation(
+        self,
+        fa_data_client,
+        write_token: auth.AccessToken,
+    ):
+        entity_id_1, entity_id_2 = init(
+            fa_data_client,
+            [
+                {"code": 230, "name": "batch1", "municipality": [1]},
+                {"code": 231, "name": "batch2", "municipality": [1]},
+            ],
+            write_token,
+        )
+
+        response = fa_data_client.post(
+            "/entries/places/_batch",
+            json={
+                "operations": [
+                    {"op": "add", "entry": {"code": 232, "name": "batch3", "municipality": [1]}},
+                    {
+                        "op": "update",
+                        "id": entity_id_1,
+                        "version": 1,
+                        "entry": {"code": 230, "name": "batch1b", "municipality": [1]},
+                    },
+                    {"op": "delete", "id": entity_id_2, "version": 2},
+                    {"op": "delete", "id": make_unique_id().str, "version": 1},
+                ]
+            },
+            headers=write_token.as_header(),
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        results = response.json()["results"]
+        assert [result["errorCode"] for result in results] == [
+            None,
+            None,
+            ClientErrorCodes.VERSION_CONFLICT,
+            ClientErrorCodes.ENTRY_NOT_FOUND,
+        ]
+        assert results[1]["version"] == 2
+
+        entries = get_entries(fa_data_client.app.state.app_context.injector, "places")
+        assert entries.by_id(unique_id.parse(entity_id_1)).body["name"] == "batch1b"
+        assert not entries.by_id(unique_id.parse(entity_id_2)).discarded
+
+    def test_batch_requires_id_for_update(
+        self,
+        fa_data_client,
+        write_token: auth.AccessToken,
+    ):
+        response = fa_data_client.post(
+            "/entries/places/_batch",
+            json={"operations": [{"op": "update", "version": 1, "entry": {}}]},
+            headers=write_token.as_header(),
+        )
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -1,3 +1,4 @@
+import json
 from typing import Dict, List, Optional
 
 import pytest
@@ -69,6 +70,114 @@ def test_query_no_q(
     print("names = {}".format(names))
 
 
+def test_query_with_cursor_pages_through_all_entries(
+    fa_data_client,
+    read_token: auth.AccessToken,
+):
+    ids = []
+    cursor = "*"
+    while cursor is not None:
+        entries = get_json(
+            fa_data_client,
+            "/query/places",
+            params={"size": 5, "cursor": cursor},
+            headers=read_token.as_header(),
+        )
+        ids.extend(entry["id"] for entry in entries["hits"])
+        cursor = entries["cursor"]
+
+    assert len(ids) == 22
+    assert len(set(ids)) == len(ids)
+
+
+def test_query_with_invalid_cursor(
+    fa_data_client,
+    read_token: auth.AccessToken,
+):
+    response = fa_data_client.get(
+        "/query/places",
+        params={"cursor": "not-a-cursor"},
+        headers=read_token.as_header(),
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_export_streams_all_entries_as_ndjson(
+    fa_data_client,
+    read_token: auth.AccessToken,
+):
+    response = fa_data_client.get("/query/places/_export", headers=read_token.as_header())
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    hits = [json.loads(line) for line in response.text.splitlines()]
+    assert len(hits) == 22
+    assert all(hit["resource"] == "places" for hit in hits)
+
+
+def test_get_entries_by_id_returns_all_ids_in_order(
+    fa_data_client,
+    read_token: auth.AccessToken,
+):
+    entries = get_json(
+        fa_data_client, "/query/places", params={"size": 22}, headers=read_token.as_header()
+    )
+    ids = [entry["id"] for entry in reversed(entries["hits"])]
+
+    result = get_json(
+        fa_data_client,
+        f"/query/entries/places/{','.join(ids)}",
+        headers=read_token.as_header(),
+    )
+
+    assert result["total"] == 22
+    assert [entry["id"] for entry in result["hits"]] == ids
+
+
+def test_multi_query_has_a_result_or_error_per_query(
+    fa_data_client,
+    read_token: auth.AccessToken,
+):
+    response = fa_data_client.post(
+        "/query/_msearch",
+        json=[
+            {"resources": ["places"], "size": 2},
+            {"resources": ["places"], "q": "equals|name"},
+            {"resources": ["not_a_resource"]},
+            {"resources": ["places"], "q": "equals|name|grund test", "lexicon_stats": False},
+        ],
+        headers=read_token.as_header(),
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    items = response.json()
+    assert len(items) == 4
+    assert items[0]["error"] is None
+    assert items[0]["result"]["total"] == 22
+    assert len(items[0]["result"]["hits"]) == 2
+    assert items[1]["error"]["errorCode"] == 81
+    assert items[2]["error"]["status"] == status.HTTP_404_NOT_FOUND
+    assert items[3]["error"] is None
+    assert "distribution" not in items[3]["result"]
+
+
+def test_query_with_include_fields(
+    fa_data_client,
+    read_token: auth.AccessToken,
+):
+    entries = get_json(
+        fa_data_client,
+        "/query/places",
+        params={"include_fields": "name"},
+        headers=read_token.as_header(),
+    )
+
+    for hit in entries["hits"]:
+        assert list(hit["entry"]) == ["name"]
+        assert hit["version"] is not None
+        assert hit["last_modified"] is not None
+
+
 def test_query_stats(
     fa_data_client,
     read_token: auth.AccessToken,
@@ -24,3 +24,50 @@ def test_stats_w_auth(fa_data_client, read_token: auth.AccessToken):  # noqa: AN
     entries = response.json()
     print(f"{entries=}")
     assert len(entries) == 4
+
+
+def test_stats_in_pages(fa_data_client):  # noqa: ANN201
+    values = []
+    after = None
+    for _ in range(4):
+        params = {"size": 3}
+        if after:
+            params["after"] = after
+        response = fa_data_client.get("/stats/places/area", params=params)
+        assert response.status_code == status.HTTP_200_OK
+        page = response.json()
+        values.extend(page["values"])
+        after = page["after"]
+        if after is None:
+            break
+
+    assert after is None
+    assert sorted(values, key=lambda value: value["value"]) == sorted(
+        fa_data_client.get("/stats/places/area").json(), key=lambda value: value["value"]
+    )
+
+
+def test_stats_with_invalid_cursor(fa_data_client):  # noqa: ANN201
+    response = fa_data_client.get("/stats/places/area", params={"after": "not a cursor"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"]["errorCode"] == 82
+
+
+def test_stats_streamed(fa_data_client):  # noqa: ANN201
+    response = fa_data_client.get("/stats/places/area", params={"stream": True})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.splitlines()
+    assert len(lines) == 4
+
+
+def test_cache_stats_need_admin(fa_data_client, read_token: auth.AccessToken):  # noqa: ANN201
+    assert fa_data_client.get("/stats/_caches").status_code == status.HTTP_401_UNAUTHORIZED
+    response = fa_data_client.get("/stats/_caches", headers=read_token.as_header())
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_cache_stats_w_admin(fa_data_client, admin_token: auth.AccessToken):  # noqa: ANN201
+    response = fa_data_client.get("/stats/_caches", headers=admin_token.as_header())
+    assert response.status_code == status.HTTP_200_OK
+    assert "search_results" in response.json()
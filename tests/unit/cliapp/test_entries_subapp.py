@@ -0,0 +1,164 @@
+import json
+
+import injector
+import pytest
+from typer.testing import CliRunner
+
+from karp.cliapp.subapps.entries_subapp import subapp
+from karp.entry_commands import BatchResult, EntryCommands
+from karp.foundation.value_objects import unique_id
+from karp.main.errors import ClientErrorCodes
+from karp.search.infrastructure.es import BulkFailure, BulkIndexReport
+
+ENTRY_ID = "01BJQMF54D093DXEAWZ6JYRPAQ"
+
+
+class FakeEntryCommands:
+    def __init__(self, results=None):
+        self.results = results or {}
+        self.operations = []
+
+    def execute_batches(self, operations, user, transaction_size=1000):
+        for resource_id, operation in operations:
+            self.operations.append((resource_id, operation))
+            error = self.results.get(str(operation.id))
+            if error is None:
+                yield (
+                    resource_id,
+                    operation,
+                    BatchResult(op=operation.op, id=operation.id, version=operation.version + 1),
+                )
+            else:
+                yield (
+                    resource_id,
+                    operation,
+                    BatchResult(
+                        op=operation.op,
+                        id=operation.id,
+                        error=error,
+                        error_code=ClientErrorCodes.VERSION_CONFLICT,
+                    ),
+                )
+
+
+class FakeImportCommands:
+    def __init__(self, report):
+        self.report = report
+        self.calls = []
+
+    def add_entries_in_chunks(self, resource_id, chunk_size, entries, **kwargs):
+        self.calls.append(("add", resource_id, chunk_size, list(entries)))
+        return self.report
+
+    def import_entries_in_chunks(self, resource_id, chunk_size, entries, **kwargs):
+        self.calls.append(("import", resource_id, chunk_size, list(entries)))
+        return self.report
+
+
+def add(tmp_path, command, args, entry_commands):
+    data = tmp_path / "entries.jsonl"
+    data.write_text('{"name": "a"}\n{"name": "b"}\n')
+    container = injector.Injector()
+    container.binder.bind(EntryCommands, to=entry_commands)
+    return CliRunner(mix_stderr=False).invoke(
+        subapp, [command, "places", str(data), *args], obj={"injector": container}
+    )
+
+
+@pytest.mark.parametrize("command", ["add", "import"])
+def test_add_entries(tmp_path, command):
+    entry_commands = FakeImportCommands(BulkIndexReport(num_ok=2))
+
+    result = add(tmp_path, command, ["--chunked", "--chunk-size", "10"], entry_commands)
+
+    assert result.exit_code == 0, result.stderr
+    assert entry_commands.calls == [(command, "places", 10, [{"name": "a"}, {"name": "b"}])]
+
+
+@pytest.mark.parametrize("command", ["add", "import"])
+def test_add_entries_reports_index_failures(tmp_path, command):
+    entry_commands = FakeImportCommands(
+        BulkIndexReport(num_ok=1, failures=[BulkFailure(id=ENTRY_ID, status=400, error="bad")])
+    )
+
+    result = add(tmp_path, command, [], entry_commands)
+
+    assert result.exit_code == 1
+    assert entry_commands.calls[0][2] == 0
+    assert "Failed to index 1 entries in places" in result.stderr
+    assert f"{ENTRY_ID}\t400\tbad" in result.stderr
+    assert "entries index-outbox" in result.stderr
+    assert "Successfully" not in result.stdout
+
+
+def update(tmp_path, records, entry_commands):
+    data = tmp_path / "updates.jsonl"
+    data.write_text("".join(json.dumps(record) + "\n" for record in records))
+    container = injector.Injector()
+    container.binder.bind(EntryCommands, to=entry_commands)
+    result = CliRunner(mix_stderr=False).invoke(
+        subapp, ["update", "places", str(data)], obj={"injector": container}
+    )
+    errors = tmp_path / "updates.jsonl.errors.jsonl"
+    if not errors.exists():
+        return result, None
+    return result, [json.loads(line) for line in errors.read_text().splitlines()]
+
+
+def test_update_entries(tmp_path):
+    entry_commands = FakeEntryCommands()
+
+    result, error_rows = update(
+        tmp_path,
+        [{"id": ENTRY_ID, "version": 1, "entry": {"name": "a"}, "message": "fix name"}],
+        entry_commands,
+    )
+
+    assert result.exit_code == 0, result.stderr
+    assert "Updated 1 entries in places" in result.stdout
+    # no errors file is left behind when nothing failed
+    assert error_rows is None
+    [(resource_id, operation)] = entry_commands.operations
+    assert resource_id == "places"
+    assert operation.op == "update"
+    assert operation.id == unique_id.parse(ENTRY_ID)
+    assert operation.entry == {"name": "a"}
+    assert operation.version == 1
+    assert operation.message == "fix name"
+
+
+@pytest.mark.parametrize(
+    "bad_record",
+    [
+        {"version": 1, "entry": {"name": "b"}},
+        {"id": "not-an-id", "version": 1, "entry": {"name": "b"}},
+    ],
+)
+def test_update_entries_reports_failed_rows_and_continues(tmp_path, bad_record):
+    conflicting_id = "01BJQMF54D093DXEAWZ6JYRPAR"
+    entry_commands = FakeEntryCommands({conflicting_id: "Version conflict."})
+
+    result, error_rows = update(
+        tmp_path,
+        [
+            bad_record,
+            {"id": conflicting_id, "version": 1, "entry": {"name": "c"}},
+            {"id": ENTRY_ID, "version": 1, "entry": {"name": "a"}},
+        ],
+        entry_commands,
+    )
+
+    assert result.exit_code == 1
+    assert "Updated 1 entries in places" in result.stdout
+    assert "2 updates failed" in result.stderr
+    assert [str(operation.id) for _, operation in entry_commands.operations] == [
+        conflicting_id,
+        ENTRY_ID,
+    ]
+    bad_row, conflict_row = error_rows
+    assert bad_row["entry"] == {"name": "b"}
+    assert bad_row["error"].startswith("invalid id")
+    assert bad_row["errorCode"] == ClientErrorCodes.ENTRY_NOT_VALID
+    assert conflict_row["id"] == conflicting_id
+    assert conflict_row["error"] == "Version conflict."
+    assert conflict_row["errorCode"] == ClientErrorCodes.VERSION_CONFLICT
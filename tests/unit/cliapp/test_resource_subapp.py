@@ -0,0 +1,44 @@
+import time
+from datetime import datetime, timezone
+
+import injector
+import pytest
+from typer.testing import CliRunner
+
+from karp.cliapp.subapps.resource_subapp import subapp
+from karp.search.infrastructure.es import BulkIndexReport
+from karp.search_commands import SearchCommands
+
+
+class FakeSearchCommands:
+    def __init__(self):
+        self.calls = []
+
+    def reindex_resource_since(self, resource_id, since):
+        self.calls.append((resource_id, since))
+        return BulkIndexReport()
+
+
+@pytest.fixture
+def local_timezone(monkeypatch):
+    monkeypatch.setenv("TZ", "Europe/Stockholm")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_reindex_since_is_in_utc(local_timezone) -> None:
+    search_commands = FakeSearchCommands()
+    container = injector.Injector()
+    container.binder.bind(SearchCommands, to=search_commands)
+
+    result = CliRunner().invoke(
+        subapp,
+        ["reindex", "places", "--since", "2024-01-01T12:00:00"],
+        obj={"injector": container},
+    )
+
+    assert result.exit_code == 0, result.output
+    expected = datetime(2024, 1, 1, 12, tzinfo=timezone.utc).timestamp()
+    assert search_commands.calls == [("places", expected)]
@@ -0,0 +1,24 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from karp.foundation.value_objects import make_unique_id
+from karp.lex.domain.entities import create_resource
+from karp.lex.infrastructure import EntryRepository
+from karp.lex.infrastructure.sql.models import IndexOutboxModel
+
+
+@pytest.fixture(name="sqlite_session")
+def fixture_sqlite_session() -> Session:
+    engine = create_engine("sqlite://")
+    IndexOutboxModel.__table__.create(bind=engine)
+    return Session(bind=engine)
+
+
+@pytest.fixture(name="entries")
+def fixture_entries(sqlite_session: Session) -> EntryRepository:
+    resource = create_resource(
+        {"resource_id": "places", "fields": {"name": {"type": "string", "required": True}}},
+        table_name=f"places_{make_unique_id()}",
+    )
+    return EntryRepository(session=sqlite_session, resource=resource)
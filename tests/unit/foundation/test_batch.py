@@ -0,0 +1,14 @@
+from karp.foundation.batch import chunk_items
+
+
+def test_chunk_items_splits_in_chunks() -> None:
+    assert list(chunk_items(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+def test_chunk_items_wo_chunk_size_gives_one_chunk() -> None:
+    assert list(chunk_items(iter(range(5)), 0)) == [[0, 1, 2, 3, 4]]
+
+
+def test_chunk_items_of_nothing_gives_no_chunks() -> None:
+    assert list(chunk_items([], 0)) == []
+    assert list(chunk_items([], 3)) == []
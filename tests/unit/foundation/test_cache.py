@@ -0,0 +1,62 @@
+import asyncio
+
+from karp.foundation.cache import LruCache, cache_stats
+
+
+def test_lru_cache_evicts_least_recently_used() -> None:
+    cache = LruCache(maxsize=2)
+    cache.get("a", lambda: 1)
+    cache.get("b", lambda: 2)
+    cache.get("a", lambda: -1)
+    cache.get("c", lambda: 3)
+
+    assert cache.get("a", lambda: -1) == 1
+    assert cache.get("b", lambda: 4) == 4
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.size) == (2, 4, 2)
+
+
+def test_named_caches_are_registered() -> None:
+    cache = LruCache(maxsize=2, name="test_named_caches")
+    cache.get("a", lambda: 1)
+
+    assert cache_stats()["test_named_caches"].misses == 1
+
+
+def test_hit_rate():
+    cache = LruCache(maxsize=2)
+    assert cache.stats().hit_rate == 0.0
+    for key in ["a", "a", "a", "b"]:
+        cache.get(key, lambda: 1)
+    assert cache.stats().hit_rate == 0.5
+
+
+def test_lru_cache_is_limited_by_bytes() -> None:
+    cache = LruCache(maxsize=10, maxbytes=10, sizeof=len)
+    cache.get("a", lambda: "aaaa")
+    cache.get("b", lambda: "bbbb")
+    cache.get("c", lambda: "cccc")
+
+    stats = cache.stats()
+    assert (stats.size, stats.nbytes) == (2, 8)
+    assert cache.get("a", lambda: "evicted") == "evicted"
+
+
+def test_lru_cache_skips_values_bigger_than_maxbytes() -> None:
+    cache = LruCache(maxsize=10, maxbytes=3, sizeof=len)
+    cache.get("a", lambda: "a")
+    assert cache.get("b", lambda: "bbbb") == "bbbb"
+
+    stats = cache.stats()
+    assert (stats.size, stats.nbytes) == (1, 1)
+
+
+def test_aget_awaits_missing_values() -> None:
+    cache = LruCache(maxsize=2)
+
+    async def create():
+        return "value"
+
+    assert asyncio.run(cache.aget("key", create)) == "value"
+    assert cache.get("key", lambda: "other") == "value"
+    assert cache.stats().hits == 1
@@ -0,0 +1,178 @@
+from unittest import mock
+
+import pytest
+import sqlalchemy as sa
+
+from karp.entry_commands import BatchOperation, EntryCommands
+from karp.foundation.value_objects import make_unique_id
+from karp.lex.domain.entities import create_entry
+from karp.lex.infrastructure import EntryRepository, IndexOutbox
+from karp.main.errors import ClientErrorCodes
+from karp.search.infrastructure.es import BulkFailure, BulkIndexReport
+
+
+@pytest.fixture(name="entry_commands")
+def fixture_entry_commands(entries: EntryRepository) -> EntryCommands:
+    resources = mock.Mock()
+    resources.by_resource_id.return_value = entries.resource
+    resources.entries_by_resource_id.return_value = entries
+    return EntryCommands(
+        session=entries._session,
+        resources=resources,
+        index=mock.Mock(),
+        plugins=None,
+        outbox=IndexOutbox(entries._session),
+    )
+
+
+def test_execute_batch_reports_result_per_operation(
+    entries: EntryRepository, entry_commands: EntryCommands
+) -> None:
+    entry_a = create_entry({"name": "a"}, id=make_unique_id(), resource_id="places")
+    entry_b = create_entry({"name": "b"}, id=make_unique_id(), resource_id="places")
+    entries.save_many([entry_a, entry_b])
+
+    results = entry_commands.execute_batch(
+        "places",
+        [
+            BatchOperation(op="add", entry={"name": "c"}),
+            BatchOperation(op="update", id=entry_a.id, entry={"name": "A"}, version=1),
+            BatchOperation(op="delete", id=entry_b.id, version=2),
+            BatchOperation(op="update", id=make_unique_id(), entry={"name": "d"}, version=1),
+            BatchOperation(op="add", entry={"other": "e"}),
+        ],
+        user="alice",
+        wait_for_visibility=False,
+    )
+
+    assert [result.error_code for result in results] == [
+        None,
+        None,
+        ClientErrorCodes.VERSION_CONFLICT,
+        ClientErrorCodes.ENTRY_NOT_FOUND,
+        ClientErrorCodes.ENTRY_NOT_VALID,
+    ]
+    assert results[1].version == 2
+    assert sorted(entry.body["name"] for entry in entries.all_entries()) == ["A", "b", "c"]
+    assert entry_commands.outbox.count() == 2
+    entry_commands.index.write_entries.assert_not_called()
+
+
+def test_execute_batches_groups_consecutive_operations(
+    entries: EntryRepository, entry_commands: EntryCommands
+) -> None:
+    entry_commands.index.write_entries.return_value = BulkIndexReport()
+    entry = create_entry({"name": "a"}, id=make_unique_id(), resource_id="places")
+    entries.save_many([entry])
+    operations = [
+        BatchOperation(op="add", entry={"name": "b"}),
+        BatchOperation(op="add", entry={"name": "c"}),
+        BatchOperation(op="update", id=entry.id, entry={"name": "A"}, version=1),
+        BatchOperation(op="update", id=entry.id, entry={"name": "AA"}, version=2),
+        BatchOperation(op="add", entry={"name": "d"}),
+    ]
+
+    results = list(
+        entry_commands.execute_batches(
+            (("places", operation) for operation in operations),
+            user="alice",
+            transaction_size=2,
+        )
+    )
+
+    assert [result.error for _, _, result in results] == [None] * 5
+    assert entries.by_id(entry.id).body["name"] == "AA"
+    # [add, add], [update], [update, add]
+    assert entry_commands.index.write_entries.call_count == 3
+    entry_commands.index.refresh.assert_called_once_with("places")
+
+
+def test_execute_batches_reports_unknown_resource_per_operation(
+    entries: EntryRepository, entry_commands: EntryCommands
+) -> None:
+    entry_commands.index.write_entries.return_value = BulkIndexReport()
+    entry_commands.resources.by_resource_id.side_effect = lambda resource_id: (
+        entries.resource if resource_id == "places" else None
+    )
+    operations = [
+        ("places", BatchOperation(op="add", entry={"name": "a"})),
+        ("unknown", BatchOperation(op="add", entry={"name": "b"})),
+        ("unknown", BatchOperation(op="add", entry={"name": "c"})),
+        ("places", BatchOperation(op="add", entry={"name": "d"})),
+    ]
+
+    results = list(entry_commands.execute_batches(iter(operations), user="alice"))
+
+    assert [(result.error, result.error_code) for _, _, result in results] == [
+        (None, None),
+        ("Resource 'unknown' not found", ClientErrorCodes.RESOURCE_NOT_FOUND),
+        ("Resource 'unknown' not found", ClientErrorCodes.RESOURCE_NOT_FOUND),
+        (None, None),
+    ]
+    assert sorted(entry.body["name"] for entry in entries.all_entries()) == ["a", "d"]
+    entry_commands.index.refresh.assert_called_once_with("places")
+
+
+def test_execute_batches_refreshes_written_resources_when_a_batch_fails(
+    entries: EntryRepository, entry_commands: EntryCommands
+) -> None:
+    entry_commands.index.write_entries.side_effect = [BulkIndexReport(), RuntimeError("boom")]
+    operations = [
+        BatchOperation(op="add", entry={"name": "a"}),
+        BatchOperation(op="add", entry={"name": "b"}),
+    ]
+
+    with pytest.raises(RuntimeError):
+        list(
+            entry_commands.execute_batches(
+                (("places", operation) for operation in operations),
+                user="alice",
+                transaction_size=1,
+            )
+        )
+
+    entry_commands.index.refresh.assert_called_once_with("places")
+
+
+def test_add_entries_in_chunks_reports_index_failures(
+    entries: EntryRepository, entry_commands: EntryCommands
+) -> None:
+    def add_entries(resource_id, index_entries, visibility=None):
+        index_entries = list(index_entries)
+        failed = [entry for entry in index_entries if entry.entry["name"] == "b"]
+        return BulkIndexReport(
+            num_ok=len(index_entries) - len(failed),
+            failures=[BulkFailure(id=entry.id, status=400, error="mapping") for entry in failed],
+        )
+
+    entry_commands.index.add_entries.side_effect = add_entries
+
+    report = entry_commands.add_entries_in_chunks(
+        "places", 2, [{"name": name} for name in "abc"], user="alice", message="add"
+    )
+
+    assert report.num_ok == 2
+    [failure] = report.failures
+    assert entries.by_id(failure.id).body == {"name": "b"}
+    # the failed entry is left in the outbox, to be indexed again
+    assert entry_commands.outbox.count() == 1
+
+
+def test_add_entries_in_chunks_commits_once_per_chunk(
+    entries: EntryRepository, entry_commands: EntryCommands
+) -> None:
+    entry_commands.index.add_entries.side_effect = lambda resource_id, index_entries, **_: (
+        BulkIndexReport(num_ok=len(list(index_entries)))
+    )
+    commits = []
+    sa.event.listen(entries._session, "after_commit", commits.append)
+
+    entry_commands.add_entries_in_chunks(
+        "places", 2, [{"name": name} for name in "abcde"], user="alice", message="add"
+    )
+
+    # one commit per chunk, removing the outbox rows of the previous chunk, and a last
+    # one for the outbox rows of the last chunk
+    assert len(commits) == 4
+    assert entry_commands.outbox.count() == 0
+    entry_commands.index.refresh.assert_called_once_with("places")
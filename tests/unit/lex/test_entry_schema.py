@@ -1,4 +1,5 @@
 import pytest
+from karp.lex.domain.entities import create_resource
 from karp.lex.domain.value_objects.entry_schema import (
     EntrySchema,
     create_entry_json_schema,
@@ -448,3 +449,34 @@ class TestCreateJsonSchema:
         resource_config = {"field_name": {"type": field_type}}
         json_schema = create_entry_json_schema(resource_config, True)
         _entry_schema = EntrySchema(json_schema)
+
+
+def test_entry_schema_is_shared_by_resource_instances():
+    config = {"resource_id": "places", "fields": {"name": {"type": "string"}}}
+    resource = create_resource(dict(config), table_name="places")
+    other_instance = create_resource(dict(config), table_name="places", id=resource.id)
+
+    assert other_instance.entry_schema is resource.entry_schema
+
+
+def test_entry_schema_of_rolled_back_update_is_not_reused():
+    config = {"resource_id": "places", "fields": {"name": {"type": "string"}}}
+    resource = create_resource(dict(config), table_name="places")
+    uncommitted = create_resource(dict(config), table_name="places", id=resource.id)
+    uncommitted.update(
+        name="places",
+        config={"fields": {"name": {"type": "integer"}}},
+        user="alice",
+        version=1,
+    )
+    assert uncommitted.entry_schema.validate_entry({"name": 1}) == {"name": 1}
+
+    # a different update that gets the same version
+    resource.update(
+        name="places",
+        config={"fields": {"name": {"type": "string"}, "code": {"type": "integer"}}},
+        user="bob",
+        version=1,
+    )
+    assert resource.version == uncommitted.version
+    assert resource.entry_schema.validate_entry({"name": "a"}) == {"name": "a"}
@@ -0,0 +1,30 @@
+from karp.lex.domain.value_objects.entry_schema import create_entry_json_schema
+from karp.lex.infrastructure import parallel_validation
+
+
+def test_validate_entries_keeps_order_and_reports_errors() -> None:
+    json_schema = create_entry_json_schema({"name": {"type": "string", "required": True}}, True)
+    entries = [{"name": str(i)} if i % 3 else {"name": i} for i in range(20)]
+
+    result = list(
+        parallel_validation.validate_entries(json_schema, entries, workers=2, batch_size=3)
+    )
+
+    assert [entry for entry, _error in result] == entries
+    assert [i for i, (_entry, error) in enumerate(result) if error is not None] == list(
+        range(0, 20, 3)
+    )
+
+
+def test_validate_entries_w_key() -> None:
+    json_schema = create_entry_json_schema({"name": {"type": "string"}}, True)
+    entries = [{"entry": {"name": "a"}}, {"entry": {"name": 1}}]
+
+    result = list(
+        parallel_validation.validate_entries(
+            json_schema, entries, workers=1, key=lambda entry: entry["entry"]
+        )
+    )
+
+    assert result[0] == (entries[0], None)
+    assert result[1][1] is not None
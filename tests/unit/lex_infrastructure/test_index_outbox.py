@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy.orm import Session
+
+from karp.foundation.value_objects import make_unique_id
+from karp.lex.infrastructure import IndexOutbox
+from karp.lex.infrastructure.sql.models import IndexOutboxModel
+
+
+@pytest.fixture(name="outbox")
+def fixture_outbox(sqlite_session: Session) -> IndexOutbox:
+    return IndexOutbox(sqlite_session)
+
+
+def test_added_rows_are_pending_until_removed(outbox: IndexOutbox) -> None:
+    entity_ids = [make_unique_id(), make_unique_id()]
+    outbox_ids = outbox.add("places", entity_ids)
+
+    pending = outbox.pending(limit=10, max_attempts=3)
+    assert {row.entity_id for row in pending} == set(entity_ids)
+
+    outbox.remove(outbox_ids)
+    assert outbox.pending(limit=10, max_attempts=3) == []
+
+
+def test_failed_rows_are_retried_later(outbox: IndexOutbox) -> None:
+    outbox.add("places", [make_unique_id()])
+
+    outbox.mark_failed(outbox.pending(limit=10, max_attempts=3), "es is down")
+
+    assert outbox.pending(limit=10, max_attempts=3) == []
+    assert outbox.count() == 1
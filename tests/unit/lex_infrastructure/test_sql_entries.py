@@ -0,0 +1,98 @@
+import pytest
+import sqlalchemy as sa
+
+from karp.foundation.value_objects import make_unique_id
+from karp.lex.domain.entities import create_entry
+from karp.lex.infrastructure import EntryRepository
+from karp.lex.infrastructure.sql import history_tables
+
+
+def test_save_many_inserts_all_entries(entries: EntryRepository) -> None:
+    new_entries = [
+        create_entry({"name": name}, id=make_unique_id(), resource_id="places")
+        for name in ["a", "b", "c"]
+    ]
+
+    entries.save_many(new_entries)
+
+    assert sorted(entry.body["name"] for entry in entries.all_entries()) == ["a", "b", "c"]
+    entry = entries.by_id(new_entries[1].id)
+    assert entry.version == 1
+    assert entry.op == new_entries[1].op
+
+
+def test_save_many_wo_entries_does_nothing(entries: EntryRepository) -> None:
+    entries.save_many([])
+
+    assert entries.all_entries() == []
+
+
+def test_by_ids_gets_latest_versions(entries: EntryRepository) -> None:
+    entry_a = create_entry({"name": "a"}, id=make_unique_id(), resource_id="places")
+    entry_b = create_entry({"name": "b"}, id=make_unique_id(), resource_id="places")
+    entries.save_many([entry_a, entry_b])
+    entry_b.discard(version=1, user="alice")
+    entries.save(entry_b)
+
+    result = {entry.id: entry for entry in entries.by_ids([entry_a.id, entry_b.id])}
+
+    assert result[entry_a.id].version == 1
+    assert result[entry_b.id].version == 2
+    assert result[entry_b.id].discarded
+    assert entries.by_ids([make_unique_id()]) == []
+
+
+def test_modified_since_gets_latest_versions_of_changed_entries(
+    entries: EntryRepository,
+) -> None:
+    entry_a = create_entry({"name": "a"}, id=make_unique_id(), resource_id="places")
+    entry_b = create_entry({"name": "b"}, id=make_unique_id(), resource_id="places")
+    entries.save_many([entry_a, entry_b])
+    watermark = max(entry_a.last_modified, entry_b.last_modified)
+    entry_b.discard(version=1, user="alice", timestamp=watermark + 1)
+    entries.save(entry_b)
+
+    result = entries.modified_since(watermark)
+
+    assert [entry.id for entry in result] == [entry_b.id]
+    assert result[0].discarded
+    assert entries.modified_since(watermark + 1) == []
+
+
+def test_history_table_is_checked_once_per_process(entries: EntryRepository) -> None:
+    entries._session.commit()
+    statements = []
+    engine = entries._session.get_bind()
+    sa.event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    EntryRepository(session=entries._session, resource=entries.resource)
+
+    assert statements == []
+
+
+def test_history_table_is_not_remembered_after_rollback(entries: EntryRepository) -> None:
+    engine = entries._session.get_bind()
+    table_name = entries.history_model.__tablename__
+
+    EntryRepository(session=entries._session, resource=entries.resource)
+    assert table_name not in history_tables._known_tables.get(engine, set())
+
+    entries._session.rollback()
+    assert table_name not in history_tables._known_tables.get(engine, set())
+
+    EntryRepository(session=entries._session, resource=entries.resource)
+    entries._session.commit()
+    assert table_name in history_tables._known_tables[engine]
+
+
+def test_rolled_back_history_table_is_not_remembered_by_next_commit(
+    entries: EntryRepository,
+) -> None:
+    engine = entries._session.get_bind()
+    table_name = entries.history_model.__tablename__
+    entries._session.rollback()
+
+    entries._session.execute(sa.text("SELECT 1"))
+    entries._session.commit()
+
+    assert table_name not in history_tables._known_tables.get(engine, set())
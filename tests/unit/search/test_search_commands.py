@@ -0,0 +1,156 @@
+import contextlib
+import threading
+from unittest import mock
+
+import pytest
+from sqlalchemy.orm import Session
+
+from karp import search_commands
+from karp.foundation.value_objects import make_unique_id
+from karp.lex.infrastructure import IndexOutbox
+from karp.lex.infrastructure.sql.models import IndexOutboxModel
+from karp.search.infrastructure.es import (
+    BulkFailure,
+    BulkIndexReport,
+    EsIndex,
+    EsIndexSettings,
+    bulk,
+)
+from karp.search_commands import SearchCommands
+
+
+class FakeReindexer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def reindex_resource(self, resource_id, remove_old_index, fast):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            if resource_id == "broken":
+                raise RuntimeError("es is down")
+            return BulkIndexReport(num_ok=len(resource_id))
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+@pytest.fixture(name="reindexer")
+def fixture_reindexer(monkeypatch) -> FakeReindexer:
+    reindexer = FakeReindexer()
+
+    @contextlib.contextmanager
+    def new_session(injector):
+        yield mock.Mock(get=mock.Mock(return_value=reindexer))
+
+    monkeypatch.setattr(search_commands, "new_session", new_session)
+    return reindexer
+
+
+def make_search_commands(resource_ids, settings) -> SearchCommands:
+    resource_queries = mock.Mock()
+    resource_queries.get_all_resources.return_value = [
+        mock.Mock(resource_id=resource_id) for resource_id in resource_ids
+    ]
+    return SearchCommands(
+        index=mock.Mock(settings=settings),
+        resource_queries=resource_queries,
+        entry_queries=None,
+        plugins=None,
+        session=None,
+        resources=None,
+        outbox=None,
+        injector=None,
+    )
+
+
+def test_reindex_all_resources_reports_every_resource(reindexer: FakeReindexer) -> None:
+    commands = make_search_commands(
+        ["places", "broken", "municipalities"], EsIndexSettings(max_connections=4)
+    )
+    done = []
+
+    results = commands.reindex_all_resources(workers=3, on_done=done.append)
+
+    assert [result.resource_id for result in results] == ["places", "broken", "municipalities"]
+    assert [result.ok for result in results] == [True, False, True]
+    assert results[0].num_indexed == len("places")
+    assert results[1].error == "es is down"
+    assert sorted(result.resource_id for result in done) == sorted(
+        result.resource_id for result in results
+    )
+
+
+def test_reindex_all_resources_stays_within_connection_budget(
+    reindexer: FakeReindexer,
+) -> None:
+    commands = make_search_commands(
+        [f"resource{i}" for i in range(10)], EsIndexSettings(max_connections=4, bulk_threads=2)
+    )
+
+    commands.reindex_all_resources(workers=8)
+
+    assert reindexer.max_running <= 2
+
+
+def make_indexing_commands(index, entries, outbox=None, session=None) -> SearchCommands:
+    resources = mock.Mock()
+    resources.entries_by_resource_id.return_value.by_ids.return_value = entries
+    resources.entries_by_resource_id.return_value.modified_since.return_value = entries
+    commands = SearchCommands(
+        index=index,
+        resource_queries=mock.Mock(),
+        entry_queries=None,
+        plugins=None,
+        session=session,
+        resources=resources,
+        outbox=outbox,
+        injector=None,
+    )
+    commands._transform = lambda resource, entries: list(entries)
+    return commands
+
+
+def test_drain_index_outbox_keeps_rows_of_failed_entries(monkeypatch, sqlite_session) -> None:
+    monkeypatch.setattr(search_commands.EntryDto, "from_entry", lambda entry: entry)
+    outbox = IndexOutbox(sqlite_session)
+    ok_id, failed_id = make_unique_id(), make_unique_id()
+    outbox.add("places", [ok_id, failed_id])
+    sqlite_session.commit()
+    index = mock.Mock()
+    index.add_entries.return_value = BulkIndexReport(
+        num_ok=1, failures=[BulkFailure(id=str(failed_id), status=400, error="mapping")]
+    )
+    index.delete_entries.return_value = BulkIndexReport()
+    entries = [
+        mock.Mock(id=ok_id, discarded=False),
+        mock.Mock(id=failed_id, discarded=False),
+    ]
+    commands = make_indexing_commands(index, entries, outbox=outbox, session=sqlite_session)
+
+    assert commands.drain_index_outbox() == 1
+
+    rows = sqlite_session.query(IndexOutboxModel).all()
+    assert [(row.entity_id, row.attempts, row.last_error) for row in rows] == [
+        (failed_id, 1, "mapping")
+    ]
+
+
+def test_reindex_since_deleting_missing_entry_advances_watermark(monkeypatch) -> None:
+    def streaming_bulk(es, actions, **kwargs):
+        for action in actions:
+            yield False, {action["_op_type"]: {"_id": action["_id"], "status": 404}}
+
+    monkeypatch.setattr(bulk.helpers, "streaming_bulk", streaming_bulk)
+    es = mock.Mock()
+    index = EsIndex(es, mapping_repo=None)
+    commands = make_indexing_commands(index, [mock.Mock(id="1", discarded=True)])
+
+    report = commands.reindex_resource_since("places", since=1000.0)
+
+    assert report.failures == []
+    es.indices.put_mapping.assert_called_once()
+    assert es.indices.put_mapping.call_args.kwargs["index"] == "places"
@@ -1 +1,65 @@
+from unittest import mock
+
+import pytest
+
+from karp.search.infrastructure.es import AsyncEsSearchService, EsSearchService, EsSearchSettings
+from karp.search.infrastructure.es.search_service import (
+    field_statistics,
+    parsed_queries,
+    search_results,
+)
 from tests.unit.search.conftest import search_unit_ctx  # noqa: F401
+
+
+@pytest.fixture(name="es")
+def fixture_es() -> mock.Mock:
+    es = mock.Mock()
+    es.open_point_in_time.return_value = {"id": "pit1"}
+    return es
+
+
+@pytest.fixture(name="async_es")
+def fixture_async_es() -> mock.AsyncMock:
+    es = mock.AsyncMock()
+    es.open_point_in_time.return_value = {"id": "pit1"}
+    return es
+
+
+@pytest.fixture(name="mapping_repo")
+def fixture_mapping_repo() -> mock.Mock:
+    mapping_repo = mock.Mock()
+    mapping_repo.load = mock.AsyncMock()
+    mapping_repo.get_default_sort.return_value = None
+    mapping_repo.resource_by_index = {"places_1": "places"}
+    mapping_repo.fields = {"places": {}}
+    return mapping_repo
+
+
+@pytest.fixture(name="search_settings")
+def fixture_search_settings(request) -> EsSearchSettings:
+    """Default settings, or the settings given by indirect parametrization.
+
+    Use `pytest.mark.parametrize("search_settings", [{...}], indirect=True)`.
+    """
+    return EsSearchSettings(**getattr(request, "param", {}))
+
+
+@pytest.fixture(name="clear_caches")
+def fixture_clear_caches():
+    for cache in (parsed_queries, search_results, field_statistics):
+        cache.clear()
+    yield
+    for cache in (parsed_queries, search_results, field_statistics):
+        cache.clear()
+
+
+@pytest.fixture(name="search_service")
+def fixture_search_service(es, mapping_repo, search_settings, clear_caches) -> EsSearchService:
+    return EsSearchService(es=es, mapping_repo=mapping_repo, settings=search_settings)
+
+
+@pytest.fixture(name="async_search_service")
+def fixture_async_search_service(
+    async_es, mapping_repo, search_settings, clear_caches
+) -> AsyncEsSearchService:
+    return AsyncEsSearchService(es=async_es, mapping_repo=mapping_repo, settings=search_settings)
@@ -0,0 +1,154 @@
+import asyncio
+from unittest import mock
+
+import elasticsearch
+import pytest
+
+from karp.search.domain import QueryRequest, errors
+from karp.search.infrastructure.es.search_service import (
+    decode_cursor,
+    encode_cursor,
+    search_results,
+)
+
+pytestmark = pytest.mark.parametrize(
+    "search_settings",
+    [{"mget_batch_size": 2, "statistics_page_size": 1, "result_cache_ttl": 60}],
+    indirect=True,
+)
+
+
+def hit(id_: str, sort=None) -> dict:
+    return {"_index": "places_1", "_id": id_, "_source": {"name": id_}, "sort": sort}
+
+
+def es_response(hits: list[dict], **extra) -> mock.Mock:
+    return mock.Mock(
+        body={
+            "hits": {"total": {"value": len(hits), "relation": "eq"}, "hits": hits},
+            "aggregations": {"distribution": {"buckets": [{"key": "places_1", "doc_count": 1}]}},
+            **extra,
+        }
+    )
+
+
+def test_sends_the_same_search_as_the_sync_service(
+    es, search_service, async_es, async_search_service
+) -> None:
+    es.search.return_value = es_response([hit("1")])
+    async_es.search.return_value = es_response([hit("1")])
+    request = QueryRequest(resource_ids=["places"], q="equals|name|1")
+
+    result = asyncio.run(async_search_service.query(request))
+    search_results.clear()
+
+    assert search_service.query(request) == result
+    assert async_es.search.call_args == es.search.call_args
+
+
+def test_query_awaits_search_and_caches_result(async_es, async_search_service) -> None:
+    async_es.search.return_value = es_response([hit("1")])
+    request = QueryRequest(resource_ids=["places"], q="equals|name|1")
+
+    result = asyncio.run(async_search_service.query(request))
+    assert asyncio.run(async_search_service.query(request)) == result
+
+    async_es.search.assert_awaited_once()
+    assert result["total"] == 1
+    assert result["hits"][0]["resource"] == "places"
+    assert result["distribution"] == {"places": 1}
+
+
+def test_query_with_error_in_query(async_search_service) -> None:
+    with pytest.raises(errors.IncompleteQuery):
+        asyncio.run(
+            async_search_service.query(QueryRequest(resource_ids=["places"], q="equals|"))
+        )
+
+
+def test_query_with_cursor(async_es, async_search_service) -> None:
+    async_es.search.return_value = es_response([hit("1", ["a", 1])], pit_id="pit2")
+    request = QueryRequest(resource_ids=["places"], size=1, lexicon_stats=False, cursor="*")
+
+    result = asyncio.run(async_search_service.query(request))
+
+    async_es.open_point_in_time.assert_awaited_once_with(index=["places"], keep_alive="5m")
+    assert decode_cursor(result["cursor"]) == ("pit2", ["a", 1])
+
+    async_es.search.return_value = es_response([], pit_id="pit3")
+    result = asyncio.run(
+        async_search_service.query(request.copy(update={"cursor": result["cursor"]}))
+    )
+    assert result["cursor"] is None
+    async_es.close_point_in_time.assert_awaited_once_with(id="pit3")
+
+
+def test_query_with_expired_cursor(async_es, async_search_service) -> None:
+    async_es.search.side_effect = elasticsearch.NotFoundError("N/A", meta=mock.Mock(), body={})
+    request = QueryRequest(resource_ids=["places"], cursor=encode_cursor("pit1", ["a"]))
+
+    with pytest.raises(errors.InvalidCursor):
+        asyncio.run(async_search_service.query(request))
+
+
+def test_multi_query_items(async_es, async_search_service) -> None:
+    async_es.msearch.return_value = mock.Mock(body={"responses": [es_response([hit("1")]).body]})
+
+    items = asyncio.run(
+        async_search_service.multi_query_items(
+            [
+                QueryRequest(resource_ids=["places"], q="equals|name"),
+                QueryRequest(resource_ids=["places"], q="equals|name|1"),
+            ]
+        )
+    )
+
+    async_es.msearch.assert_awaited_once()
+    assert items[0]["error"]["errorCode"] == 81
+    assert items[1]["result"]["total"] == 1
+
+
+def test_search_ids(async_es, async_search_service) -> None:
+    async_es.mget.side_effect = lambda index, ids, realtime: mock.Mock(
+        body={"docs": [{**hit(id_), "found": True} for id_ in ids]}
+    )
+
+    result = asyncio.run(async_search_service.search_ids("places", "a,b,c"))
+
+    assert async_es.mget.await_count == 2
+    assert [hit["id"] for hit in result["hits"]] == ["a", "b", "c"]
+
+
+def test_statistics_reads_all_pages(async_es, async_search_service) -> None:
+    async_es.search.side_effect = [
+        mock.Mock(
+            body={
+                "aggregations": {
+                    "field_values": {
+                        "buckets": [{"key": {"value": value}, "doc_count": count}],
+                        "after_key": {"value": value},
+                    }
+                }
+            }
+        )
+        for value, count in [("a", 1), ("b", 2)]
+    ] + [mock.Mock(body={"aggregations": {"field_values": {"buckets": []}}})]
+
+    values = asyncio.run(async_search_service.statistics("places", "area"))
+
+    assert values == [{"value": "b", "count": 2}, {"value": "a", "count": 1}]
+    assert async_es.search.await_count == 3
+
+
+def test_export_closes_point_in_time(async_es, async_search_service) -> None:
+    async_es.search.return_value = es_response([hit("1", ["a"])], pit_id="pit2")
+
+    async def export():
+        hits = await async_search_service.export(QueryRequest(resource_ids=["places"]))
+        return [hit async for hit in hits]
+
+    async_search_service.settings.export_page_size = 2
+    hits = asyncio.run(export())
+
+    assert [hit["id"] for hit in hits] == ["1"]
+    async_es.close_point_in_time.assert_awaited_once_with(id="pit2")
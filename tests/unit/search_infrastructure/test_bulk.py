@@ -0,0 +1,50 @@
+import pytest
+
+from karp.search.infrastructure.es import EsIndexSettings, bulk
+
+
+@pytest.fixture(name="fake_streaming_bulk")
+def fixture_fake_streaming_bulk(monkeypatch):
+    calls = []
+
+    def streaming_bulk(es, actions, **kwargs):
+        calls.append(kwargs)
+        for action in actions:
+            op_type = action.get("_op_type", "index")
+            if action["_id"].startswith("bad"):
+                yield False, {op_type: {"_id": action["_id"], "status": 400, "error": "bad"}}
+            elif action["_id"].startswith("missing"):
+                yield False, {op_type: {"_id": action["_id"], "status": 404, "error": None}}
+            else:
+                yield True, {op_type: {"_id": action["_id"], "status": 201}}
+
+    monkeypatch.setattr(bulk.helpers, "streaming_bulk", streaming_bulk)
+    return calls
+
+
+@pytest.mark.parametrize("threads", [1, 3])
+def test_bulk_index_reports_failed_ids(fake_streaming_bulk, threads: int) -> None:
+    settings = EsIndexSettings(bulk_chunk_size=2, bulk_threads=threads)
+    actions = [{"_id": f"ok{i}"} for i in range(7)] + [{"_id": "bad1"}, {"_id": "bad2"}]
+
+    report = bulk.bulk_index(None, iter(actions), settings, refresh=False)
+
+    assert report.num_ok == 7
+    assert sorted(report.failed_ids) == ["bad1", "bad2"]
+    assert all(call["refresh"] is False for call in fake_streaming_bulk)
+    assert all(call["raise_on_error"] is False for call in fake_streaming_bulk)
+    if threads > 1:
+        assert len(fake_streaming_bulk) == 5
+
+
+def test_deleting_missing_documents_is_not_a_failure(fake_streaming_bulk) -> None:
+    actions = [
+        {"_op_type": "delete", "_id": "missing1"},
+        {"_op_type": "delete", "_id": "bad1"},
+        {"_id": "missing2"},
+    ]
+
+    report = bulk.bulk_index(None, iter(actions), EsIndexSettings(), refresh=False)
+
+    assert report.num_ok == 1
+    assert report.failed_ids == ["bad1", "missing2"]
@@ -2,16 +2,13 @@ import pytest  # noqa: I001
 
 import elasticsearch_dsl as es_dsl
 
-from karp.search.domain.query_dsl.karp_query_v6_parser import KarpQueryV6Parser
-from karp.search.domain.query_dsl.karp_query_v6_model import (
-    KarpQueryV6ModelBuilderSemantics,
-)
+from karp.search.domain.query_dsl import QUERY_PARSERS, create_query_parser
 from karp.search.infrastructure.es import EsQueryBuilder
 
 
-@pytest.fixture(scope="session")
-def parser() -> KarpQueryV6Parser:
-    return KarpQueryV6Parser(semantics=KarpQueryV6ModelBuilderSemantics())
+@pytest.fixture(scope="session", params=QUERY_PARSERS)
+def parser(request):  # noqa: ANN201
+    return create_query_parser(request.param)
 
 
 @pytest.mark.parametrize(
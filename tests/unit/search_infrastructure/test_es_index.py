@@ -0,0 +1,58 @@
+from unittest import mock
+
+import pytest
+
+from karp.search.infrastructure.es import EsIndex, EsIndexSettings
+
+
+@pytest.fixture(name="es")
+def fixture_es() -> mock.Mock:
+    es = mock.Mock()
+    es.options.return_value = es
+    es.indices.get_alias.return_value = {"places_old": {"aliases": {"places": {}}}}
+    es.cluster.health.return_value = {"timed_out": False, "status": "green"}
+    return es
+
+
+@pytest.mark.parametrize(
+    "remove_old_index, old_index_action",
+    [
+        (False, {"remove": {"index": "places_old", "alias": "places"}}),
+        (True, {"remove_index": {"index": "places_old"}}),
+    ],
+)
+def test_create_alias_swaps_atomically(
+    es: mock.Mock, remove_old_index: bool, old_index_action: dict
+) -> None:
+    EsIndex(es, mapping_repo=None).create_alias(
+        "places", "places_new", remove_old_index=remove_old_index
+    )
+
+    es.indices.update_aliases.assert_called_once_with(
+        actions=[{"add": {"index": "places_new", "alias": "places"}}, old_index_action]
+    )
+
+
+def test_finish_build_fails_if_cluster_is_not_ready(es: mock.Mock) -> None:
+    es.cluster.health.return_value = {"timed_out": True, "status": "yellow"}
+    index = EsIndex(es, mapping_repo=None, settings=EsIndexSettings(reindex_timeout=1))
+
+    with pytest.raises(RuntimeError):
+        index.finish_build("places_new")
+
+    es.indices.put_settings.assert_called_once()
+    es.indices.forcemerge.assert_called_once_with(index="places_new", max_num_segments=1)
+
+
+def test_last_indexed_is_read_from_index_meta(es: mock.Mock) -> None:
+    es.indices.get_mapping.return_value = {
+        "places_new": {"mappings": {"_meta": {"last_indexed": 1234.5}, "properties": {}}}
+    }
+    index = EsIndex(es, mapping_repo=None)
+
+    index.set_last_indexed("places_new", 1234.5)
+
+    es.indices.put_mapping.assert_called_once_with(
+        index="places_new", meta={"last_indexed": 1234.5}
+    )
+    assert index.get_last_indexed("places") == 1234.5
@@ -0,0 +1,79 @@
+from unittest import mock
+
+import pytest
+
+from karp.search.domain import errors
+from karp.search.infrastructure.es.generations import resource_generations
+
+pytestmark = pytest.mark.parametrize(
+    "search_settings", [{"statistics_page_size": 2, "result_cache_ttl": 60}], indirect=True
+)
+
+
+def es_response(buckets: list[tuple], after_key: bool = True) -> mock.Mock:
+    field_values = {
+        "buckets": [{"key": {"value": value}, "doc_count": count} for value, count in buckets]
+    }
+    if after_key and buckets:
+        field_values["after_key"] = {"value": buckets[-1][0]}
+    return mock.Mock(body={"aggregations": {"field_values": field_values}})
+
+
+def test_statistics_reads_all_pages(es, search_service) -> None:
+    es.search.side_effect = [
+        es_response([("a", 1), ("b", 3)]),
+        es_response([("c", 1), ("d", 3)]),
+        es_response([("e", 2)]),
+    ]
+
+    assert search_service.statistics("places", "area") == [
+        {"value": "b", "count": 3},
+        {"value": "d", "count": 3},
+        {"value": "e", "count": 2},
+        {"value": "a", "count": 1},
+        {"value": "c", "count": 1},
+    ]
+    bodies = [call.kwargs["body"] for call in es.search.call_args_list]
+    composites = [body["aggs"]["field_values"]["composite"] for body in bodies]
+    assert composites[0] == {"size": 2, "sources": [{"value": {"terms": {"field": "area"}}}]}
+    assert [composite.get("after") for composite in composites] == [
+        None,
+        {"value": "b"},
+        {"value": "d"},
+    ]
+    assert all(body["size"] == 0 for body in bodies)
+
+
+def test_statistics_page_has_cursor_to_next_page(es, search_service) -> None:
+    es.search.return_value = es_response([("a", 1), ("b", 3)])
+    first = search_service.statistics_page("places", "area", 2)
+    assert first["values"] == [{"value": "a", "count": 1}, {"value": "b", "count": 3}]
+
+    es.search.return_value = es_response([("c", 1)])
+    second = search_service.statistics_page("places", "area", 2, first["after"])
+    composite = es.search.call_args.kwargs["body"]["aggs"]["field_values"]["composite"]
+    assert composite["after"] == {"value": "b"}
+    assert second == {"values": [{"value": "c", "count": 1}], "after": None}
+
+
+def test_statistics_page_with_malformed_cursor(search_service) -> None:
+    with pytest.raises(errors.InvalidCursor):
+        search_service.statistics_page("places", "area", 2, "not a cursor")
+
+
+def test_statistics_are_cached_until_resource_changes(es, search_service) -> None:
+    es.search.return_value = es_response([("a", 1)])
+    first = search_service.statistics("places", "area")
+    assert search_service.statistics("places", "area") == first
+    assert es.search.call_count == 1
+
+    resource_generations.bump("places")
+    search_service.statistics("places", "area")
+    assert es.search.call_count == 2
+
+
+def test_iter_statistics_is_not_cached(es, search_service) -> None:
+    es.search.return_value = es_response([("a", 1)])
+    assert list(search_service.iter_statistics("places", "area")) == [{"value": "a", "count": 1}]
+    assert list(search_service.iter_statistics("places", "area")) == [{"value": "a", "count": 1}]
+    assert es.search.call_count == 2
@@ -0,0 +1,77 @@
+import asyncio
+from unittest import mock
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from karp.lex.domain.entities import create_resource
+from karp.lex.infrastructure import ResourceRepository
+from karp.lex.infrastructure.sql.models import ResourceModel
+from karp.search.infrastructure.es import AsyncEsMappingRepository, EsSearchSettings
+from karp.search.infrastructure.es.generations import mapping_generations
+
+MAPPING = {
+    "places_1": {
+        "mappings": {
+            "properties": {
+                "name": {"type": "text", "fields": {"raw": {"type": "keyword"}}},
+            }
+        }
+    }
+}
+
+
+@pytest.fixture(name="engine")
+def fixture_engine(tmp_path):
+    # a file, since the resources are read in another thread than the test
+    engine = create_engine(f"sqlite:///{tmp_path / 'karp.db'}")
+    ResourceModel.__table__.create(bind=engine)
+    with Session(engine) as session:
+        resource = create_resource(
+            {"resource_id": "places", "sort": "name", "fields": {"name": {"type": "string"}}},
+            table_name="places_1",
+        )
+        resource.publish(user="alice", message="publish", version=1)
+        ResourceRepository(session).save(resource)
+        session.commit()
+    return engine
+
+
+@pytest.fixture(name="mapping_repo")
+def fixture_mapping_repo(async_es, engine) -> AsyncEsMappingRepository:
+    async_es.cat.aliases.return_value = "places places_1\n.hidden .hidden_1\n"
+    async_es.indices.get_mapping.return_value = MAPPING
+    return AsyncEsMappingRepository(async_es, engine, EsSearchSettings())
+
+
+def test_load_with_async_client(async_es, mapping_repo) -> None:
+    asyncio.run(mapping_repo.load())
+
+    assert mapping_repo.resource_by_index == {"places_1": "places"}
+    assert mapping_repo.default_sort == {"places": "name"}
+    assert mapping_repo.get_default_sort(["places"]) == "name.raw"
+    async_es.cat.aliases.assert_awaited_once()
+
+
+def test_load_only_when_stale(async_es, mapping_repo) -> None:
+    async def load_twice():
+        await asyncio.gather(mapping_repo.load(), mapping_repo.load())
+        await mapping_repo.load()
+
+    asyncio.run(load_twice())
+    assert async_es.indices.get_mapping.await_count == 1
+
+    # e.g. an alias was changed by this process
+    mapping_generations.bump("places")
+    asyncio.run(mapping_repo.load())
+    assert async_es.indices.get_mapping.await_count == 2
+
+
+def test_load_again_after_reload_interval(async_es, mapping_repo) -> None:
+    asyncio.run(mapping_repo.load())
+
+    with mock.patch("time.monotonic", return_value=mapping_repo._loaded[1] + 60):
+        asyncio.run(mapping_repo.load())
+
+    assert async_es.indices.get_mapping.await_count == 2
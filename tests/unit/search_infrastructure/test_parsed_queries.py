@@ -0,0 +1,48 @@
+import pytest
+
+from karp.search.domain import errors
+from karp.search.infrastructure.es import EsQueryBuilder
+from karp.search.infrastructure.es.search_service import parsed_queries
+
+
+@pytest.mark.parametrize(
+    "q",
+    [
+        "exists|test",
+        'freetext|"hej"',
+        'startswith|pos|"nn"',
+        "gte|val|2",
+        'not(regexp|kjh|"lk.*k")',
+        'and(regexp|baseform|"g[oe]t"||equals|pos|"nn")',
+        "or(equals|wf.length|3||missing|pos)",
+    ],
+)
+def test_cached_query_equals_uncached(search_service, q):
+    model = search_service.builder.parser.parse(q)
+    expected_query = EsQueryBuilder(q).walk(model)
+    expected_field_names = search_service.builder.field_name_collector.walk(model)
+    before = parsed_queries.stats()
+
+    for _ in range(2):
+        es_query, field_names = search_service.parse_query(q)
+        assert es_query == expected_query
+        assert field_names == expected_field_names
+
+    stats = parsed_queries.stats()
+    assert stats.hits - before.hits == 1
+    assert stats.misses - before.misses == 1
+    assert stats.size == 1
+
+
+def test_cached_query_is_not_shared(search_service):
+    first, _ = search_service.parse_query('equals|pos|"nn"')
+    first.pos["query"] = "vb"
+    second, _ = search_service.parse_query('equals|pos|"nn"')
+    assert second.to_dict() == {"match": {"pos": {"query": "nn", "operator": "and"}}}
+
+
+def test_parse_errors_are_not_cached(search_service):
+    for _ in range(2):
+        with pytest.raises(errors.IncompleteQuery):
+            search_service.parse_query("equals|pos")
+    assert parsed_queries.stats().size == 0
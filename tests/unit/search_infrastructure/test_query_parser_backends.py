@@ -0,0 +1,184 @@
+"""Differential tests of the hand-written query parser against the TatSu parser."""
+import random
+
+import pytest
+from tatsu import exceptions as tatsu_exc
+
+from karp.search.domain import errors
+from karp.search.domain.query_dsl import karp_query_v6_model as model
+from karp.search.domain.query_dsl.karp_query_v6_fast_parser import (
+    KarpQueryV6FastParser,
+    QueryParseError,
+)
+from karp.search.domain.query_dsl.karp_query_v6_model import (
+    KarpQueryV6ModelBuilderSemantics,
+)
+from karp.search.domain.query_dsl.karp_query_v6_parser import KarpQueryV6Parser
+from karp.search.infrastructure.es import EsQueryBuilder
+from karp.search.infrastructure.es.search_service import EsFieldNameCollector
+
+QUERY_OPERATORS = {
+    "contains": "string",
+    "endswith": "string",
+    "equals": "any",
+    "exists": None,
+    "freergxp": "string",
+    "freetext": "string",
+    "gt": "any",
+    "gte": "any",
+    "lt": "any",
+    "lte": "any",
+    "missing": None,
+    "regexp": "string",
+    "startswith": "string",
+}
+NO_FIELD = {"freergxp", "freetext"}
+
+
+@pytest.fixture(scope="module")
+def tatsu_parser() -> KarpQueryV6Parser:
+    return KarpQueryV6Parser(semantics=KarpQueryV6ModelBuilderSemantics())
+
+
+@pytest.fixture(scope="module")
+def fast_parser() -> KarpQueryV6FastParser:
+    return KarpQueryV6FastParser()
+
+
+def normalize(node):
+    """Return a comparable structure of a parsed query."""
+    if isinstance(node, model.QuotedStringValue):
+        return ("QuotedStringValue", "".join(node.ast))
+    if isinstance(node, model.StringValue):
+        return ("StringValue", normalize(node.ast))
+    if isinstance(node, model.ModelBase):
+        return (
+            type(node).__name__,
+            tuple(
+                (name, normalize(getattr(node, name)))
+                for name in ("op", "field", "arg", "exps")
+                if hasattr(node, name)
+            ),
+        )
+    if isinstance(node, list):
+        return tuple(normalize(item) for item in node)
+    return (type(node).__name__, node)
+
+
+def parse(parser, q):
+    try:
+        return normalize(parser.parse(q))
+    except (tatsu_exc.FailedParse, QueryParseError):
+        return "error"
+
+
+def random_ws(rng) -> str:
+    return rng.choice(["", "", "", " ", "  ", "\t", "\n"])
+
+
+def random_text(rng, alphabet) -> str:
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 6)))
+
+
+def random_value(rng, arg_type) -> str:
+    kind = rng.choice(
+        ["int", "unquoted", "quoted"] if arg_type == "any" else ["unquoted", "quoted"]
+    )
+    if kind == "int":
+        return str(rng.randint(0, 1000)) + rng.choice(["", "", "x", " "])
+    if kind == "unquoted":
+        return random_text(rng, "abcXYZ 0123-.*åäö")
+    return '"' + random_text(rng, ["a", "B", " ", "|", "(", ")", '\\"', "\\", "\n", "1"]) + '"'
+
+
+def random_query(rng, depth=0) -> str:
+    ws = random_ws(rng)
+    if depth < 3 and rng.random() < 0.3:
+        op = rng.choice(["and", "or", "not"])
+        exps = f"{random_ws(rng)}||{random_ws(rng)}".join(
+            random_query(rng, depth + 1) for _ in range(rng.randint(1, 3))
+        )
+        return f"{ws}{op}{random_ws(rng)}({exps}{random_ws(rng)})"
+    op = rng.choice(list(QUERY_OPERATORS))
+    q = ws + op
+    if op not in NO_FIELD:
+        q += f"|{random_ws(rng)}{random_text(rng, 'abf.*,_ ') or 'f'}"
+    if QUERY_OPERATORS[op]:
+        q += f"{random_ws(rng)}|{random_ws(rng)}{random_value(rng, QUERY_OPERATORS[op])}"
+    return q
+
+
+def mutate(rng, q: str) -> str:
+    pos = rng.randint(0, len(q))
+    action = rng.choice(["insert", "delete", "replace"])
+    char = rng.choice(["|", "||", "(", ")", '"', "\\", " ", "1", "a", "e"])
+    if action == "insert":
+        return q[:pos] + char + q[pos:]
+    if action == "delete":
+        return q[:pos] + q[pos + 1 :]
+    return q[:pos] + char + q[pos + 1 :]
+
+
+def fuzzed_corpus(seed: int, size: int) -> list[str]:
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        q = random_query(rng)
+        for _ in range(rng.choice([0, 0, 1, 2])):
+            q = mutate(rng, q)
+        corpus.append(q)
+    return corpus
+
+
+@pytest.mark.parametrize(
+    "q",
+    [
+        "exists|test",
+        'equals|f|"a \\" b  c"',
+        'equals|f|"a\\\\"b"',
+        'equals|f|"ab\\"',
+        'equals|f|""',
+        "equals| f |x y",
+        "equals|f|12abc",
+        "equals|f|12 ",
+        "gt|f|0012",
+        "gte|val|2",
+        "and (exists|a)",
+        "and( exists|a || exists|b )",
+        "and(exists|a||)",
+        "not(exists|a)",
+        "Equals|f|x",
+        "equalsx|f|x",
+        "exists|",
+        "",
+        "  ",
+    ],
+)
+def test_known_cases(tatsu_parser, fast_parser, q):
+    assert parse(fast_parser, q) == parse(tatsu_parser, q)
+
+
+def test_fuzzed_corpus(tatsu_parser, fast_parser):
+    corpus = fuzzed_corpus(seed=6, size=3000)
+    results = [(q, parse(tatsu_parser, q), parse(fast_parser, q)) for q in corpus]
+    mismatches = [(q, expected) for q, expected, actual in results if actual != expected]
+    assert not mismatches
+    # the corpus should test both valid and invalid queries
+    num_errors = sum(expected == "error" for _, expected, _ in results)
+    assert 0.1 * len(corpus) < num_errors < 0.9 * len(corpus)
+
+
+def test_same_es_query(tatsu_parser, fast_parser):
+    def build(node, q):
+        try:
+            return EsQueryBuilder(q).walk(node), collector.walk(node)
+        except errors.IncompleteQuery:
+            return "error"
+
+    collector = EsFieldNameCollector()
+    for q in fuzzed_corpus(seed=7, size=500):
+        try:
+            expected = tatsu_parser.parse(q)
+        except tatsu_exc.FailedParse:
+            continue
+        assert build(fast_parser.parse(q), q) == build(expected, q)
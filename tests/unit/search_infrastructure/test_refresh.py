@@ -0,0 +1,44 @@
+import threading
+
+from karp.search.infrastructure.es import RefreshCoalescer
+
+
+class FakeIndices:
+    def __init__(self):
+        self.refreshed = []
+
+    def refresh(self, index):
+        self.refreshed.append(index)
+
+
+class FakeEs:
+    def __init__(self):
+        self.indices = FakeIndices()
+
+
+def test_refresh_requests_are_coalesced_per_index() -> None:
+    es = FakeEs()
+    coalescer = RefreshCoalescer(es, window=60)
+
+    events = [coalescer.request_refresh("places") for _ in range(5)]
+    events.append(coalescer.request_refresh("municipalities"))
+    assert es.indices.refreshed == []
+
+    coalescer.flush()
+
+    assert sorted(es.indices.refreshed) == ["municipalities", "places"]
+    assert all(event.is_set() for event in events)
+
+
+def test_waiting_refresh_returns_after_window() -> None:
+    es = FakeEs()
+    coalescer = RefreshCoalescer(es, window=0.01)
+
+    threads = [threading.Thread(target=coalescer.refresh, args=("places",)) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert "places" in es.indices.refreshed
+    assert len(es.indices.refreshed) < 10
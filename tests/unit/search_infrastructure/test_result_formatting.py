@@ -0,0 +1,167 @@
+from unittest import mock
+
+import pytest
+
+from karp.main.errors import KarpError
+from karp.search.domain import QueryRequest, errors
+from karp.search.infrastructure.es.search_service import IndexResources
+
+
+def hit(index: str, id_: str, **source) -> dict:
+    return {
+        "_index": index,
+        "_id": id_,
+        "_score": 1.0,
+        "_source": {
+            "_entry_version": 2,
+            "_last_modified": 1700000000.0,
+            "_last_modified_by": "alice",
+            **source,
+        },
+    }
+
+
+def es_response(hits: list[dict], buckets: list[dict]) -> dict:
+    return {
+        "hits": {"total": {"value": len(hits), "relation": "eq"}, "hits": hits},
+        "aggregations": {"distribution": {"buckets": buckets}},
+    }
+
+
+def test_index_resources() -> None:
+    index_resources = IndexResources({"places_2": "places"}, ["places", "places_extra"])
+
+    assert index_resources["places_2"] == "places"
+    assert index_resources["places_extra_3"] == "places_extra"
+    assert index_resources["places_4"] == "places"
+
+
+def test_query_is_formatted_from_raw_response(es, search_service) -> None:
+    es.search.return_value = mock.Mock(
+        body=es_response(
+            [hit("places_1", "1", name="Grund"), hit("municipalities_5", "2", name="Bro")],
+            [{"key": "places_1", "doc_count": 1}, {"key": "municipalities_5", "doc_count": 1}],
+        )
+    )
+
+    result = search_service.query(
+        QueryRequest(resource_ids=["places", "municipalities"], q="exists|name", size=100)
+    )
+
+    assert es.search.call_args.kwargs["index"] == ["places", "municipalities"]
+    assert result == {
+        "total": 2,
+        "hits": [
+            {
+                "id": "1",
+                "version": 2,
+                "last_modified": 1700000000.0,
+                "last_modified_by": "alice",
+                "resource": "places",
+                "entry": {"name": "Grund"},
+            },
+            {
+                "id": "2",
+                "version": 2,
+                "last_modified": 1700000000.0,
+                "last_modified_by": "alice",
+                "resource": "municipalities",
+                "entry": {"name": "Bro"},
+            },
+        ],
+        "distribution": {"places": 1, "municipalities": 1},
+    }
+
+
+def test_multi_query_uses_one_msearch(es, search_service) -> None:
+    es.msearch.return_value = mock.Mock(
+        body={
+            "responses": [
+                es_response([hit("places_1", "1")], [{"key": "places_1", "doc_count": 1}]),
+                es_response([], []),
+            ]
+        }
+    )
+
+    results = search_service.multi_query(
+        [
+            QueryRequest(resource_ids=["places"], q="equals|name|x"),
+            QueryRequest(resource_ids=["places"], q="equals|name|y"),
+        ]
+    )
+
+    searches = es.msearch.call_args.kwargs["searches"]
+    assert searches[0] == {"index": ["places"]}
+    assert searches[2] == {"index": ["places"]}
+    assert [result["total"] for result in results] == [1, 0]
+    assert results[0]["hits"][0]["resource"] == "places"
+
+
+def test_multi_query_items_has_an_error_per_item(es, search_service) -> None:
+    es.msearch.return_value = mock.Mock(
+        body={
+            "responses": [
+                {"error": {"type": "query_shard_exception", "reason": "bad"}, "status": 400},
+                es_response([hit("places_1", "1")], [{"key": "places_1", "doc_count": 1}]),
+            ]
+        }
+    )
+
+    items = search_service.multi_query_items(
+        [
+            QueryRequest(resource_ids=["places"], q="equals|name|x"),
+            QueryRequest(resource_ids=["places"], q="equals|name"),
+            QueryRequest(resource_ids=["places"], q="equals|name|y"),
+        ]
+    )
+
+    assert len(es.msearch.call_args.kwargs["searches"]) == 4
+    assert items[0] == {
+        "result": None,
+        "error": {"status": 400, "errorCode": 1, "message": "Search failed"},
+    }
+    assert items[1]["result"] is None
+    assert items[1]["error"]["errorCode"] == 81
+    assert items[1]["error"]["failing_query"] == "equals|name"
+    assert items[2]["error"] is None
+    assert items[2]["result"]["total"] == 1
+
+
+def test_multi_query_items_without_valid_queries(es, search_service) -> None:
+    items = search_service.multi_query_items(
+        [QueryRequest(resource_ids=["places"], q="equals|name")]
+    )
+
+    es.msearch.assert_not_called()
+    assert items[0]["error"]["errorCode"] == 81
+
+
+def test_multi_query_items_with_bad_sort_field(es, mapping_repo, search_service) -> None:
+    def translate_sort_fields(resources, sort):
+        raise errors.UnsupportedField(f"You can't sort by field '{sort[0]}'")
+
+    mapping_repo.translate_sort_fields.side_effect = translate_sort_fields
+    mapping_repo.get_default_sort.side_effect = [
+        KarpError("Resources do not share default sort field"),
+        None,
+    ]
+    es.msearch.return_value = mock.Mock(
+        body={"responses": [es_response([hit("places_1", "1")], [])]}
+    )
+
+    items = search_service.multi_query_items(
+        [
+            QueryRequest(resource_ids=["places"], sort=["nope"]),
+            QueryRequest(resource_ids=["places", "other"]),
+            QueryRequest(resource_ids=["places"], lexicon_stats=False),
+        ]
+    )
+
+    assert items[0] == {
+        "result": None,
+        "error": {"status": 400, "errorCode": 1, "message": "You can't sort by field 'nope'"},
+    }
+    assert items[1]["error"]["message"] == "Resources do not share default sort field"
+    assert items[2]["error"] is None
+    assert items[2]["result"]["total"] == 1
+    assert len(es.msearch.call_args.kwargs["searches"]) == 2
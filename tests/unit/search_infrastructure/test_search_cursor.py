@@ -0,0 +1,101 @@
+from unittest import mock
+
+import elasticsearch
+import pytest
+
+from karp.search.domain import QueryRequest, errors
+from karp.search.infrastructure.es.search_service import decode_cursor, encode_cursor
+
+
+def es_response(pit_id: str, sorts: list[list]) -> mock.Mock:
+    hits = [
+        {"_index": "places_1", "_id": str(i), "_source": {"name": "x"}, "sort": sort}
+        for i, sort in enumerate(sorts)
+    ]
+    return mock.Mock(
+        body={
+            "pit_id": pit_id,
+            "hits": {"total": {"value": 3, "relation": "eq"}, "hits": hits},
+        }
+    )
+
+
+def query(cursor: str, size: int = 2) -> QueryRequest:
+    return QueryRequest(resource_ids=["places"], size=size, lexicon_stats=False, cursor=cursor)
+
+
+def test_pages_through_point_in_time(es, mapping_repo, search_service) -> None:
+    mapping_repo.get_default_sort.return_value = "name.sort"
+    es.search.return_value = es_response("pit2", [["a", 1], ["b", 2]])
+    first = search_service.query(query("*"))
+
+    es.open_point_in_time.assert_called_once_with(index=["places"], keep_alive="5m")
+    body = es.search.call_args.kwargs["body"]
+    assert es.search.call_args.kwargs["index"] is None
+    assert body["pit"] == {"id": "pit1", "keep_alive": "5m"}
+    assert body["sort"] == ["name.sort", "_shard_doc"]
+    assert "search_after" not in body
+    assert [hit["id"] for hit in first["hits"]] == ["0", "1"]
+    assert decode_cursor(first["cursor"]) == ("pit2", ["b", 2])
+
+    es.search.return_value = es_response("pit3", [["c", 3]])
+    second = search_service.query(query(first["cursor"]))
+
+    body = es.search.call_args.kwargs["body"]
+    assert body["pit"]["id"] == "pit2"
+    assert body["search_after"] == ["b", 2]
+    assert body["size"] == 2
+    assert "from" not in body
+    assert second["cursor"] is None
+    es.close_point_in_time.assert_called_once_with(id="pit3")
+
+
+def test_malformed_cursor(search_service) -> None:
+    with pytest.raises(errors.InvalidCursor):
+        search_service.query(query("not a cursor"))
+
+
+def test_expired_cursor(es, search_service) -> None:
+    es.search.side_effect = elasticsearch.NotFoundError(
+        "search_context_missing_exception", mock.Mock(status=404), {}
+    )
+    with pytest.raises(errors.InvalidCursor):
+        search_service.query(query(encode_cursor("pit1", ["a", 1])))
+
+
+@pytest.mark.parametrize("search_settings", [{"export_page_size": 2}], indirect=True)
+def test_export_reads_all_pages(es, search_service) -> None:
+    es.search.side_effect = [
+        es_response("pit2", [[1], [2]]),
+        es_response("pit3", [[3]]),
+    ]
+
+    hits = search_service.export(QueryRequest(resource_ids=["places"]))
+    es.open_point_in_time.assert_not_called()
+
+    assert len(list(hits)) == 3
+    bodies = [call.kwargs["body"] for call in es.search.call_args_list]
+    assert [body["pit"]["id"] for body in bodies] == ["pit1", "pit2"]
+    assert "search_after" not in bodies[0]
+    assert bodies[1]["search_after"] == [2]
+    assert bodies[0]["sort"] == ["_shard_doc"]
+    assert bodies[0]["track_total_hits"] is False
+    assert "aggs" not in bodies[0]
+    es.close_point_in_time.assert_called_once_with(id="pit3")
+
+
+def test_export_checks_query_before_streaming(es, search_service) -> None:
+    with pytest.raises(errors.IncompleteQuery):
+        search_service.export(QueryRequest(resource_ids=["places"], q="equals|name"))
+    es.open_point_in_time.assert_not_called()
+
+
+def test_export_closes_point_in_time_when_closed_early(es, search_service) -> None:
+    es.search.return_value = es_response("pit2", [[1], [2]])
+
+    hits = search_service.export(QueryRequest(resource_ids=["places"]))
+    next(hits)
+    hits.close()
+
+    es.open_point_in_time.assert_called_once()
+    es.close_point_in_time.assert_called_once_with(id="pit2")
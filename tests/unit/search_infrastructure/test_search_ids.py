@@ -0,0 +1,67 @@
+from unittest import mock
+
+import elasticsearch
+import pytest
+
+pytestmark = pytest.mark.parametrize("search_settings", [{"mget_batch_size": 2}], indirect=True)
+
+
+def mget_response(ids: list[str], missing: tuple = ()) -> mock.Mock:
+    docs = [
+        {"_index": "places_1", "_id": id_, "found": False}
+        if id_ in missing
+        else {
+            "_index": "places_1",
+            "_id": id_,
+            "found": True,
+            "_source": {"_entry_version": 1, "name": id_},
+        }
+        for id_ in ids
+    ]
+    return mock.Mock(body={"docs": docs})
+
+
+def test_search_ids_uses_batched_realtime_mget(es, search_service) -> None:
+    es.mget.side_effect = lambda index, ids, realtime: mget_response(ids, missing=("c",))
+
+    result = search_service.search_ids("places", "a,b,c,d,a,e")
+
+    assert es.mget.call_args_list == [
+        mock.call(index="places", ids=["a", "b"], realtime=True),
+        mock.call(index="places", ids=["c", "d"], realtime=True),
+        mock.call(index="places", ids=["e"], realtime=True),
+    ]
+    es.search.assert_not_called()
+    assert result["total"] == 4
+    assert [hit["id"] for hit in result["hits"]] == ["a", "b", "d", "e"]
+    assert result["hits"][0] == {
+        "id": "a",
+        "version": 1,
+        "last_modified": None,
+        "last_modified_by": None,
+        "resource": "places",
+        "entry": {"name": "a"},
+    }
+
+
+def test_search_ids_raises_errors(es, search_service) -> None:
+    es.mget.return_value = mock.Mock(
+        body={"docs": [{"_index": "places", "_id": "a", "error": {"type": "x"}}]}
+    )
+
+    with pytest.raises(elasticsearch.ApiError):
+        search_service.search_ids("places", "a")
+
+
+def test_search_ids_ignores_empty_ids(es, search_service) -> None:
+    es.mget.side_effect = lambda index, ids, realtime: mget_response(ids)
+
+    result = search_service.search_ids("places", "a,, ,b,")
+
+    assert es.mget.call_args_list == [mock.call(index="places", ids=["a", "b"], realtime=True)]
+    assert [hit["id"] for hit in result["hits"]] == ["a", "b"]
+
+
+def test_search_ids_without_ids(es, search_service) -> None:
+    assert search_service.search_ids("places", ",") == {"total": 0, "hits": []}
+    es.mget.assert_not_called()
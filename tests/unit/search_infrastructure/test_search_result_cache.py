@@ -0,0 +1,73 @@
+from unittest import mock
+
+import pytest
+
+from karp.search.infrastructure.es import EsIndex, EsQuery, EsSearchSettings
+from karp.search.infrastructure.es.generations import resource_generations
+
+with_cache = pytest.mark.parametrize(
+    "search_settings", [{"result_cache_ttl": 60}], indirect=True
+)
+
+
+@pytest.fixture(name="search")
+def fixture_search(monkeypatch, search_service) -> mock.Mock:
+    search = mock.Mock(side_effect=lambda query: {"total": 0, "q": query.q})
+    monkeypatch.setattr(search_service, "_search_with_query", search)
+    return search
+
+
+def make_query(resources: list[str], q: str = "") -> EsQuery:
+    return EsQuery(resources=resources, q=q)
+
+
+@with_cache
+def test_identical_queries_are_cached(search_service, search) -> None:
+    first = search_service.search_with_query(make_query(["places"], "exists|name"))
+    second = search_service.search_with_query(make_query(["places"], "exists|name"))
+    search_service.search_with_query(make_query(["places"], "exists|code"))
+
+    assert first is second
+    assert search.call_count == 2
+
+
+@with_cache
+def test_result_is_invalidated_by_a_change_in_any_resource(search_service, search) -> None:
+    query = make_query(["places", "municipalities"])
+    search_service.search_with_query(query)
+
+    resource_generations.bump("other")
+    search_service.search_with_query(query)
+    assert search.call_count == 1
+
+    resource_generations.bump("municipalities")
+    search_service.search_with_query(query)
+    assert search.call_count == 2
+
+
+def test_cache_is_disabled_by_default() -> None:
+    assert EsSearchSettings().result_cache_ttl == 0
+
+
+def test_cache_can_be_disabled(search_service, search) -> None:
+    search_service.search_with_query(make_query(["places"]))
+    search_service.search_with_query(make_query(["places"]))
+    assert search.call_count == 2
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda index: index.refresh("places"),
+        lambda index: index.delete_entries("places", ["1"]),
+        lambda index: index.create_alias("places", "places_new"),
+        lambda index: index.delete_index("places"),
+    ],
+)
+def test_index_changes_bump_the_generation(change) -> None:
+    es = mock.Mock()
+    es.indices.get_alias.return_value = {"places_old": {}}
+    with mock.patch("karp.search.infrastructure.es.indices.bulk_index"):
+        before = resource_generations.get(["places"])
+        change(EsIndex(es, mapping_repo=None))
+    assert resource_generations.get(["places"]) > before
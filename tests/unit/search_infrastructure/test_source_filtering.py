@@ -0,0 +1,34 @@
+import pytest
+
+from karp.search.domain import QueryRequest
+from karp.search.infrastructure.es import EsQuery
+
+
+def build_body(search_service, **kwargs) -> dict:
+    request = QueryRequest(resource_ids=["places"], **kwargs)
+    query = EsQuery.from_query_request(request)
+    return search_service.builder.build_search(query, query.resources).to_dict()
+
+
+def test_fields_are_split_on_commas() -> None:
+    request = QueryRequest(
+        resource_ids=["places"], include_fields=["name,code", "area"], exclude_fields="v"
+    )
+    assert request.include_fields == ["name", "code", "area"]
+    assert request.exclude_fields == ["v"]
+
+
+def test_no_source_filtering_by_default(search_service) -> None:
+    assert "_source" not in build_body(search_service)
+
+
+def test_include_fields_keep_metadata(search_service) -> None:
+    body = build_body(search_service, include_fields=["name"])
+    assert body["_source"] == {
+        "includes": ["name", "_entry_version", "_last_modified", "_last_modified_by"]
+    }
+
+
+def test_exclude_fields_keep_metadata(search_service) -> None:
+    body = build_body(search_service, exclude_fields=["SOLemman", "_last_modified"])
+    assert body["_source"] == {"excludes": ["SOLemman"]}